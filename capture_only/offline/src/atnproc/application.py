@@ -1,93 +1,288 @@
 """Runner implementation for ATN capture processing.
 
-Contains `ApplicationRunner` which implements `RunnerInterface` and
-coordinates discovery of recent capture files and staging them into the
-work area for downstream processing.
+Contains `Application` which implements `RunnerInterface` and coordinates
+discovery of recent capture files, staging them into the work area and
+processing them. Each capture directory (one per ATN router) is handled by
+its own `CaptureSource`; the processing tasks of all sources run
+concurrently on a `TaskExecutor`. Optionally the router logs of all sources
+are merged into a single router log by a `RouterLogMerger`, decoded by
+`ShardedPdecDecoder` and the new PDUs passed to Filebeat by `PdusDiffer`. The
+new router log records can also be written with their source and
+destination facility by a `RouterLogEnricher`.
+
+The duration of every stage, the resource usage of the subprocesses and
+the data volumes are recorded in `Metrics` and, if configured, written to
+a node_exporter textfile after each tick. With adaptive scheduling the
+time until the next tick is chosen by a `TickScheduler` instead of using
+the fixed processing interval. Expired files of the work area and capture
+directories are removed by a `RetentionEngine` at the end of the ticks
+that leave time to spare. `run_once` runs a single tick, as ``--once``
+does.
 """
 
 import logging
-from datetime import timedelta
-from atnproc.recent_capture_file_loader import RecentCaptureFileLoader
-from atnproc.recent_capture_files import RecentCaptureFiles
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from atnproc.capture_file_name import CAPTURE_FILE_PATTERNS
+from atnproc.capture_source import CaptureSource, source_names
 from atnproc.runner_interface import RunnerInterface
 from atnproc.config import Configuration
-from atnproc.work_area import WorkArea
-from atnproc.packet_processor import PacketProcessor
+from atnproc.facility_index import FacilityIndex
+from atnproc.metrics import Metrics
+from atnproc.pcap_index import INDEX_SUFFIX as PCAP_INDEX_SUFFIX
+from atnproc.pdus_differ import PdusDiffer
+from atnproc.processing_task import ProcessingTask, processor_settings
+from atnproc.retention import RetentionEngine, RetentionPolicy, RetentionSettings
+from atnproc.router_log_enricher import RouterLogEnricher
+from atnproc.router_log_index import INDEX_SUFFIX as ROUTER_LOG_INDEX_SUFFIX
+from atnproc.router_log_merger import RouterLogMerger
+from atnproc.sharded_pdec_decoder import ShardedPdecDecoder
+from atnproc.task_executor import TaskExecutor
+from atnproc.tick_scheduler import TickScheduler, TickSettings
+
+ROUTER_LOG_PATTERN = "*.log"
 
 
-class Application(RunnerInterface):
+# Coordinates the stages of a tick, one attribute each
+class Application(RunnerInterface):  # pylint: disable=too-many-instance-attributes
     """Main application functionality.
 
     Implements `RunnerInterface.run()` to locate the two most recent
-    capture files and stage the appropriate file into the work area for
-    downstream processing.
+    capture files of every capture directory, stage them into the work area
+    and process them.
     """
 
     def __init__(self, config: Configuration) -> None:
         self._config: Configuration = config
         self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
-        self._work_area = WorkArea(config.work_directories)
-        self._processor = PacketProcessor(
-            filter_ip=config.filter_ip,
-            awk_script=config.awk_script,
+        self._metrics = Metrics()
+        enricher = self._create_enricher()
+        self._sources = [
+            CaptureSource(name, directory, config, self._metrics, enricher)
+            for name, directory in zip(
+                source_names(config.capture_directories), config.capture_directories
+            )
+        ]
+        self._executor = TaskExecutor(
+            processor_settings(config),
+            max_workers=config.processing.max_workers,
+            task_timeout_seconds=config.processing.task_timeout_seconds,
+        )
+        self._merger = RouterLogMerger(
+            dedup_window=timedelta(seconds=config.merge.dedup_window_seconds)
+        )
+        self._decoder = (
+            ShardedPdecDecoder(
+                config.decoder.executable,
+                config.decoder.atsu_file,
+                config.decoder.work_directory,
+                shards=config.decoder.shards,
+                overlap=timedelta(seconds=config.decoder.shard_overlap_seconds),
+            )
+            if config.decoder.executable
+            else None
+        )
+        self._differ = PdusDiffer(max_rows=config.decoder.index_max_rows)
+        self._scheduler = (
+            TickScheduler(
+                TickSettings(
+                    min_interval=timedelta(seconds=config.scheduler.min_interval_seconds),
+                    max_interval=timedelta(seconds=config.scheduler.max_interval_seconds),
+                    backlog_bytes=config.scheduler.backlog_bytes,
+                ),
+                self._metrics,
+            )
+            if config.scheduler.adaptive
+            else None
         )
+        self._retention = self._create_retention()
+        self._succeeded = True
+
+    @property
+    def succeeded(self) -> bool:
+        """False if processing or decoding in the last :meth:`run` failed or did not complete.
+
+        Tasks of a source that are still running, e.g. after a timeout,
+        count as not completed.
+        """
+        return self._succeeded
 
     def run(self) -> timedelta:
-        file_loader = RecentCaptureFileLoader(self._config.capture_directories)
-        capture_files = RecentCaptureFiles(file_loader.files)
-        self._work_area.ingest_files(capture_files.files)
-        if capture_files.latest:
-            current_capture_file = self._work_area.get_current_capture_file()
-            if not current_capture_file:
-                self._logger.info(
-                    f"No current capture file. Initializing with: {capture_files.latest}"
+        start_time = time.monotonic()
+        self._succeeded = True
+        jobs: dict[str, list[ProcessingTask]] = {}
+        for source in self._sources:
+            if self._executor.is_busy(source.name):
+                self._logger.warning(f"{source.name} is still being processed, skipping")
+                self._succeeded = False
+                continue
+            tasks = source.plan()
+            if tasks:
+                jobs[source.name] = tasks
+
+        with self._metrics.span("process"):
+            results = self._executor.run(jobs)
+        for source in self._sources:
+            if source.name in results:
+                source.complete(results[source.name])
+        if any(
+            source not in results or not all(r.succeeded for r in results[source])
+            for source in jobs
+        ):
+            self._succeeded = False
+        if results:
+            with self._metrics.span("merge"):
+                self._merge_router_logs()
+            self._decode_router_log()
+        self._remove_expired_files(start_time)
+
+        elapsed = time.monotonic() - start_time
+        if self._scheduler is None:
+            interval = timedelta(seconds=self._config.processing_interval_seconds)
+            self._record_tick(elapsed, interval)
+            return interval
+        progress = [p for p in (source.progress() for source in self._sources) if p]
+        sleep_duration = self._scheduler.schedule(progress, start_time, elapsed)
+        self._record_tick(elapsed, self._scheduler.interval)
+        return sleep_duration
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def _create_enricher(self) -> Optional[RouterLogEnricher]:
+        """Creates the facility enricher, if enabled and ``atsu.csv`` is readable."""
+        if self._config.enrichment.log_directory is None:
+            return None
+        self._config.enrichment.log_directory.mkdir(parents=True, exist_ok=True)
+        try:
+            index = FacilityIndex(
+                self._config.decoder.atsu_file, self._config.enrichment.facility_index_file
+            )
+        except OSError as e:
+            self._logger.error(f"Facility enrichment disabled: {e}")
+            return None
+        return RouterLogEnricher(index)
+
+    def _create_retention(self) -> Optional[RetentionEngine]:
+        """Creates the retention engine for the directories with a retention period."""
+        config = self._config
+        policies: list[RetentionPolicy] = []
+        if config.retention.days > 0:
+            max_age = timedelta(days=config.retention.days)
+            work = config.work_directories
+            policies.extend(
+                RetentionPolicy(directory, max_age)
+                for directory in (work.input, work.current, work.output)
+            )
+            # The processing state is rewritten every tick, but never expires
+            policies.append(RetentionPolicy(work.processed, max_age, exclude=("*.json*",)))
+        if config.retention.capture_days > 0:
+            # Only the capture files and router logs and their index sidecars
+            # expire, other files in these shared directories are kept
+            max_age = timedelta(days=config.retention.capture_days)
+            capture_patterns = CAPTURE_FILE_PATTERNS + tuple(
+                pattern + PCAP_INDEX_SUFFIX for pattern in CAPTURE_FILE_PATTERNS
+            )
+            policies.extend(
+                RetentionPolicy(directory, max_age, capture_patterns, recursive=False)
+                for directory in config.capture_directories
+            )
+            policies.append(RetentionPolicy(
+                config.capture.output_directory,
+                max_age,
+                (ROUTER_LOG_PATTERN, ROUTER_LOG_PATTERN + ROUTER_LOG_INDEX_SUFFIX),
+                recursive=False,
+            ))
+        if not policies:
+            return None
+        return RetentionEngine(
+            policies,
+            self._metrics,
+            RetentionSettings(
+                scan_interval=timedelta(seconds=config.retention.interval_seconds),
+                max_unlinks_per_second=config.retention.max_unlinks_per_second,
+                max_run_time=timedelta(seconds=config.retention.max_seconds_per_tick),
+            ),
+        )
+
+    def _remove_expired_files(self, start_time: float) -> None:
+        """Removes expired files, unless the tick already used its processing interval."""
+        if self._retention is None:
+            return
+        interval = (
+            self._scheduler.interval
+            if self._scheduler is not None
+            else timedelta(seconds=self._config.processing_interval_seconds)
+        )
+        if time.monotonic() - start_time >= interval.total_seconds():
+            return
+        with self._metrics.span("retention"):
+            self._retention.run()
+
+    def _merge_router_logs(self) -> None:
+        """Merges the router logs of the previous and latest capture files of all sources."""
+        merged_log_file = self._config.merge.log_file
+        if merged_log_file is None:
+            return
+        merged_log_file.parent.mkdir(parents=True, exist_ok=True)
+        input_files = [file for source in self._sources for file in source.output_files]
+        self._merger.merge_files(input_files, merged_log_file)
+
+    def _decode_router_log(self) -> None:
+        """Decodes the merged router log and passes new PDUs to Filebeat."""
+        merged_log_file = self._config.merge.log_file
+        if self._decoder is None or merged_log_file is None:
+            return
+        date_time = datetime.now().strftime("%Y%m%d%H%M")
+        filebeat_directory = self._config.decoder.filebeat_directory
+        filebeat_directory.mkdir(parents=True, exist_ok=True)
+        with self._metrics.span("decode"):
+            csv_files = self._decoder.decode(merged_log_file)
+        for stats in self._decoder.process_stats:
+            self._metrics.record_process(stats)
+        if not self._decoder.process_stats or any(
+            stats.exit_code != 0 for stats in self._decoder.process_stats
+        ):
+            self._succeeded = False
+        with self._metrics.span("diff"):
+            for csv_file in csv_files:
+                new_rows = self._differ.diff(
+                    csv_file, filebeat_directory / f"{date_time}_{csv_file.name}"
                 )
-                # Initial Run (PRD 6.1.4)
-                if capture_files.previous:
-                    self._work_area.set_current_file(capture_files.previous)
-                    self._process_current_file()
-
-                self._work_area.set_current_file(capture_files.latest)
-                self._process_current_file()
-            else:
-                self._logger.info(f"Found current capture file: {current_capture_file}")
-                if current_capture_file.name == capture_files.latest.name:
-                    # Steady State: Existing File Updated (PRD 6.1.5)
-                    # Check if size has increased
-                    if (
-                        capture_files.latest.path.stat().st_size
-                        > current_capture_file.path.stat().st_size
-                    ):
-                        self._logger.info(
-                            f"File grew, re-processing: {current_capture_file}"
-                        )
-                        self._work_area.set_current_file(capture_files.latest)
-                        self._process_current_file()
-                else:
-                    # Steady State: New File Detected (PRD 6.1.5)
-                    if capture_files.previous:
-                        if current_capture_file == capture_files.previous:
-                            self._logger.info(
-                                f"Finishing previous file: {capture_files.previous}"
-                            )
-                            # Re-process previous one last time to ensure completion
-                            self._work_area.set_current_file(capture_files.previous)
-                            self._process_current_file()
-                    else:
-                        # Fallback if previous is missing but we have a new latest
-                        pass
-
-                    self._logger.info(f"Moving to new file: {capture_files.latest}")
-                    self._work_area.set_current_file(capture_files.latest)
-                    self._process_current_file()
-
-        return timedelta(seconds=self._config.processing_interval_seconds)
-
-    def _process_current_file(self) -> None:
-        """Helper to trigger processing on the file currently staged in the work area."""
-        current_file = self._work_area.get_current_capture_file()
-        if current_file:
-            # Output file: <name>.log in the configured output directory
-            output_name = current_file.path.with_suffix(".log").name
-            output_path = self._config.work_directories.output / output_name
-            self._processor.process_file(current_file.path, output_path)
+                self._metrics.inc("pdus_rows_total", new_rows,
+                                  "New PDU rows passed to Filebeat", file=csv_file.name)
+
+    def _record_tick(self, elapsed: float, interval: timedelta) -> None:
+        """Records the tick duration and overrun and writes the metrics textfile."""
+        metrics = self._metrics
+        overrun = max(0.0, elapsed - interval.total_seconds())
+        metrics.inc("ticks_total", 1, "Number of processing ticks")
+        metrics.set("tick_duration_seconds", elapsed, "Duration of the last tick")
+        metrics.set("tick_overrun_seconds", overrun,
+                    "Time by which the last tick exceeded the processing interval")
+        if overrun > 0:
+            metrics.inc("tick_overruns_total", 1,
+                        "Number of ticks exceeding the processing interval")
+            self._logger.warning(
+                f"Tick took {elapsed:.1f}s, exceeding the processing interval of "
+                f"{interval.total_seconds():.0f}s"
+            )
+        metrics.set("last_tick_timestamp_seconds", time.time(),
+                    "Unix time at which the last tick completed")
+        for source in self._sources:
+            metrics.set("source_busy", float(self._executor.is_busy(source.name)),
+                        "1 while a source's tasks are still running", source=source.name)
+        if self._config.metrics.textfile:
+            metrics.write_textfile(self._config.metrics.textfile)
+
+
+def run_once(config: Configuration) -> bool:
+    """Runs a single tick of a new `Application`; returns whether it completed."""
+    application = Application(config)
+    try:
+        application.run()
+    finally:
+        application.close()
+    return application.succeeded
@@ -12,6 +12,8 @@ Functionality:
     can interrupt the sleep period.
 - Provides `handle_termination_signal(sig_no)` which marks a shutdown request
     (suitable to be registered as a SIGINT/SIGTERM handler).
+- Optionally starts a `DirectoryWatcher` which wakes the sleeper as soon as
+    new capture data arrives, so the sleep duration acts as a fallback.
 
 The module's responsibility is lifecycle and orchestration of the run loop
 and allows for graceful shutdown of the application.
@@ -21,6 +23,8 @@ from datetime import timedelta
 import logging
 import signal
 import threading
+from typing import Optional
+from atnproc.directory_watcher import DirectoryWatcher
 from atnproc.interruptable_sleeper import InterruptibleSleeper
 from atnproc.runner_interface import RunnerInterface
 
@@ -33,23 +37,32 @@ class ApplicationLoop:
     allowing graceful shutdown via signals.
     """
 
-    def __init__(self, runner: RunnerInterface) -> None:
+    def __init__(
+        self, runner: RunnerInterface, watcher: Optional[DirectoryWatcher] = None
+    ) -> None:
         self._logger: logging.Logger = logging.getLogger(
             self.__class__.__name__)
         self._runner = runner
+        self._watcher = watcher
         self._shutdown_requested: threading.Event = threading.Event()
         self._logger.info("Application initialized")
 
     def start(self) -> None:
         self._logger.info("Application running")
         sleeper = InterruptibleSleeper(self)
+        if self._watcher:
+            self._watcher.start(sleeper.wake)
         while not self._shutdown_requested.is_set():
             self._logger.debug("Run loop iteration starting...")
             sleep_duration: timedelta = self._runner.run()
             self._logger.debug("Run loop iteration finished")
             self._logger.debug(f"Sleeping for {sleep_duration.total_seconds()} seconds...")
-            sleeper.sleep(sleep_duration)
+            if not sleeper.sleep(sleep_duration):
+                self._logger.debug("Sleep ended early")
         self._logger.info("Shutdown requested, exiting application")
+        if self._watcher:
+            self._watcher.close()
+        self._runner.close()
         sleeper.close()
 
     def handle_termination_signal(self, sig_no: int) -> None:
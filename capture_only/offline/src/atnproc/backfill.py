@@ -0,0 +1,173 @@
+"""Historical reprocessing of capture files over a date range.
+
+Contains `Backfill` which discovers every capture file of the configured
+capture directories whose filename date lies in a given range and
+processes them in parallel on a process pool. Each capture file is one
+work unit producing ``<output>/<source>/<name>.log``. The number of units
+in flight is bounded so memory use does not depend on the size of the
+range. Completed units are recorded in a checkpoint file, so an
+interrupted backfill resumes where it stopped.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+
+from atnproc.capture_file import CaptureFile
+from atnproc.capture_file_name import CAPTURE_FILE_PATTERNS
+from atnproc.capture_source import source_names
+from atnproc.config import Configuration
+from atnproc.file_loader import FileLoader
+from atnproc.processing_task import (
+    ProcessingResult,
+    ProcessingTask,
+    execute_tasks,
+    processor_settings,
+)
+
+CHECKPOINT_FILE_NAME = "backfill_checkpoint.json"
+
+
+class _Checkpoint:
+    """The capture files completed by a backfill, saved after each one."""
+
+    def __init__(self, file: Path) -> None:
+        self._file = file
+        self.completed: set[str] = set()
+        if file.is_file():
+            with open(file, encoding="utf-8") as f:
+                self.completed = set(json.load(f)["completed"])
+
+    def add(self, capture_file: Path) -> None:
+        self.completed.add(str(capture_file))
+        tmp_file = self._file.with_name(self._file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"completed": sorted(self.completed)}, f, indent=2)
+        tmp_file.replace(self._file)
+
+
+@dataclass
+class _Progress:
+    total_bytes: int
+    start_time: float = field(default_factory=time.monotonic)
+    done_bytes: int = 0
+    done_packets: int = 0
+
+    def add(self, result: ProcessingResult) -> None:
+        self.done_bytes += result.end_offset
+        self.done_packets += result.stats.packets
+
+    def __str__(self) -> str:
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        return (
+            f"{self.done_bytes / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB, "
+            f"{self.done_bytes / 1e6 / elapsed:.1f} MB/s, "
+            f"{self.done_packets / elapsed:.0f} packets/s"
+        )
+
+
+class Backfill:
+    """Reprocesses all capture files in a date range into a separate tree."""
+
+    def __init__(
+        self,
+        config: Configuration,
+        first_date: date,
+        last_date: date,
+        output_directory: Path,
+        max_workers: int = 0,
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._first_date = first_date
+        self._last_date = last_date
+        self._output_directory = output_directory
+        self._max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self) -> bool:
+        """Runs the backfill; returns True if all work units succeeded."""
+        self._output_directory.mkdir(parents=True, exist_ok=True)
+        checkpoint = _Checkpoint(self._output_directory / CHECKPOINT_FILE_NAME)
+        tasks = [t for t in self._discover() if str(t.capture_file) not in checkpoint.completed]
+        progress = _Progress(sum(t.capture_file.stat().st_size for t in tasks))
+        self._logger.info(
+            f"Backfill {self._first_date} - {self._last_date}: {len(tasks)} file(s), "
+            f"{progress.total_bytes / 1e6:.1f} MB, "
+            f"{len(checkpoint.completed)} already completed"
+        )
+        # The capture archive is typically read-only: do not write index sidecars.
+        settings = processor_settings(self._config, use_index=False)
+
+        succeeded = True
+        remaining = iter(tasks)
+        with ProcessPoolExecutor(max_workers=self._max_workers) as pool:
+            in_flight: dict[Future[list[ProcessingResult]], ProcessingTask] = {}
+            while True:
+                # Keep a bounded number of work units queued.
+                while len(in_flight) < 2 * self._max_workers:
+                    task = next(remaining, None)
+                    if task is None:
+                        break
+                    in_flight[pool.submit(execute_tasks, settings, [task])] = task
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = in_flight.pop(future)
+                    succeeded &= self._complete(task, future, progress, checkpoint)
+                self._logger.info(f"Progress: {progress}")
+        return succeeded
+
+    def _complete(
+        self,
+        task: ProcessingTask,
+        future: Future[list[ProcessingResult]],
+        progress: _Progress,
+        checkpoint: _Checkpoint,
+    ) -> bool:
+        """Records a finished work unit; returns True if it succeeded."""
+        try:
+            result = future.result()[0]
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._logger.error(f"Failed to process {task.capture_file}: {e}")
+            return False
+        if not result.succeeded:
+            self._logger.error(f"Failed to process {task.capture_file}")
+            return False
+        progress.add(result)
+        checkpoint.add(task.capture_file)
+        return True
+
+    def _discover(self) -> list[ProcessingTask]:
+        """Returns one task per capture file in the date range, oldest first."""
+        tasks: list[tuple[CaptureFile, ProcessingTask]] = []
+        directories = self._config.capture_directories
+        for name, directory in zip(source_names(directories), directories):
+            # One directory scan; the date range is applied to the parsed names
+            file_loader = FileLoader([directory])
+            for pattern in CAPTURE_FILE_PATTERNS:
+                file_loader.load_files(pattern)
+            output_directory = self._output_directory / name
+            output_directory.mkdir(exist_ok=True)
+            for path in file_loader.files:
+                try:
+                    capture_file = CaptureFile(path)
+                except ValueError:
+                    self._logger.warning(f"Ignoring file with unexpected name: {path}")
+                    continue
+                if not self._first_date <= capture_file.date <= self._last_date:
+                    continue
+                task = ProcessingTask(
+                    file_name=path.name,
+                    capture_file=path,
+                    output_file=output_directory / f"{capture_file.name.stem}.log",
+                    start_offset=0,
+                )
+                tasks.append((capture_file, task))
+        tasks.sort(key=lambda item: item[0].timestamp)
+        return [task for _, task in tasks]
@@ -0,0 +1,318 @@
+"""Live capture and conversion of ATN traffic into daily router logs.
+
+Contains `CaptureConverter`, a `RunnerInterface` implementation replacing
+the ``atn_capture_convert.sh`` pipeline of the capture_convert PRD. A
+single ``tcpdump -w -`` process captures the ISO-over-IP packets of the
+sniffed address in its own process group; its pcap stream is parsed by a
+`PcapStreamReader` on a reader thread and every batch of packets is
+formatted by `ClnpRecordEmitter` and appended to the router log file of
+the current UTC day.
+
+The router log files are named ``<host>_<interface>_YYYYMMDD_HHMMSS.log``.
+Packets are routed to a file by their capture timestamp, not by the time
+they are read, so packets captured before UTC midnight but read after it
+still go to the old file. At midnight the new file is opened and the old
+one stays open for ``rotation_overlap`` to receive these packets; no
+packet is dropped or written to the wrong day during the switchover.
+Packets arriving even later are appended to the file of their day, which
+is reopened for them, and are counted and logged as late.
+
+Every batch is written to the file as soon as it is read, so tailing
+consumers see a packet within milliseconds of its capture. The data is
+forced to the disk every run, i.e. every ``sync_interval``. The health
+file ``.current_pipeline`` in the output directory holds the process group
+id, the start time and the current output file.
+"""
+
+import logging
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import IO, Callable, Optional
+
+from atnproc.clnp_record_emitter import ClnpRecordEmitter, tcpdump_filter
+from atnproc.pcap_stream_reader import PcapStreamReader
+from atnproc.router_log_writer import RouterLogWriter
+from atnproc.runner_interface import RunnerInterface
+
+HEALTH_FILE_NAME = ".current_pipeline"
+FILE_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+_SECONDS_PER_DAY = 86400
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+# Time tcpdump gets to exit after SIGTERM before it is killed
+_STOP_GRACE_SECONDS = 4.0
+
+
+@dataclass
+class _CaptureStatus:
+    """Start time and counts of the capture, updated by the reader thread."""
+    started_at: datetime
+    packets: int = 0
+    late_packets: int = 0
+    reader_error: Optional[BaseException] = None
+    stopping: bool = False
+
+
+class _DailyFiles:
+    """The router log files of the current and, after midnight, the previous UTC day.
+
+    ``lock`` protects the writers, which the reader thread and run() both use.
+    """
+
+    def __init__(
+        self, directory: Path, prefix: str, rotation_overlap: timedelta, now: datetime
+    ) -> None:
+        self.lock = threading.Lock()
+        self._directory = directory
+        self._prefix = prefix
+        self._rotation_overlap = rotation_overlap
+        self.current = self._open(now)
+        self.previous: Optional[RouterLogWriter] = None
+        self._previous_deadline = 0.0
+
+    def rotate(self, now: datetime) -> None:
+        """Opens the file of the new day; the old one receives late packets for a while."""
+        if self.previous:
+            self.previous.close()
+        self.previous = self.current
+        self._previous_deadline = time.monotonic() + self._rotation_overlap.total_seconds()
+        self.current = self._open(now)
+
+    def close_expired(self) -> Optional[RouterLogWriter]:
+        """Closes the previous file once its overlap ended and returns it."""
+        previous = self.previous
+        if previous is None or time.monotonic() < self._previous_deadline:
+            return None
+        previous.close()
+        self.previous = None
+        return previous
+
+    def for_day(self, day: int) -> Optional[RouterLogWriter]:
+        """Returns the writer for packets captured on the UTC day number ``day``.
+
+        Returns None for a day before the current one whose file was closed.
+        """
+        previous = self.previous
+        if previous and day == previous.start_time.date().toordinal() - _EPOCH_ORDINAL:
+            return previous
+        if day < self.current.start_time.date().toordinal() - _EPOCH_ORDINAL:
+            return None
+        return self.current
+
+    def open_late(self, day: int) -> RouterLogWriter:
+        """Reopens the most recent file of the UTC day number ``day``.
+
+        A new file starting at midnight is created if the day has none.
+        """
+        day_start = datetime.fromtimestamp(day * _SECONDS_PER_DAY, timezone.utc)
+        files = sorted(self._directory.glob(f"{self._prefix}_{day_start:%Y%m%d}_*.log"))
+        if not files:
+            return self._open(day_start)
+        return RouterLogWriter(files[-1], day_start)
+
+    def sync(self) -> None:
+        self.current.sync()
+        if self.previous:
+            self.previous.sync()
+
+    def close(self) -> None:
+        for writer in (self.previous, self.current):
+            if writer:
+                writer.close()
+        self.previous = None
+
+    def _open(self, start_time: datetime) -> RouterLogWriter:
+        name = f"{self._prefix}_{start_time.strftime(FILE_TIMESTAMP_FORMAT)}.log"
+        return RouterLogWriter(self._directory / name, start_time)
+
+
+class CaptureConverter(RunnerInterface):
+    """Captures packets with tcpdump and streams them into daily router logs."""
+
+    def __init__(
+        self,
+        interface: str,
+        filter_ip: str,
+        output_directory: Path,
+        sync_interval: timedelta = timedelta(seconds=1),
+        rotation_overlap: timedelta = timedelta(seconds=10),
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._sync_interval = sync_interval
+        host = socket.gethostname().split(".")[0].split("-")[0]
+        output_directory.mkdir(parents=True, exist_ok=True)
+        self._files = _DailyFiles(
+            output_directory, f"{host}_{interface}", rotation_overlap, datetime.now(timezone.utc)
+        )
+        cmd = [
+            "tcpdump", "-i", interface, "-n", "-U", "--immediate-mode", "-w", "-",
+            tcpdump_filter(filter_ip),
+        ]
+        # pylint: disable-next=consider-using-with
+        self._process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+        )
+        self._status = _CaptureStatus(started_at=datetime.now(timezone.utc))
+        self._logger.info(
+            f"Capture started on {interface} for {filter_ip} with pgid={self._process.pid}"
+        )
+        self._write_health_file()
+        self._stderr_thread = self._start_thread(self._log_stderr, self._process.stderr)
+        self._reader_thread = self._start_thread(
+            self._read_packets, self._process.stdout, filter_ip
+        )
+
+    @property
+    def output_file(self) -> Path:
+        """The router log file receiving the packets of the current day."""
+        return self._files.current.path
+
+    def run(self) -> timedelta:
+        """Syncs and rotates the output files and checks tcpdump is alive.
+
+        Raises RuntimeError if the capture ended without a shutdown request,
+        so the service manager sees the failure.
+        """
+        if not self._reader_thread.is_alive():
+            status = self._process.poll()
+            self.close()
+            raise RuntimeError(
+                f"Capture pipeline pgid={self._process.pid} ended unexpectedly "
+                f"(exit status {status}): {self._status.reader_error or 'end of stream'}"
+            )
+        now = datetime.now(timezone.utc)
+        with self._files.lock:
+            if now.date() != self._files.current.start_time.date():
+                self._rotate(now)
+            closed = self._files.close_expired()
+            if closed:
+                self._logger.info(f"Closing {closed.path.name} ({closed.records} records)")
+            self._files.sync()
+
+        midnight = datetime.combine(
+            now.date() + timedelta(days=1), datetime.min.time(), timezone.utc
+        )
+        return min(self._sync_interval, midnight - now)
+
+    def close(self) -> None:
+        """Stops the capture process group and closes the output files."""
+        if self._status.stopping:
+            return
+        self._status.stopping = True
+        self._logger.info(f"Stopping capture pgid={self._process.pid}")
+        self._signal(signal.SIGTERM)
+        try:
+            self._process.wait(_STOP_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            self._logger.warning(
+                f"Capture did not exit within {_STOP_GRACE_SECONDS}s, killing pgid "
+                f"{self._process.pid}"
+            )
+            self._signal(signal.SIGKILL)
+            self._process.wait()
+        # The reader thread drains the remaining packets and sees the end of stream
+        self._reader_thread.join()
+        self._stderr_thread.join()
+        for stream in (self._process.stdout, self._process.stderr):
+            if stream:
+                stream.close()
+        with self._files.lock:
+            self._files.close()
+        try:
+            self._health_file.unlink()
+        except FileNotFoundError:
+            pass
+        self._logger.info(
+            f"Capture stopped after {self._status.packets} packets "
+            f"({self._status.late_packets} late)"
+        )
+
+    @property
+    def _health_file(self) -> Path:
+        return self._files.current.path.with_name(HEALTH_FILE_NAME)
+
+    def _rotate(self, now: datetime) -> None:
+        self._files.rotate(now)
+        previous = self._files.previous
+        assert previous is not None
+        self._logger.info(
+            f"Day change, rotated {previous.path.name} ({previous.records} records) "
+            f"to {self._files.current.path.name}"
+        )
+        self._write_health_file()
+
+    def _read_packets(self, stdout: IO[bytes], filter_ip: str) -> None:
+        """Converts the packets of the capture stream until it ends."""
+        reader = PcapStreamReader(stdout)
+        emitter: Optional[ClnpRecordEmitter] = None
+        try:
+            for records in reader.batches():
+                if emitter is None:
+                    emitter = ClnpRecordEmitter(filter_ip, reader.link_type)
+                # Lines per UTC day number, normally a single day
+                lines: dict[int, list[str]] = {}
+                for record in records:
+                    line = emitter.format(record)
+                    if line is not None:
+                        lines.setdefault(record.ts_sec // _SECONDS_PER_DAY, []).append(line)
+                with self._files.lock:
+                    for day, day_lines in lines.items():
+                        writer = self._files.for_day(day)
+                        if writer is None:
+                            self._write_late(day, day_lines)
+                        else:
+                            writer.write(day_lines)
+                            writer.flush()
+                        self._status.packets += len(day_lines)
+        except (OSError, ValueError) as e:
+            self._status.reader_error = e
+            self._logger.error(f"Reading the capture stream failed: {e}")
+
+    def _write_late(self, day: int, lines: list[str]) -> None:
+        """Appends packets of a day whose file was already closed to that file."""
+        writer = self._files.open_late(day)
+        try:
+            writer.write(lines)
+        finally:
+            writer.close()
+        self._status.late_packets += len(lines)
+        self._logger.warning(
+            f"Appended {len(lines)} late packet(s) of {writer.start_time:%Y-%m-%d} "
+            f"to {writer.path.name}"
+        )
+
+    def _write_health_file(self) -> None:
+        """Atomically replaces the health file with the current pipeline state."""
+        temp_file = self._health_file.with_suffix(".tmp")
+        temp_file.write_text(
+            f"pgid={self._process.pid} "
+            f"started_at={self._status.started_at.strftime(FILE_TIMESTAMP_FORMAT)} "
+            f"outfile={self._files.current.path}\n",
+            encoding="utf-8",
+        )
+        os.replace(temp_file, self._health_file)
+
+    def _log_stderr(self, stderr: IO[bytes]) -> None:
+        """Logs the diagnostics of tcpdump, e.g. its drop counts on exit."""
+        for line in stderr:
+            self._logger.info(f"tcpdump: {line.decode(errors='replace').rstrip()}")
+
+    def _signal(self, sig: int) -> None:
+        try:
+            # tcpdump leads its own session, see __init__()
+            os.killpg(self._process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    @staticmethod
+    def _start_thread(target: Callable[..., None], *args: object) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
@@ -44,3 +44,6 @@ class CaptureFile:
 
     def __hash__(self) -> int:
         return hash(self.path)
+
+    def __str__(self) -> str:
+        return str(self._file)
@@ -10,10 +10,16 @@ where:
 - <count> is a numeric counter.
 - <date> is the date in YYYYMMDD format.
 - <time> is the time in HHMMSS format.
+
+Besides ``.pcap``, the compressed ``.pcap.gz`` and ``.pcap.zst`` and the
+pcapng ``.pcapng`` suffixes are recognized.
 """
 
 from datetime import datetime, date
 
+CAPTURE_FILE_SUFFIXES = (".pcap", ".pcap.gz", ".pcap.zst", ".pcapng")
+CAPTURE_FILE_PATTERNS = tuple(f"*{suffix}" for suffix in CAPTURE_FILE_SUFFIXES)
+
 
 class CaptureFileName:
     """Represents a capture file name and provides access to the file's
@@ -25,11 +31,28 @@ class CaptureFileName:
 
     def __init__(self, file_name: str):
         self._file_name: str = file_name
-        file_stem = file_name.rsplit('.', 1)[0]
-        timestamp_str = file_stem.rsplit('_', 1)[-1]
-        self._timestamp: datetime = datetime.strptime(
-            timestamp_str, f"{self.date_format()}{self.time_format()}"
-        )
+        self._stem: str = file_name.rsplit('.', 1)[0]
+        for suffix in CAPTURE_FILE_SUFFIXES:
+            if file_name.endswith(suffix):
+                self._stem = file_name[:-len(suffix)]
+                break
+        timestamp_str = self._stem.rsplit('_', 1)[-1]
+        self._timestamp: datetime = self._parse_timestamp(timestamp_str)
+
+    @classmethod
+    def _parse_timestamp(cls, timestamp_str: str) -> datetime:
+        """Parses a YYYYMMDDHHMMSS timestamp.
+
+        The fixed-width fields are sliced directly, which is much faster
+        than ``strptime``; other strings are left to ``strptime``, which
+        raises ValueError if they do not match the format either.
+        """
+        if len(timestamp_str) == 14 and timestamp_str.isdigit():
+            return datetime(
+                int(timestamp_str[0:4]), int(timestamp_str[4:6]), int(timestamp_str[6:8]),
+                int(timestamp_str[8:10]), int(timestamp_str[10:12]), int(timestamp_str[12:14]),
+            )
+        return datetime.strptime(timestamp_str, f"{cls.date_format()}{cls.time_format()}")
 
     @staticmethod
     def date_format() -> str:
@@ -51,9 +74,14 @@ class CaptureFileName:
 
     @property
     def name(self) -> str:
-        """Returns the name of the file (stem)."""
+        """Returns the name of the file."""
         return self._file_name
 
+    @property
+    def stem(self) -> str:
+        """Returns the name of the file without the capture file suffix."""
+        return self._stem
+
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, CaptureFileName):
             return NotImplemented
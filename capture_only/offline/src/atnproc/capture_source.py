@@ -0,0 +1,311 @@
+"""Per-router capture file selection and processing state.
+
+Contains `CaptureSource` which applies the file selection logic of PRD
+6.1 to the capture directory of a single ATN router. Each tick it stages
+the recent capture files into the source's own work area and plans the
+`ProcessingTask` list for that router; the results of those tasks are fed
+back through `CaptureSource.complete()`.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from atnproc.capture_file import CaptureFile
+from atnproc.capture_file_name import CaptureFileName
+from atnproc.config import Configuration
+from atnproc.directory_index import DirectoryIndex
+from atnproc.metrics import Metrics
+from atnproc.packet_processor import address_output_file
+from atnproc.file_stager import FileFingerprint
+from atnproc.processing_state import ProcessingState
+from atnproc.processing_task import ProcessingResult, ProcessingTask
+from atnproc.recent_capture_file_loader import RecentCaptureFileLoader
+from atnproc.recent_capture_files import RecentCaptureFiles
+from atnproc.router_log_enricher import RouterLogEnricher
+from atnproc.router_log_index import RouterLogIndex
+from atnproc.tick_scheduler import SourceProgress
+from atnproc.work_area import WorkArea, migrate_shared_work_area
+
+
+def source_names(directories: list[Path]) -> list[str]:
+    """Returns a short unique name for each capture directory.
+
+    Uses the smallest number of trailing path components that makes all
+    names unique, e.g. ``atnr01-tds-fep_captures``.
+    """
+    max_parts = max((len(d.parts) for d in directories), default=1)
+    for num_parts in range(1, max_parts + 1):
+        names = ["_".join(d.parts[-num_parts:]).lstrip("/") for d in directories]
+        if len(set(names)) == len(names):
+            return names
+    return [str(d) for d in directories]
+
+
+# Holds the collaborators of one source, one attribute each
+class CaptureSource:  # pylint: disable=too-many-instance-attributes
+    """The capture files of one ATN router and their processing state."""
+
+    def __init__(
+        self,
+        name: str,
+        directory: Path,
+        config: Configuration,
+        metrics: Metrics,
+        enricher: Optional[RouterLogEnricher] = None,
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(
+            f"{self.__class__.__name__}.{name}"
+        )
+        self._name = name
+        self._directory = directory
+        self._config = config
+        self._metrics = metrics
+        self._enricher = enricher
+        self._directories = config.work_directories.for_source(name)
+        migrate_shared_work_area(config.work_directories, self._directories, directory)
+        self._state = ProcessingState(self._directories.processed / "state.json")
+        self._work_area = WorkArea(
+            self._directories,
+            incremental_staging=config.processing.incremental_staging,
+            current_file_name=self._state.current_file,
+        )
+        self._directory_index = DirectoryIndex()
+        # The previous and latest capture file, whose router logs are decoded
+        self._log_files: list[CaptureFile] = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def output_files(self) -> list[Path]:
+        """The existing router logs of the previous and latest capture file."""
+        files = [self._output_file(str(file.name)) for file in self._log_files]
+        return [file for file in files if file.is_file()]
+
+    def progress(self) -> Optional[SourceProgress]:
+        """Returns the size and processed part of the latest capture file."""
+        if not self._log_files:
+            return None
+        latest = self._log_files[-1]
+        file_name = str(latest.name)
+        try:
+            size = latest.path.stat().st_size
+        except OSError:
+            return None
+        return SourceProgress(self._name, file_name, size, self._state.file(file_name).offset)
+
+    def plan(self) -> list[ProcessingTask]:
+        """Stages the recent capture files and returns the tasks for this tick."""
+        with self._metrics.span("discover"):
+            file_loader = RecentCaptureFileLoader([self._directory], self._directory_index)
+            capture_files = RecentCaptureFiles(file_loader.files)
+        with self._metrics.span("stage"):
+            self._work_area.ingest_files(capture_files.files)
+            selected_files = self._select_files(capture_files)
+        self._log_files = [f for f in (capture_files.previous, capture_files.latest) if f]
+        recent = {str(file.name): file for file in capture_files.recent_files}
+        self._state.retain(recent)
+        # Files whose processing was planned but not completed, also before a restart
+        to_process = [recent[name] for name in self._state.pending]
+        for capture_file in selected_files:
+            if capture_file not in to_process:
+                to_process.append(capture_file)
+        to_process.sort(key=lambda file: file.timestamp)
+        tasks = [self._create_task(file) for file in to_process]
+        current_file = self._work_area.get_current_capture_file()
+        self._state.current_file = str(current_file.name) if current_file else None
+        self._state.pending = [str(file.name) for file in to_process]
+        self._state.save()
+        return tasks
+
+    def complete(self, results: list[ProcessingResult]) -> None:
+        """Records the results of the tasks returned by :meth:`plan`."""
+        for result in results:
+            self._record_metrics(result)
+            if not result.succeeded:
+                self._logger.error(f"Processing {result.file_name} failed, will retry")
+                continue
+            if result.file_name in self._state.pending:
+                self._state.pending.remove(result.file_name)
+            file_state = self._state.file(result.file_name)
+            enriched_size = file_state.output_size if result.start_offset > 0 else 0
+            file_state.offset = result.end_offset
+            file_state.output_size = self._output_file(result.file_name).stat().st_size
+            file_state.address_output_sizes = {
+                filter_ip: file.stat().st_size
+                for filter_ip, file in self._address_output_files(result.file_name).items()
+                if file.exists()
+            }
+            self._update_indexes(result)
+            self._enrich(result.file_name, enriched_size)
+        if results:
+            self._state.save()
+
+    def _update_indexes(self, result: ProcessingResult) -> None:
+        """Extends the time and address indexes of the router logs of a result."""
+        output_file = self._output_file(result.file_name)
+        for log_file in [output_file, *self._address_output_files(result.file_name).values()]:
+            if not log_file.exists():
+                continue
+            try:
+                index = RouterLogIndex(log_file)
+                if result.start_offset == 0:
+                    # The router log was rewritten
+                    index.reset()
+                index.update()
+            except OSError as e:
+                self._logger.error(f"Failed to index {log_file}: {e}")
+
+    def _enrich(self, file_name: str, start_offset: int) -> None:
+        """Writes the router log records from ``start_offset`` on with facilities."""
+        enriched_log_directory = self._config.enrichment.log_directory
+        if self._enricher is None or enriched_log_directory is None:
+            return
+        output_file = self._output_file(file_name)
+        try:
+            records = self._enricher.enrich(
+                output_file, start_offset, enriched_log_directory / output_file.name
+            )
+        except OSError as e:
+            self._logger.error(f"Failed to enrich {output_file}: {e}")
+            return
+        self._metrics.inc("enriched_records_total", records,
+                          "Router log records written with facilities", source=self._name)
+
+    def _record_metrics(self, result: ProcessingResult) -> None:
+        metrics = self._metrics
+        stats = result.stats
+        metrics.inc("input_bytes_total", result.end_offset - result.start_offset,
+                    "Capture file bytes processed", source=self._name)
+        metrics.inc("output_bytes_total", stats.output_bytes,
+                    "Router log bytes written", source=self._name)
+        metrics.inc("packets_total", stats.packets,
+                    "Packets read (native engine only)", source=self._name)
+        metrics.inc("records_total", stats.records,
+                    "Router log records written (native engine only)", source=self._name)
+        metrics.inc("task_seconds_total", result.elapsed_seconds,
+                    "Time spent processing capture files", source=self._name)
+        if not result.succeeded:
+            metrics.inc("task_failures_total", 1, "Failed processing tasks", source=self._name)
+        for process_stats in stats.process_stats:
+            metrics.record_process(process_stats)
+        for pipe_stats in stats.pipe_stats:
+            metrics.record_pipe(pipe_stats)
+        if stats.reassembly is not None:
+            reassembly = stats.reassembly
+            metrics.inc("reassembled_pdus_total", reassembly.reassembled,
+                        "Segmented CLNP PDUs written reassembled", source=self._name)
+            for outcome in ("timed_out", "evicted", "incomplete", "invalid"):
+                metrics.inc("unreassembled_segments_total", getattr(reassembly, outcome),
+                            "CLNP segments written as is, by reason",
+                            source=self._name, reason=outcome)
+
+    def _select_files(self, capture_files: RecentCaptureFiles) -> list[CaptureFile]:
+        """Determines the capture files to process (PRD 6.1.4 and 6.1.5)."""
+        latest = capture_files.latest
+        previous = capture_files.previous
+        if not latest:
+            return []
+        current_capture_file = self._work_area.get_current_capture_file()
+        if not current_capture_file:
+            self._logger.info(f"No current capture file. Initializing with: {latest}")
+            # Initial Run (PRD 6.1.4)
+            self._work_area.set_current_file(latest)
+            return [f for f in (previous, latest) if f]
+
+        self._logger.info(f"Found current capture file: {current_capture_file}")
+        if current_capture_file.name == latest.name:
+            # Steady State: Existing File Updated (PRD 6.1.5)
+            # Check if size has increased
+            if latest.path.stat().st_size > current_capture_file.path.stat().st_size:
+                self._logger.info(f"File grew, re-processing: {current_capture_file}")
+                self._work_area.set_current_file(latest)
+                return [latest]
+            return []
+
+        # Steady State: New File Detected (PRD 6.1.5)
+        files: list[CaptureFile] = []
+        if previous and current_capture_file.name == previous.name:
+            self._logger.info(f"Finishing previous file: {previous}")
+            # Re-process previous one last time to ensure completion
+            files.append(previous)
+        self._logger.info(f"Moving to new file: {latest}")
+        self._work_area.set_current_file(latest)
+        files.append(latest)
+        return files
+
+    def _create_task(self, capture_file: CaptureFile) -> ProcessingTask:
+        """Creates the task processing the staged copy of ``capture_file``.
+
+        In incremental mode processing resumes from the offset recorded for
+        the file and only the new records are appended to the output file.
+        """
+        file_name = str(capture_file.name)
+        output_file = self._output_file(file_name)
+        start_offset = 0
+        if self._config.processing.incremental and output_file.exists():
+            start_offset = self._resume_offset(capture_file, output_file)
+        fingerprint = FileFingerprint.of(capture_file.path)
+        file_state = self._state.file(file_name)
+        file_state.inode, file_state.size, file_state.mtime_ns = fingerprint
+        return ProcessingTask(
+            file_name=file_name,
+            capture_file=self._staged_file(capture_file),
+            output_file=output_file,
+            start_offset=start_offset,
+        )
+
+    def _resume_offset(self, capture_file: CaptureFile, output_file: Path) -> int:
+        """Returns the offset to resume processing from, 0 to start over.
+
+        Truncates the router log to the size recorded with the offset, which
+        removes records appended by a run that did not complete.
+        """
+        file_name = str(capture_file.name)
+        file_state = self._state.file(file_name)
+        fingerprint = FileFingerprint.of(capture_file.path)
+        if file_state.inode and (
+            fingerprint.inode != file_state.inode or fingerprint.size < file_state.size
+        ):
+            self._logger.warning(f"{file_name} was replaced, processing from the start")
+            self._state.reset(file_name)
+            return 0
+        output_size = output_file.stat().st_size
+        if output_size < file_state.output_size:
+            self._logger.warning(
+                f"{output_file} is shorter than recorded, processing from the start"
+            )
+            self._state.reset(file_name)
+            return 0
+        if output_size > file_state.output_size:
+            self._logger.warning(
+                f"Removing {output_size - file_state.output_size} bytes of incomplete "
+                f"output from {output_file}"
+            )
+            os.truncate(output_file, file_state.output_size)
+        for filter_ip, file in self._address_output_files(file_name).items():
+            size = file_state.address_output_sizes.get(filter_ip)
+            if size is not None and file.exists() and file.stat().st_size > size:
+                os.truncate(file, size)
+        return file_state.offset
+
+    def _output_file(self, file_name: str) -> Path:
+        # Output file: <name>.log in the configured output directory
+        return self._directories.output / f"{CaptureFileName(file_name).stem}.log"
+
+    def _address_output_files(self, file_name: str) -> dict[str, Path]:
+        """Returns the router logs of the further sniffed addresses, by address."""
+        output_file = self._output_file(file_name)
+        return {
+            filter_ip: address_output_file(output_file, filter_ip)
+            for filter_ip in self._config.filter_ips[1:]
+        }
+
+    def _staged_file(self, capture_file: CaptureFile) -> Path:
+        staged_file = self._directories.input / str(capture_file.name)
+        if staged_file.is_file():
+            return staged_file
+        return capture_file.path
@@ -0,0 +1,87 @@
+"""Sequential access to compressed and pcapng capture files.
+
+Compressed (``.pcap.gz``, ``.pcap.zst``) and pcapng (``.pcapng``) capture
+files cannot be processed from a byte offset like a growing ``.pcap``
+file: they are rotated ring-buffer files that are complete when they
+appear and are always read from the start as a stream. The data is
+decompressed on the fly, no uncompressed copy is written.
+
+gzip is decompressed with the standard library. zstd uses the optional
+``zstandard`` package if installed and the ``zstd`` command otherwise.
+"""
+
+import gzip
+import subprocess
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import IO, Iterator, cast
+
+GZIP_SUFFIX = ".gz"
+ZSTD_SUFFIX = ".zst"
+PCAPNG_SUFFIX = ".pcapng"
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def is_stream_format(file: Path) -> bool:
+    """Returns True if ``file`` must be read as a stream from the start."""
+    return file.suffix in (GZIP_SUFFIX, ZSTD_SUFFIX, PCAPNG_SUFFIX)
+
+
+@contextmanager
+def open_capture_stream(file: Path) -> Iterator[IO[bytes]]:
+    """Opens ``file`` for reading its uncompressed content.
+
+    Raises OSError if the file cannot be read or decompressed; a truncated
+    compressed file raises EOFError when the end is read.
+    """
+    with ExitStack() as stack:
+        stream: IO[bytes]
+        if file.suffix == GZIP_SUFFIX:
+            stream = cast(IO[bytes], stack.enter_context(gzip.open(file, "rb")))
+        elif file.suffix == ZSTD_SUFFIX:
+            stream = stack.enter_context(_open_zstd(file))
+        else:
+            stream = stack.enter_context(open(file, "rb"))
+        yield stream
+
+
+def iter_capture_stream(file: Path, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields the uncompressed content of ``file`` in chunks."""
+    with open_capture_stream(file) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+@contextmanager
+def _open_zstd(file: Path) -> Iterator[IO[bytes]]:
+    with ExitStack() as stack:
+        try:
+            # pylint: disable-next=import-outside-toplevel
+            import zstandard  # type: ignore[import-untyped, import-not-found, unused-ignore]
+        except ImportError:
+            stream = stack.enter_context(_run_zstd(file))
+        else:
+            f = stack.enter_context(open(file, "rb"))
+            stream = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(f))
+        yield stream
+
+
+@contextmanager
+def _run_zstd(file: Path) -> Iterator[IO[bytes]]:
+    """Decompresses ``file`` with the ``zstd`` command."""
+    with subprocess.Popen(
+        ["zstd", "-dc", str(file)], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as proc:
+        assert proc.stdout is not None and proc.stderr is not None
+        try:
+            yield proc.stdout
+        finally:
+            proc.stdout.close()
+            error = proc.stderr.read().decode(errors="replace").strip()
+            exit_code = proc.wait()
+        if exit_code != 0:
+            raise OSError(f"zstd failed for {file} (exit code {exit_code}): {error}")
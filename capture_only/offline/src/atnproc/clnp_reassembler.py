@@ -0,0 +1,270 @@
+"""Streaming reassembly of segmented CLNP PDUs.
+
+Contains `ClnpReassembler` which sits between `ClnpRecordEmitter` and the
+router log: packets are added in capture order and their router log lines
+are returned in the same order, except that the segments of a segmented
+CLNP PDU (ISO 8473 segmentation part present, more-segments flag set or a
+non-zero segment offset) are replaced by a single line holding the
+reassembled PDU, at the position of the first segment received.
+
+Segments belong to the same PDU if their data unit identifier, source and
+destination NSAP are equal. The reassembled PDU has the header of the
+segment at offset 0 with the more-segments flag cleared, the segment
+length set to the total length and the checksum set to 0 (not used).
+
+A PDU that is not complete when no segment has arrived for the timeout of
+its `ReassemblySettings`, or that is evicted because the buffered data
+exceeds their ``max_bytes``
+(least recently updated first), is written as its original segment lines,
+as is a PDU still incomplete at :meth:`flush`. Lines following a pending
+PDU are held back so the output stays in time order; they count towards
+``max_bytes`` as well, so memory stays bounded however many PDUs are open.
+"""
+
+import struct
+from collections import OrderedDict, deque
+from dataclasses import astuple, dataclass
+from typing import Optional
+
+from atnproc.clnp_record_emitter import ClnpRecordEmitter
+from atnproc.pcap_reader import PcapRecord
+
+_CLNP_NLPID = 0x81
+_IPV4_BASIC_HEADER = 0x45
+_IP_HEADER_LENGTH = 20
+_MAX_IP_LENGTH = 65535
+_SEGMENTATION_PERMITTED = 0x80
+_MORE_SEGMENTS = 0x40
+
+FlowKey = tuple[int, bytes, bytes]
+
+
+@dataclass(frozen=True)
+class ReassemblySettings:
+    """Limits of the data a :class:`ClnpReassembler` holds back."""
+    timeout_seconds: float = 30.0
+    """Time without a new segment after which the segments of an incomplete
+    PDU are written as is."""
+    max_bytes: int = 16_000_000
+    """Limit of the data buffered for reassembly per router log."""
+
+
+@dataclass(frozen=True)
+class ReassemblyStats:
+    """Outcome of the segments added to a :class:`ClnpReassembler`."""
+    segments: int = 0
+    """Segments added."""
+    reassembled: int = 0
+    """Whole PDUs emitted."""
+    timed_out: int = 0
+    """Segments written as is because their PDU timed out."""
+    evicted: int = 0
+    """Segments written as is to stay within the memory limit."""
+    incomplete: int = 0
+    """Segments written as is because their PDU was incomplete at the end."""
+    invalid: int = 0
+    """Segments written as is because their PDU was inconsistent."""
+
+    def __add__(self, other: "ReassemblyStats") -> "ReassemblyStats":
+        return ReassemblyStats(*(a + b for a, b in zip(astuple(self), astuple(other))))
+
+
+class _Slot:
+    """Position of a line in the output; ``None`` while its PDU is pending."""
+    __slots__ = ("line", "size")
+
+    def __init__(self, line: Optional[str], size: int) -> None:
+        self.line = line
+        self.size = size
+        """Bytes buffered for the slot."""
+
+
+@dataclass
+class _Segment:
+    slot: _Slot
+    line: str
+    offset: int
+    data: bytes
+
+
+class _Flow:
+    """The segments received of one PDU."""
+
+    def __init__(self, last_time: float) -> None:
+        self.last_time = last_time
+        self.segments: list[_Segment] = []
+        self.first: Optional[tuple[PcapRecord, bytes, bytes]] = None
+        """Record, IPv4 header and CLNP header of the segment at offset 0."""
+        self.total_length = 0
+        self.end = -1
+        """Data length, known once the last segment was received."""
+
+
+class ClnpReassembler:
+    """Reassembles segmented CLNP PDUs of a time-ordered packet stream."""
+
+    def __init__(
+        self, emitter: ClnpRecordEmitter, settings: ReassemblySettings = ReassemblySettings()
+    ) -> None:
+        self._emitter = emitter
+        self._settings = settings
+        self._queue: deque[_Slot] = deque()
+        self._bytes = 0
+        """Bytes buffered in the queue."""
+        self._ready: list[str] = []
+        # Least recently updated first
+        self._flows: OrderedDict[FlowKey, _Flow] = OrderedDict()
+        self._counts = dict.fromkeys(
+            ("segments", "reassembled", "timed_out", "evicted", "incomplete", "invalid"), 0
+        )
+
+    @property
+    def stats(self) -> ReassemblyStats:
+        return ReassemblyStats(**self._counts)
+
+    @property
+    def open_flows(self) -> int:
+        return len(self._flows)
+
+    def add(self, record: PcapRecord, packet: bytes | memoryview) -> None:
+        """Adds the IPv4 ``packet`` of ``record``, matched by the emitter's filter."""
+        line = self._emitter.format_packet(record, packet)
+        if line is None:
+            return
+        time = record.ts_sec + record.ts_usec / 1e6
+        self._expire(time)
+        segment = self._parse_segment(packet)
+        if segment is None:
+            self._append(line, len(line))
+            self._drain()
+            return
+        key, flags, offset, total_length, header_length = segment
+        self._counts["segments"] += 1
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = _Flow(time)
+            self._flows[key] = flow
+        else:
+            flow.last_time = time
+            self._flows.move_to_end(key)
+        pdu = bytes(packet[_IP_HEADER_LENGTH:])
+        data = pdu[header_length:]
+        slot = self._append(None, len(line) + len(data))
+        flow.segments.append(_Segment(slot, line, offset, data))
+        if offset == 0:
+            flow.first = (record, bytes(packet[:_IP_HEADER_LENGTH]), pdu[:header_length])
+            flow.total_length = total_length
+        if not flags & _MORE_SEGMENTS:
+            flow.end = offset + len(data)
+        self._complete(key, flow)
+        self._drain()
+        while self._bytes > self._settings.max_bytes and self._flows:
+            self._release_flow(next(iter(self._flows)), "evicted")
+            self._drain()
+
+    def lines(self) -> list[str]:
+        """Returns the lines that are no longer held back, in order."""
+        lines = self._ready
+        self._ready = []
+        return lines
+
+    def flush(self) -> list[str]:
+        """Writes the segments of the incomplete PDUs as is and returns all lines."""
+        while self._flows:
+            self._release_flow(next(iter(self._flows)), "incomplete")
+        self._drain()
+        return self.lines()
+
+    def _append(self, line: Optional[str], size: int) -> _Slot:
+        slot = _Slot(line, size)
+        self._queue.append(slot)
+        self._bytes += size
+        return slot
+
+    def _drain(self) -> None:
+        """Moves the lines at the head of the queue that are complete to the output."""
+        queue = self._queue
+        while queue and queue[0].line is not None:
+            slot = queue.popleft()
+            self._bytes -= slot.size
+            if slot.line:
+                self._ready.append(slot.line)
+
+    def _expire(self, time: float) -> None:
+        deadline = time - self._settings.timeout_seconds
+        while self._flows:
+            key, flow = next(iter(self._flows.items()))
+            if flow.last_time >= deadline:
+                break
+            self._release_flow(key, "timed_out")
+
+    def _release_flow(self, key: FlowKey, reason: str) -> None:
+        """Writes the segments of a PDU as is."""
+        flow = self._flows.pop(key)
+        for segment in flow.segments:
+            segment.slot.line = segment.line
+        self._counts[reason] += len(flow.segments)
+
+    def _complete(self, key: FlowKey, flow: _Flow) -> None:
+        """Replaces the segments by the PDU once all data was received."""
+        if flow.first is None or flow.end < 0:
+            return
+        segments = sorted(flow.segments, key=lambda s: s.offset)
+        data = bytearray()
+        for segment in segments:
+            if segment.offset > len(data):
+                return  # A gap, more segments to come
+            data += segment.data[len(data) - segment.offset:]
+        if len(data) < flow.end:
+            return
+        record, ip_header, clnp_header = flow.first
+        ip_length = _IP_HEADER_LENGTH + len(clnp_header) + len(data)
+        if len(clnp_header) + len(data) != flow.total_length or ip_length > _MAX_IP_LENGTH:
+            self._release_flow(key, "invalid")
+            return
+        header = bytearray(clnp_header)
+        header[4] &= ~_MORE_SEGMENTS & 0xFF
+        struct.pack_into("!HH", header, 5, flow.total_length, 0)
+        packet = ip_header[:2] + struct.pack("!H", ip_length) + ip_header[4:] + header + data
+        line = self._emitter.format_packet(record, packet)
+        self._flows.pop(key)
+        self._counts["reassembled"] += 1
+        flow.segments[0].slot.line = line or ""
+        for segment in flow.segments[1:]:
+            segment.slot.line = ""
+
+    @staticmethod
+    def _parse_segment(
+        packet: bytes | memoryview,
+    ) -> Optional[tuple[FlowKey, int, int, int, int]]:
+        """Returns key, flags, segment offset, total length and header length.
+
+        Returns None unless ``packet`` carries a CLNP PDU that is a segment.
+        """
+        if (
+            len(packet) < _IP_HEADER_LENGTH + 10
+            or packet[0] != _IPV4_BASIC_HEADER
+            or packet[_IP_HEADER_LENGTH] != _CLNP_NLPID
+        ):
+            return None
+        pdu = packet[_IP_HEADER_LENGTH:]
+        header_length = pdu[1]
+        flags = pdu[4]
+        if not flags & _SEGMENTATION_PERMITTED or header_length > len(pdu):
+            return None
+        position = 9
+        destination_length = pdu[position]
+        destination = bytes(pdu[position + 1:position + 1 + destination_length])
+        position += 1 + destination_length
+        if position >= header_length:
+            return None
+        source_length = pdu[position]
+        source = bytes(pdu[position + 1:position + 1 + source_length])
+        position += 1 + source_length
+        if position + 6 > header_length:
+            return None
+        identifier, offset, total_length = struct.unpack_from("!HHH", pdu, position)
+        if not flags & _MORE_SEGMENTS and offset == 0:
+            # The whole PDU in a single segment
+            return None
+        return (identifier, source, destination), flags, offset, total_length, header_length
@@ -0,0 +1,200 @@
+"""Conversion of captured packets into Airtel router log records.
+
+This module provides :class:`ClnpRecordEmitter`, an in-process replacement
+for the ``tcpdump -n -e -x -tttt '<filter>' | awk -f rtcd_routerlog.awk``
+text pipeline (PRD 6.2), where the filter matches ``ip host X and proto
+80`` in untagged and single VLAN tagged frames. It applies the packet
+filter on the raw header bytes and formats matching packets exactly like
+the awk script does:
+
+    ROUTER CLNS_DT_PDU <date> <time.msec> <SENT|RCVD> <length> <remote ip> <CLNP PDU hex>
+
+:class:`ClnpRecordDispatcher` does the same for several sniffed addresses
+while parsing every packet only once.
+"""
+
+import socket
+import struct
+import time
+from typing import Optional, Sequence
+
+from atnproc.pcap_reader import PcapRecord
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+_IP_PROTO_ISO = 80
+_IPV4_BASIC_HEADER = 0x45
+_CLNP_NLPID = 0x81
+
+
+def tcpdump_filter(filter_ip: str) -> str:
+    """Returns the tcpdump filter matching the packets :class:`ClnpRecordEmitter` accepts.
+
+    The ``vlan`` alternative matches frames with a single VLAN tag. As
+    ``vlan`` shifts the offsets of the primitives that follow it, the
+    untagged alternative must come first.
+    """
+    match = f"ip host {filter_ip} and proto 80"
+    return f"({match}) or (vlan and {match})"
+
+
+class ClnpRecordEmitter:
+    """Filters ISO-over-IP packets for a sniffed address and formats them.
+
+    Matches the behaviour of ``rtcd_routerlog.awk``: the direction is SENT
+    when the sniffed address is the IP source, the length is the IP payload
+    length, and the IPv4 header is replaced by the remote address when the
+    packet has a basic 20 byte header followed by a CLNP PDU. Packets with
+    IP options or a truncated capture are dropped, as the awk script never
+    completes them.
+    """
+
+    def __init__(self, filter_ip: str, link_type: int) -> None:
+        try:
+            self._sniffed_address: bytes = socket.inet_aton(filter_ip)
+        except OSError as e:
+            raise ValueError(f"Invalid filter IP address: '{filter_ip}'") from e
+        if link_type == LINKTYPE_ETHERNET:
+            self._link_header_length = 14
+        elif link_type == LINKTYPE_LINUX_SLL:
+            self._link_header_length = 16
+        elif link_type == LINKTYPE_RAW:
+            self._link_header_length = 0
+        else:
+            raise ValueError(f"Unsupported pcap link type: {link_type}")
+        self._link_type = link_type
+        self._cached_second: int = -1
+        self._cached_time: str = ""
+        self._addresses: dict[bytes | memoryview, str] = {}
+
+    @property
+    def sniffed_address(self) -> bytes:
+        return self._sniffed_address
+
+    def iso_packet(self, data: bytes | memoryview) -> Optional[bytes | memoryview]:
+        """Returns the IPv4 packet of an ISO-over-IP frame, else None.
+
+        Implements ``proto 80`` on the raw frame bytes, also behind a single
+        802.1Q/802.1ad VLAN tag like the ``vlan`` alternative of the tcpdump
+        filter; frames with stacked tags do not match. The addresses are
+        not checked.
+        """
+        offset = self._link_header_length
+        if self._link_type != LINKTYPE_RAW:
+            ethertype = int.from_bytes(data[offset - 2:offset], "big")
+            if ethertype in _ETHERTYPE_VLAN:
+                offset += 4
+                ethertype = int.from_bytes(data[offset - 2:offset], "big")
+            if ethertype != _ETHERTYPE_IPV4:
+                return None
+        if len(data) < offset + 20 or data[offset + 9] != _IP_PROTO_ISO:
+            return None
+        total_length: int = struct.unpack_from("!H", data, offset + 2)[0]
+        return data[offset:offset + total_length]
+
+    def ip_packet(self, data: bytes | memoryview) -> Optional[bytes | memoryview]:
+        """Returns the IPv4 packet of a frame matching the filter, else None.
+
+        Implements ``ip host <filter_ip> and proto 80`` on the raw frame
+        bytes, untagged or behind a single VLAN tag.
+        """
+        packet = self.iso_packet(data)
+        if packet is None or self._sniffed_address not in (packet[12:16], packet[16:20]):
+            return None
+        return packet
+
+    def format(self, record: PcapRecord) -> Optional[str]:
+        """Returns the router log line for the record, or None if filtered out."""
+        packet = self.ip_packet(record.data)
+        if packet is None:
+            return None
+        return self.format_packet(record, packet)
+
+    def format_packet(self, record: PcapRecord, packet: bytes | memoryview) -> Optional[str]:
+        """Formats the IPv4 ``packet`` of ``record`` sent or received by the sniffed address."""
+        total_length: int = struct.unpack_from("!H", packet, 2)[0]
+        header_length = (packet[0] & 0x0F) * 4
+        if header_length != 20 or len(packet) < total_length:
+            return None
+
+        source = packet[12:16]
+        if source == self._sniffed_address:
+            direction = "SENT"
+            remote = packet[16:20]
+        else:
+            direction = "RCVD"
+            remote = source
+
+        line = (
+            f"ROUTER CLNS_DT_PDU {self._timestamp(record)} {direction} "
+            f"{total_length - header_length} "
+        )
+        if packet[0] == _IPV4_BASIC_HEADER and total_length > 20 and packet[20] == _CLNP_NLPID:
+            return f"{line}{self._address(remote)} {packet[20:].hex()}\n"
+        return f"{line}{packet.hex()}\n"
+
+    def _timestamp(self, record: PcapRecord) -> str:
+        """Formats the timestamp like ``tcpdump -tttt`` truncated to milliseconds."""
+        if record.ts_sec != self._cached_second:
+            self._cached_second = record.ts_sec
+            self._cached_time = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(record.ts_sec)
+            )
+        return f"{self._cached_time}.{record.ts_usec // 1000:03d}"
+
+    def _address(self, address: bytes | memoryview) -> str:
+        text = self._addresses.get(address)
+        if text is None:
+            # A copy, a view must not outlive the record
+            key = bytes(address)
+            text = socket.inet_ntoa(key)
+            self._addresses[key] = text
+        return text
+
+
+class ClnpRecordDispatcher:
+    """Formats the packets of several sniffed addresses in a single pass.
+
+    Every frame is parsed once; a packet is then formatted by the
+    :class:`ClnpRecordEmitter` of its source and of its destination
+    address, if these are sniffed, so the direction is relative to the
+    address whose output receives the line.
+    """
+
+    def __init__(self, filter_ips: Sequence[str], link_type: int) -> None:
+        self._emitters = [ClnpRecordEmitter(ip, link_type) for ip in filter_ips]
+        self._indexes = {
+            emitter.sniffed_address: index for index, emitter in enumerate(self._emitters)
+        }
+
+    @property
+    def emitters(self) -> list[ClnpRecordEmitter]:
+        """The emitter of each filter IP."""
+        return self._emitters
+
+    def match(self, record: PcapRecord) -> list[tuple[int, bytes | memoryview]]:
+        """Returns the index of the filter IP and the IPv4 packet for each match."""
+        packet = self._emitters[0].iso_packet(record.data)
+        if packet is None:
+            return []
+        source = bytes(packet[12:16])
+        destination = bytes(packet[16:20])
+        matches: list[tuple[int, bytes | memoryview]] = []
+        for address in (source,) if source == destination else (source, destination):
+            index = self._indexes.get(address)
+            if index is not None:
+                matches.append((index, packet))
+        return matches
+
+    def format(self, record: PcapRecord) -> list[tuple[int, str]]:
+        """Returns the index of the filter IP and the router log line for each match."""
+        lines: list[tuple[int, str]] = []
+        for index, packet in self.match(record):
+            line = self._emitters[index].format_packet(record, packet)
+            if line is not None:
+                lines.append((index, line))
+        return lines
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""Hourly CLNP traffic statistics computed with NumPy.
+
+Loads the packets of router logs (``.log``) or capture files (``.pcap``,
+read with the native :class:`~atnproc.pcap_reader.PcapReader`) into
+columnar arrays: timestamp, direction, remote IP, length and the leading
+CLNP header bytes. The fixed CLNP header fields (PDU type, segment length
+and, for segmented PDUs, the total length) are decoded on whole batches of
+packets at once, and the packets are aggregated per hour, direction,
+remote IP and PDU type:
+
+    hour,direction,remote_ip,pdu_type,packets,segment_bytes,total_bytes
+
+Router logs are parsed without a per-line Python loop: the records are
+located by their newline and space positions and the fixed-width fields
+are gathered directly from the file bytes. Timestamps are the local wall
+clock times written to the router logs (``tcpdump -tttt``).
+
+NumPy is not needed by the service itself and is installed with
+``requirements-dev.txt``.
+
+Example:
+    python -m atnproc.clnp_statistics -f 156.135.249.28 -o stats.csv \\
+        /var/tmp/alcp/output/*.log
+"""
+
+import argparse
+import csv
+import logging
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+import numpy as np
+
+from atnproc.clnp_record_emitter import ClnpRecordEmitter
+from atnproc.pcap_file import PcapFile
+from atnproc.pcap_reader import PcapReader
+
+# Leading CLNP header bytes kept per packet; enough for the fixed part,
+# two 20 byte NSAPs and the segmentation part.
+HEADER_BYTES = 64
+BATCH_LINES = 16384
+
+PDU_TYPES = {0x1C: "DT", 0x1D: "MD", 0x01: "ER", 0x1E: "ERQ", 0x1F: "ERP"}
+NO_CLNP = -1
+
+_CLNP_NLPID = 0x81
+_IPV4_HEADER_LENGTH = 20
+# Router log record: ROUTER CLNS_DT_PDU <date> <time> <dir> <length> [<ip>] <hex>
+_TIMESTAMP_OFFSET = 19
+_TIMESTAMP_LENGTH = 23
+_MIN_RECORD_LENGTH = 48
+_MAX_LENGTH_DIGITS = 6
+_MAX_IP_LENGTH = 15
+
+# PDU type keys: NO_CLNP and the 5 bit CLNP type
+_NUM_PDU_TYPE_KEYS = 33
+# Value of every ASCII hex digit, 0 for any other character
+_HEX_VALUES = np.zeros(256, dtype=np.uint8)
+for _value, _digit in enumerate("0123456789abcdef"):
+    _HEX_VALUES[ord(_digit)] = _HEX_VALUES[ord(_digit.upper())] = _value
+
+_KEY_DTYPE = np.dtype(
+    [("hour", "i8"), ("sent", "?"), ("remote", f"S{_MAX_IP_LENGTH}"), ("pdu_type", "i2")]
+)
+
+
+@dataclass
+class _RouterLogLines:
+    """The valid records of a router log, located in its bytes."""
+    buf: np.ndarray
+    spaces: np.ndarray
+    """Offsets of all spaces of the file."""
+    starts: np.ndarray
+    ends: np.ndarray
+    first_space: np.ndarray
+    """Index in ``spaces`` of the first space of every record."""
+    num_fields: np.ndarray
+
+
+@dataclass
+class ClnpColumns:
+    """Columnar packet data; row ``i`` of every array describes packet ``i``."""
+    timestamp_ms: np.ndarray
+    """Local wall clock time in milliseconds since the epoch."""
+    sent: np.ndarray
+    remote: np.ndarray
+    """Remote IP address, empty if the record has no CLNP PDU."""
+    length: np.ndarray
+    """Payload length as written to the router log."""
+    header: np.ndarray
+    """Leading CLNP header bytes (rows x HEADER_BYTES), zero if absent."""
+
+    def __len__(self) -> int:
+        return len(self.timestamp_ms)
+
+
+class ClnpStatistics:
+    """Accumulates CLNP packets and aggregates them per hour."""
+
+    def __init__(self, filter_ip: str = "") -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._filter_ip = filter_ip
+        self._batches: list[ClnpColumns] = []
+
+    @property
+    def num_packets(self) -> int:
+        return sum(len(batch) for batch in self._batches)
+
+    def add_file(self, file: Path) -> None:
+        """Adds the packets of a router log or, for ``*.pcap``, a capture file."""
+        start_time = time.monotonic()
+        before = self.num_packets
+        if file.suffix == ".pcap":
+            self._batches.append(self._load_capture(file))
+        else:
+            self._batches.extend(self._load_router_log(file))
+        self._logger.info(
+            f"Loaded {self.num_packets - before} packet(s) from {file} "
+            f"in {time.monotonic() - start_time:.3f}s"
+        )
+
+    def write_table(self, output: TextIO) -> None:
+        """Writes the hourly aggregates as CSV."""
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(["hour", "direction", "remote_ip", "pdu_type", "packets",
+                         "segment_bytes", "total_bytes"])
+        if not self.num_packets:
+            return
+        groups, counts, segment_bytes, total_bytes = self._aggregate()
+        hours = groups["hour"].astype("datetime64[h]").astype(str)
+        for i, (_, sent, remote, pdu_type) in enumerate(groups.tolist()):
+            writer.writerow([
+                hours[i].replace("T", " ") + ":00",
+                "SENT" if sent else "RCVD",
+                remote.decode("ascii"),
+                PDU_TYPES.get(pdu_type, f"{pdu_type:#04x}") if pdu_type != NO_CLNP else "",
+                int(counts[i]),
+                int(segment_bytes[i]),
+                int(total_bytes[i]),
+            ])
+
+    def _aggregate(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the keys of the groups, sorted, and their packets and byte sums."""
+        keys, segment_lengths, total_lengths = self._keys()
+        groups, inverse, counts = self._group(keys)
+        segment_bytes = np.bincount(inverse, weights=segment_lengths, minlength=len(groups))
+        total_bytes = np.bincount(inverse, weights=total_lengths, minlength=len(groups))
+        return groups, counts, segment_bytes, total_bytes
+
+    def _keys(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the group key, segment length and total length of every packet."""
+        keys = np.empty(self.num_packets, dtype=_KEY_DTYPE)
+        segment_lengths = np.empty(self.num_packets, dtype=np.int64)
+        total_lengths = np.empty(self.num_packets, dtype=np.int64)
+        row = 0
+        for batch in self._batches:
+            rows = slice(row, row + len(batch))
+            pdu_types, segment_lengths[rows], total_lengths[rows] = self._decode(batch)
+            keys["hour"][rows] = batch.timestamp_ms // 3_600_000
+            keys["sent"][rows] = batch.sent
+            keys["remote"][rows] = batch.remote
+            keys["pdu_type"][rows] = pdu_types
+            row += len(batch)
+        return keys, segment_lengths, total_lengths
+
+    @staticmethod
+    def _group(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the distinct keys, sorted, the group of every packet and the group sizes."""
+        # Group on a single integer key; sorting it is much faster than
+        # sorting the structured keys
+        remotes, remote_indices = np.unique(keys["remote"], return_inverse=True)
+        first_hour = int(keys["hour"].min())
+        group_keys = (
+            ((keys["hour"] - first_hour) * 2 + keys["sent"]) * len(remotes)
+            + remote_indices.ravel()
+        ) * _NUM_PDU_TYPE_KEYS + keys["pdu_type"] - NO_CLNP
+        _, first, inverse, counts = np.unique(
+            group_keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        return keys[first], inverse.ravel(), counts
+
+    @staticmethod
+    def _decode(batch: ClnpColumns) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decodes PDU type, segment length and total length of a batch.
+
+        Packets without a CLNP PDU get the type NO_CLNP and their router log
+        length as segment and total length.
+        """
+        header = batch.header.astype(np.int64)
+        rows = np.arange(len(header))
+        is_clnp = header[:, 0] == _CLNP_NLPID
+        pdu_types = np.where(is_clnp, header[:, 4] & 0x1F, NO_CLNP)
+        segment_lengths = np.where(is_clnp, header[:, 5] << 8 | header[:, 6], batch.length)
+
+        # The segmentation part follows the destination and source address
+        destination_length = header[:, 9]
+        source_length = header[rows, np.minimum(10 + destination_length, HEADER_BYTES - 1)]
+        total_offset = 11 + destination_length + source_length + 4
+        segmented = (
+            is_clnp
+            & (header[:, 4] & 0x80 != 0)
+            & (total_offset + 2 <= np.minimum(header[:, 1], HEADER_BYTES))
+        )
+        total_offset = np.minimum(total_offset, HEADER_BYTES - 2)
+        total_lengths = np.where(
+            segmented,
+            header[rows, total_offset] << 8 | header[rows, total_offset + 1],
+            segment_lengths,
+        )
+        return pdu_types, segment_lengths, total_lengths
+
+    def _load_router_log(self, log_file: Path) -> Iterator[ClnpColumns]:
+        size = log_file.stat().st_size
+        # Padding so fixed-width gathers at the end of the file stay in range
+        buf = np.zeros(size + 2 * HEADER_BYTES, dtype=np.uint8)
+        with open(log_file, "rb") as f:
+            size = f.readinto(buf[:size].data)
+        ends = np.flatnonzero(buf[:size] == ord("\n"))
+        starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+        spaces = np.flatnonzero(buf[:size] == ord(" "))
+        first_space = np.searchsorted(spaces, starts)
+        num_fields = np.searchsorted(spaces, ends) - first_space + 1
+        valid = ((num_fields == 7) | (num_fields == 8)) & (ends - starts >= _MIN_RECORD_LENGTH)
+        if not valid.all():
+            self._logger.warning(f"Skipping {int((~valid).sum())} invalid line(s) in {log_file}")
+        lines = _RouterLogLines(
+            buf, spaces, starts[valid], ends[valid], first_space[valid], num_fields[valid]
+        )
+        for batch_start in range(0, len(lines.starts), BATCH_LINES):
+            yield self._router_log_batch(lines, slice(batch_start, batch_start + BATCH_LINES))
+
+    def _router_log_batch(self, lines: _RouterLogLines, batch: slice) -> ClnpColumns:
+        buf = lines.buf
+        line_starts, line_ends = lines.starts[batch], lines.ends[batch]
+        line_spaces = lines.spaces[lines.first_space[batch, None] + np.arange(7)[None, :]
+                                   .clip(max=lines.num_fields[batch, None] - 2)]
+        has_remote = lines.num_fields[batch] == 8
+        hex_starts = np.where(has_remote, line_spaces[:, 6], line_spaces[:, 5]) + 1
+        return ClnpColumns(
+            timestamp_ms=self._timestamps(buf, line_starts + _TIMESTAMP_OFFSET),
+            sent=buf[line_spaces[:, 3] + 1] == ord("S"),
+            remote=np.where(
+                has_remote,
+                self._gather(buf, line_spaces[:, 5] + 1, line_spaces[:, 6], _MAX_IP_LENGTH)
+                .view(f"S{_MAX_IP_LENGTH}").ravel(),
+                b"",
+            ),
+            length=self._decimal(buf, line_spaces[:, 4] + 1, line_spaces[:, 5]),
+            header=self._hex(self._gather(buf, hex_starts, line_ends, 2 * HEADER_BYTES))
+            * has_remote[:, None],
+        )
+
+    @staticmethod
+    def _gather(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int) -> np.ndarray:
+        """Returns ``buf[start:end]`` of every row, zero padded to ``width``.
+
+        ``buf`` must be followed by at least ``width`` padding bytes.
+        """
+        chars = buf[starts[:, None] + np.arange(width)[None, :]]
+        short = np.flatnonzero(ends - starts < width)
+        if len(short):
+            chars[short] *= np.arange(width)[None, :] < (ends - starts)[short, None]
+        return chars
+
+    @classmethod
+    def _decimal(cls, buf: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        chars = cls._gather(buf, starts, ends, _MAX_LENGTH_DIGITS).astype(np.int64)
+        widths = np.minimum(ends - starts, _MAX_LENGTH_DIGITS)[:, None]
+        exponents = widths - 1 - np.arange(_MAX_LENGTH_DIGITS)[None, :]
+        digits = np.where(exponents >= 0, chars - ord("0"), 0)
+        values: np.ndarray = (digits * 10 ** exponents.clip(min=0)).sum(axis=1)
+        return values
+
+    @staticmethod
+    def _hex(chars: np.ndarray) -> np.ndarray:
+        """Converts rows of hex digits (zero padded) to bytes."""
+        values = _HEX_VALUES[chars]
+        result: np.ndarray = values[:, 0::2] << 4 | values[:, 1::2]
+        return result
+
+    @staticmethod
+    def _timestamps(buf: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """Parses ``YYYY-MM-DD HH:MM:SS.mmm`` at ``starts`` into epoch milliseconds."""
+        digits = (
+            buf[starts[:, None] + np.arange(_TIMESTAMP_LENGTH)[None, :]].astype(np.int64)
+            - ord("0")
+        )
+
+        def number(first: int, last: int) -> np.ndarray:
+            value: np.ndarray = digits[:, first:last] @ 10 ** np.arange(last - first - 1, -1, -1)
+            return value
+
+        months = (number(0, 4) - 1970) * 12 + number(5, 7) - 1
+        days = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        days += number(8, 10) - 1
+        timestamps: np.ndarray = (
+            days * 86_400_000 + number(11, 13) * 3_600_000 + number(14, 16) * 60_000
+            + number(17, 19) * 1000 + number(20, 23)
+        )
+        return timestamps
+
+    def _load_capture(self, capture_file: Path) -> ClnpColumns:
+        seconds, milliseconds, sent, remote, length, headers = (
+            list(zip(*self._capture_packets(capture_file))) or [()] * 6
+        )
+        epoch_seconds = np.array(seconds, dtype=np.int64)
+        return ClnpColumns(
+            timestamp_ms=(epoch_seconds + self._utc_offsets(epoch_seconds)) * 1000
+            + np.array(milliseconds, dtype=np.int64),
+            sent=np.array(sent, dtype=bool),
+            remote=np.array(remote, dtype=f"S{_MAX_IP_LENGTH}"),
+            length=np.array(length, dtype=np.int64),
+            header=np.frombuffer(b"".join(headers), dtype=np.uint8).reshape(-1, HEADER_BYTES),
+        )
+
+    def _capture_packets(
+        self, capture_file: Path
+    ) -> Iterator[tuple[int, int, bool, bytes, int, bytes]]:
+        """Yields seconds, milliseconds, sent, remote IP, length and header of every packet."""
+        pcap_file = PcapFile(capture_file)
+        reader = PcapReader(pcap_file)
+        emitter = ClnpRecordEmitter(self._filter_ip, reader.link_type)
+        sniffed_address = socket.inet_aton(self._filter_ip)
+        addresses: dict[bytes, bytes] = {}
+        for record in reader.records(0, pcap_file.complete_records_end()):
+            packet = emitter.ip_packet(record.data)
+            if packet is None or len(packet) < _IPV4_HEADER_LENGTH:
+                continue
+            source = bytes(packet[12:16])
+            is_sent = source == sniffed_address
+            address = bytes(packet[16:20]) if is_sent else source
+            if address not in addresses:
+                addresses[address] = socket.inet_ntoa(address).encode("ascii")
+            is_clnp = packet[0] == 0x45 and len(packet) > 20 and packet[20] == _CLNP_NLPID
+            yield (
+                record.ts_sec,
+                record.ts_usec // 1000,
+                is_sent,
+                addresses[address] if is_clnp else b"",
+                len(packet) - _IPV4_HEADER_LENGTH,
+                bytes(packet[20:20 + HEADER_BYTES]).ljust(HEADER_BYTES, b"\0")
+                if is_clnp else bytes(HEADER_BYTES),
+            )
+
+    @staticmethod
+    def _utc_offsets(epoch_seconds: np.ndarray) -> np.ndarray:
+        """Returns the local UTC offset in seconds of every timestamp."""
+        hours, inverse = np.unique(epoch_seconds // 3600, return_inverse=True)
+        offsets = np.array(
+            [time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64
+        )
+        return offsets[inverse.ravel()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hourly CLNP traffic statistics")
+    parser.add_argument("files", nargs="+", type=Path, help="Router logs or *.pcap files")
+    parser.add_argument("-f", "--filter-ip", default="",
+                        help="Sniffed IP address (required for *.pcap files)")
+    parser.add_argument("-o", "--output", type=Path, help="CSV output file (default: stdout)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    statistics = ClnpStatistics(args.filter_ip)
+    start_time = time.monotonic()
+    for file in args.files:
+        statistics.add_file(file)
+    output: Optional[Path] = args.output
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            statistics.write_table(f)
+    else:
+        statistics.write_table(sys.stdout)
+    logging.info(
+        f"Aggregated {statistics.num_packets} packet(s) in {time.monotonic() - start_time:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,27 @@
 """Configuration loader for the application.
 
 Loads YAML configuration and exposes working and capture directories as
-pathlib `Path` properties used elsewhere in the application.
+pathlib `Path` properties used elsewhere in the application. The options
+of the optional features are grouped into one section per feature, e.g.
+`RetentionConfig`; the YAML file keeps them as top-level keys.
+
+PyYAML is imported on the first load, so commands that fail early (e.g.
+on invalid arguments) do not pay for it; the LibYAML based loader is used
+when available.
 """
 
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
 
-import yaml
+def load_yaml(file: Path) -> Any:
+    """Parses the YAML document in ``file``."""
+    import yaml  # pylint: disable=import-outside-toplevel
 
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(file, encoding="utf-8") as f:
+        return yaml.load(f, Loader=loader)
 
 
 class WorkDirectories:
@@ -41,24 +54,259 @@ class WorkDirectories:
     def output(self) -> Path:
         return self._output
 
+    def for_source(self, name: str) -> "WorkDirectories":
+        """Returns the work directories of a single capture source.
+
+        The input, current and processed directories get a subdirectory per
+        source; the output directory is shared. All are created if needed.
+        """
+        directories = WorkDirectories(
+            input=self._input / name,
+            current=self._current / name,
+            processed=self._processed / name,
+            output=self._output,
+        )
+        for directory in (
+            directories.input, directories.current, directories.processed, directories.output
+        ):
+            directory.mkdir(parents=True, exist_ok=True)
+        return directories
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    """Adaptive scheduling of the processing ticks."""
+    adaptive: bool
+    """Derive the processing interval from the capture growth and backlog."""
+    min_interval_seconds: float
+    max_interval_seconds: float
+    backlog_bytes: int
+    """Unprocessed capture data at which the next tick starts as soon as possible."""
+
+
+@dataclass(frozen=True)
+class ProcessingConfig:
+    """Staging and conversion of the capture files."""
+    incremental: bool
+    """Resume from the last processed record instead of reprocessing the file."""
+    engine: str
+    incremental_staging: bool
+    max_workers: int
+    """Size of the processing pool; 0 processes in the main process."""
+    task_timeout_seconds: Optional[float]
+    pipeline_timeout_seconds: Optional[float]
+    """Wall-clock limit for one tcpdump/awk pipeline run."""
+
+
+@dataclass(frozen=True)
+class ReassemblyConfig:
+    """Reassembly of segmented CLNP PDUs (native engine only)."""
+    enabled: bool
+    timeout_seconds: float
+    """Time without a new segment after which an incomplete PDU is written as is."""
+    max_bytes: int
+    """Limit of the data buffered for reassembly per router log."""
+
+
+@dataclass(frozen=True)
+class WatcherConfig:
+    """Watching the capture directories for new data between the ticks."""
+    enabled: bool
+    debounce_seconds: float
+
+
+@dataclass(frozen=True)
+class MergeConfig:
+    """Merging the router logs of all capture directories."""
+    log_file: Optional[Path]
+    """Merged router log; merging is disabled if not set."""
+    dedup_window_seconds: float
+
+
+@dataclass(frozen=True)
+class DecoderConfig:
+    """Decoding of the merged router log by ``pdec_clnp``."""
+    executable: Optional[Path]
+    """The ``pdec_clnp`` executable; decoding is disabled if not set."""
+    atsu_file: Path
+    work_directory: Path
+    """Directory in which ``pdec_clnp`` runs and keeps ``pdus.csv``."""
+    shards: int
+    """Number of hourly shards of the router log decoded in parallel."""
+    shard_overlap_seconds: float
+    """Records decoded before and after each shard for the connection context."""
+    filebeat_directory: Path
+    """Directory receiving the timestamped ``YYYYMMDDHHMM_pdus.csv`` files."""
+    index_max_rows: int
+    """Rows of ``pdus.csv`` remembered to pass only new rows to Filebeat."""
+
+
+@dataclass(frozen=True)
+class EnrichmentConfig:
+    """Writing the router logs with their source and destination facility."""
+    log_directory: Optional[Path]
+    """Directory receiving the enriched router logs; disabled if not set."""
+    facility_index_file: Path
+    """Cache of the NSAP prefixes compiled from the ``atsu.csv`` file."""
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """Export of the metrics."""
+    textfile: Optional[Path]
+    """node_exporter textfile receiving the metrics, if enabled."""
+
+
+@dataclass(frozen=True)
+class CaptureConfig:
+    """Live capture by the ``capture`` command."""
+    interface: str
+    output_directory: Path
+    """Directory receiving the daily router logs."""
+    sync_interval_seconds: float
+    rotation_overlap_seconds: float
+    """Time the previous day's router log stays open after UTC midnight."""
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    """Removal of expired files; a retention period of 0 keeps the files."""
+    days: float
+    """Age after which the files of the work directories are removed."""
+    capture_days: float
+    """Age after which the capture files and daily router logs are removed."""
+    interval_seconds: float
+    """Minimum time between two scans for expired files."""
+    max_unlinks_per_second: float
+    max_seconds_per_tick: float
+    """Time budget for removing expired files in one processing tick."""
+
+
+def _optional_path(value: Any) -> Optional[Path]:
+    return Path(value) if value else None
+
+
+def _optional_seconds(value: Any) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _load_scheduler(config: Any, processing_interval_seconds: float) -> SchedulerConfig:
+    return SchedulerConfig(
+        adaptive=bool(config.get("adaptive_scheduling", False)),
+        min_interval_seconds=float(config.get("min_processing_interval_seconds", 5.0)),
+        max_interval_seconds=float(
+            config.get("max_processing_interval_seconds", processing_interval_seconds)
+        ),
+        backlog_bytes=int(config.get("schedule_backlog_bytes", 1_000_000)),
+    )
+
+
+def _load_processing(config: Any) -> ProcessingConfig:
+    return ProcessingConfig(
+        incremental=bool(config.get("incremental_processing", False)),
+        engine=config.get("packet_engine", "tcpdump"),
+        incremental_staging=bool(config.get("incremental_staging", False)),
+        max_workers=int(config.get("max_workers", 0)),
+        task_timeout_seconds=_optional_seconds(config.get("task_timeout_seconds")),
+        pipeline_timeout_seconds=_optional_seconds(config.get("pipeline_timeout_seconds")),
+    )
+
+
+def _load_reassembly(config: Any) -> ReassemblyConfig:
+    return ReassemblyConfig(
+        enabled=bool(config.get("reassemble_segments", False)),
+        timeout_seconds=float(config.get("reassembly_timeout_seconds", 30.0)),
+        max_bytes=int(config.get("reassembly_max_bytes", 16_000_000)),
+    )
+
+
+def _load_watcher(config: Any) -> WatcherConfig:
+    return WatcherConfig(
+        enabled=bool(config.get("watch_capture_directories", False)),
+        debounce_seconds=float(config.get("watch_debounce_seconds", 2.0)),
+    )
 
-class Configuration:
+
+def _load_merge(config: Any) -> MergeConfig:
+    return MergeConfig(
+        log_file=_optional_path(config.get("merged_log_file")),
+        dedup_window_seconds=float(config.get("merge_dedup_window_seconds", 2.0)),
+    )
+
+
+def _load_decoder(config: Any) -> DecoderConfig:
+    return DecoderConfig(
+        executable=_optional_path(config.get("pdec_executable")),
+        atsu_file=Path(config.get("pdec_atsu_file", "atsu.csv")),
+        work_directory=Path(config.get("pdec_work_directory", "pdec")),
+        shards=int(config.get("pdec_shards", 1)),
+        shard_overlap_seconds=float(config.get("pdec_shard_overlap_seconds", 300.0)),
+        filebeat_directory=Path(config.get("filebeat_directory", "filebeat")),
+        index_max_rows=int(config.get("pdus_index_max_rows", 1_000_000)),
+    )
+
+
+def _load_enrichment(config: Any) -> EnrichmentConfig:
+    return EnrichmentConfig(
+        log_directory=_optional_path(config.get("enriched_log_directory")),
+        facility_index_file=Path(config.get("facility_index_file", "atsu.idx")),
+    )
+
+
+def _load_metrics(config: Any) -> MetricsConfig:
+    return MetricsConfig(textfile=_optional_path(config.get("metrics_textfile")))
+
+
+def _load_capture(config: Any) -> CaptureConfig:
+    return CaptureConfig(
+        interface=config.get("capture_interface", ""),
+        output_directory=Path(config.get("capture_output_directory", "routerlog")),
+        sync_interval_seconds=float(config.get("capture_sync_interval_seconds", 1.0)),
+        rotation_overlap_seconds=float(config.get("capture_rotation_overlap_seconds", 10.0)),
+    )
+
+
+def _load_retention(config: Any) -> RetentionConfig:
+    return RetentionConfig(
+        days=float(config.get("retention_days", 0)),
+        capture_days=float(config.get("capture_retention_days", 0)),
+        interval_seconds=float(config.get("retention_interval_seconds", 3600.0)),
+        max_unlinks_per_second=float(config.get("retention_max_unlinks_per_second", 50.0)),
+        max_seconds_per_tick=float(config.get("retention_max_seconds_per_tick", 2.0)),
+    )
+
+
+# One attribute per section of the optional features
+class Configuration:  # pylint: disable=too-many-instance-attributes
     """Load and expose configured filesystem paths for the application.
 
     Holds `capture_directories` and `work_directories` entries parsed from the
     YAML configuration file and exposes them as `pathlib.Path` properties.
+    The options of the optional features are exposed as one section each.
     """
     _capture_directories: list[Path]
     _work_directories: WorkDirectories
     _processing_interval_seconds: int
-    _filter_ip: str
+    _filter_ips: list[str]
     _awk_script: Path
+    _scheduler: SchedulerConfig
+    _processing: ProcessingConfig
+    _reassembly: ReassemblyConfig
+    _watcher: WatcherConfig
+    _merge: MergeConfig
+    _decoder: DecoderConfig
+    _enrichment: EnrichmentConfig
+    _metrics: MetricsConfig
+    _capture: CaptureConfig
+    _retention: RetentionConfig
 
     def __init__(self, config_file: Path):
-        with open(config_file, encoding="utf-8") as f:
-            config: Any = yaml.safe_load(f)
+        config: Any = load_yaml(config_file)
         self._processing_interval_seconds = config["processing_interval_seconds"]
-        self._filter_ip = config["filter_ip"]
+        filter_ip = config["filter_ip"]
+        # A single address or a list of addresses
+        filter_ips = filter_ip if isinstance(filter_ip, list) else [filter_ip]
+        self._filter_ips = [str(ip) for ip in filter_ips]
         self._awk_script = Path(config["awk_script"])
         capture_dirs = config["capture_directories"]
         self._capture_directories = [Path(d) for d in capture_dirs]
@@ -69,6 +317,16 @@ class Configuration:
             processed=Path(work_dirs["processed"]),
             output=Path(work_dirs["output"])
         )
+        self._scheduler = _load_scheduler(config, self._processing_interval_seconds)
+        self._processing = _load_processing(config)
+        self._reassembly = _load_reassembly(config)
+        self._watcher = _load_watcher(config)
+        self._merge = _load_merge(config)
+        self._decoder = _load_decoder(config)
+        self._enrichment = _load_enrichment(config)
+        self._metrics = _load_metrics(config)
+        self._capture = _load_capture(config)
+        self._retention = _load_retention(config)
 
     @property
     def processing_interval_seconds(self) -> int:
@@ -76,7 +334,13 @@ class Configuration:
 
     @property
     def filter_ip(self) -> str:
-        return self._filter_ip
+        """The first sniffed address, whose router logs are merged and decoded."""
+        return self._filter_ips[0]
+
+    @property
+    def filter_ips(self) -> list[str]:
+        """All sniffed addresses; each one gets its own router log."""
+        return self._filter_ips
 
     @property
     def awk_script(self) -> Path:
@@ -89,3 +353,43 @@ class Configuration:
     @property
     def work_directories(self) -> WorkDirectories:
         return self._work_directories
+
+    @property
+    def scheduler(self) -> SchedulerConfig:
+        return self._scheduler
+
+    @property
+    def processing(self) -> ProcessingConfig:
+        return self._processing
+
+    @property
+    def reassembly(self) -> ReassemblyConfig:
+        return self._reassembly
+
+    @property
+    def watcher(self) -> WatcherConfig:
+        return self._watcher
+
+    @property
+    def merge(self) -> MergeConfig:
+        return self._merge
+
+    @property
+    def decoder(self) -> DecoderConfig:
+        return self._decoder
+
+    @property
+    def enrichment(self) -> EnrichmentConfig:
+        return self._enrichment
+
+    @property
+    def metrics(self) -> MetricsConfig:
+        return self._metrics
+
+    @property
+    def capture(self) -> CaptureConfig:
+        return self._capture
+
+    @property
+    def retention(self) -> RetentionConfig:
+        return self._retention
@@ -0,0 +1,84 @@
+"""Cached index of the capture files in a directory.
+
+This module provides :class:`DirectoryIndex` which keeps the parsed
+capture files of a directory between ticks. A directory is only scanned
+again when its modification time changes, i.e. when files were added,
+removed or renamed; growing files do not change it. The capture files are
+kept sorted by timestamp so the most recent ones are directly available.
+
+A directory modified in the last second before it was scanned may change
+again without a visible mtime change (timestamp granularity), so such a
+scan is not trusted and the directory is scanned again next time.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+
+from atnproc.capture_file import CaptureFile
+from atnproc.capture_file_name import CAPTURE_FILE_PATTERNS
+
+# Minimum age of the directory mtime at scan time for the scan to be reused
+_RACY_MTIME_NS = 1_000_000_000
+
+
+@dataclass
+class _DirectoryEntry:
+    mtime_ns: int
+    scan_time_ns: int
+    # Sorted by timestamp, newest first
+    files: list[CaptureFile] = field(default_factory=list)
+
+
+class DirectoryIndex:
+    """Keeps the capture files of directories, rescanning only changed ones."""
+
+    def __init__(self, patterns: tuple[str, ...] = CAPTURE_FILE_PATTERNS) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._patterns = patterns
+        self._entries: dict[Path, _DirectoryEntry] = {}
+
+    def files(self, directory: Path) -> list[CaptureFile]:
+        """Returns the capture files in ``directory``, newest first.
+
+        Files whose name does not follow the capture file naming convention
+        are ignored.
+        """
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except OSError as e:
+            self._logger.warning(f"Cannot access {directory}: {e}")
+            self._entries.pop(directory, None)
+            return []
+        entry = self._entries.get(directory)
+        if (
+            entry is None
+            or entry.mtime_ns != mtime_ns
+            or entry.scan_time_ns - entry.mtime_ns < _RACY_MTIME_NS
+        ):
+            entry = self._scan(directory, mtime_ns)
+            self._entries[directory] = entry
+        return entry.files
+
+    def _scan(self, directory: Path, mtime_ns: int) -> _DirectoryEntry:
+        scan_time_ns = time.time_ns()
+        previous = self._entries.get(directory)
+        known = {file.path.name: file for file in previous.files} if previous else {}
+        files: list[CaptureFile] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not any(fnmatch(entry.name, pattern) for pattern in self._patterns):
+                    continue
+                capture_file = known.get(entry.name)
+                if capture_file is None:
+                    try:
+                        capture_file = CaptureFile(directory / entry.name)
+                    except ValueError:
+                        continue
+                files.append(capture_file)
+        files.sort(key=lambda file: file.timestamp, reverse=True)
+        self._logger.debug(f"Scanned {directory}: {len(files)} capture file(s)")
+        return _DirectoryEntry(mtime_ns, scan_time_ns, files)
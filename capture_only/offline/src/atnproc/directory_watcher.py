@@ -0,0 +1,137 @@
+"""Event-driven watching of capture directories using Linux inotify.
+
+This module provides the `DirectoryWatcher` class which uses inotify (via
+``ctypes``, no extra dependencies) to detect capture files that ``rsync``
+has finished writing (``IN_CLOSE_WRITE``) or renamed into place
+(``IN_MOVED_TO``). Bursts of events are debounced and coalesced into a
+single wake-up callback, typically `InterruptibleSleeper.wake`, so a new
+processing tick starts within seconds of fresh data arriving while the
+fixed processing interval remains as a fallback.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from atnproc.capture_file_name import CAPTURE_FILE_SUFFIXES
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class DirectoryWatcher:
+    """Watches directories for completed capture files.
+
+    Raises `OSError` on construction if inotify is not available.
+    """
+
+    def __init__(
+        self,
+        directories: list[Path],
+        debounce: timedelta = timedelta(seconds=2),
+        suffixes: tuple[str, ...] = CAPTURE_FILE_SUFFIXES,
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._debounce: float = debounce.total_seconds()
+        self._suffixes = suffixes
+        self._thread: Optional[threading.Thread] = None
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self._fd: int = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            wd = libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                self._logger.warning(
+                    f"Cannot watch {directory}: {os.strerror(errno)}"
+                )
+            else:
+                self._logger.info(f"Watching {directory}")
+        self._stop_read_fd, self._stop_write_fd = os.pipe()
+
+    def start(self, callback: Callable[[], None]) -> None:
+        """Starts a background thread invoking ``callback`` on changes."""
+        self._thread = threading.Thread(
+            target=self._watch, args=(callback,), name="DirectoryWatcher", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        os.write(self._stop_write_fd, b"\x01")
+        if self._thread:
+            self._thread.join()
+        os.close(self._fd)
+        os.close(self._stop_read_fd)
+        os.close(self._stop_write_fd)
+
+    def _watch(self, callback: Callable[[], None]) -> None:
+        while True:
+            if not self._wait_for_change(timeout=None):
+                return
+            # Coalesce the burst of events produced by a single rsync run.
+            deadline = time.monotonic() + 5 * self._debounce
+            while time.monotonic() < deadline:
+                changed = self._wait_for_change(timeout=self._debounce, quiet=True)
+                if changed is None:
+                    return
+                if not changed:
+                    break
+            self._logger.debug("Capture files changed, waking up")
+            callback()
+
+    def _wait_for_change(
+        self, timeout: Optional[float], quiet: bool = False
+    ) -> Optional[bool]:
+        """Waits for a relevant event.
+
+        Returns True when a capture file changed, False on timeout and None
+        when the watcher is closed.
+        """
+        while True:
+            read_fds, _, _ = select.select(
+                [self._fd, self._stop_read_fd], [], [], timeout
+            )
+            if self._stop_read_fd in read_fds:
+                return None
+            if not read_fds:
+                return False
+            if self._read_events(quiet):
+                return True
+
+    def _read_events(self, quiet: bool) -> bool:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        relevant = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            name_start = offset + _EVENT_HEADER.size
+            name = data[name_start:name_start + name_len].rstrip(b"\0").decode(
+                errors="replace"
+            )
+            offset = name_start + name_len
+            if mask & _IN_Q_OVERFLOW or name.endswith(self._suffixes):
+                relevant = True
+                if not quiet:
+                    self._logger.debug(f"Capture file event: {name} (mask={mask:#x})")
+        return relevant
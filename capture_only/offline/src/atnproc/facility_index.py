@@ -0,0 +1,134 @@
+"""NSAP to ATSU facility lookup compiled from ``atsu.csv``.
+
+This module provides :class:`FacilityIndex` which maps CLNP NSAP addresses
+to the ATSU facility codes of the ``atsu.csv`` file used by ``pdec_clnp``
+(Design document, Protocol Decoding). Each line of the file holds a hex
+NSAP (prefix) and a facility code; ``#`` starts a comment.
+
+An address is resolved to the facility of the longest matching NSAP
+prefix by walking a byte trie, so a lookup costs O(address length).
+
+The parsed table is cached in a binary file keyed on the size and mtime
+of the CSV file:
+
+    header  8s magic, Q CSV mtime (ns), Q CSV size, I number of entries
+    entry   B prefix length, prefix bytes, B facility length, facility (ASCII)
+"""
+
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Any, Optional
+
+INDEX_MAGIC = b"AFACIX01"
+_HEADER = struct.Struct("<8sQQI")
+
+# A trie node: [facility or None, {next byte: node}]
+_Node = list[Any]
+
+
+class FacilityIndex:
+    """Longest-prefix lookup of the ATSU facility of an NSAP address."""
+
+    def __init__(self, atsu_file: Path, cache_file: Optional[Path] = None) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._root: _Node = [None, {}]
+        self._num_entries = 0
+        stat = atsu_file.stat()
+        entries = self._read_cache(cache_file, stat) if cache_file else None
+        if entries is None:
+            entries = self._read_csv(atsu_file)
+            if cache_file:
+                self._write_cache(cache_file, stat, entries)
+        for prefix, facility in entries:
+            self._insert(prefix, facility)
+        self._logger.info(f"Loaded {self._num_entries} NSAP prefix(es) from {atsu_file}")
+
+    @property
+    def num_entries(self) -> int:
+        return self._num_entries
+
+    def lookup(self, nsap: bytes) -> Optional[str]:
+        """Returns the facility of the longest prefix of ``nsap``, if any."""
+        node = self._root
+        facility: Optional[str] = node[0]
+        for byte in nsap:
+            node = node[1].get(byte)
+            if node is None:
+                break
+            if node[0] is not None:
+                facility = node[0]
+        return facility
+
+    def _insert(self, prefix: bytes, facility: str) -> None:
+        node = self._root
+        for byte in prefix:
+            node = node[1].setdefault(byte, [None, {}])
+        if node[0] is None:
+            self._num_entries += 1
+        node[0] = facility
+
+    def _read_csv(self, atsu_file: Path) -> list[tuple[bytes, str]]:
+        entries: list[tuple[bytes, str]] = []
+        with open(atsu_file, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                fields = [field.strip() for field in line.split(",")]
+                try:
+                    prefix = bytes.fromhex(fields[0])
+                    facility = fields[1]
+                    facility.encode("ascii")
+                except (ValueError, IndexError) as e:
+                    self._logger.warning(f"{atsu_file}:{line_number}: ignoring '{line}': {e}")
+                    continue
+                if not 0 < len(prefix) < 256 or not 0 < len(facility) < 256:
+                    self._logger.warning(f"{atsu_file}:{line_number}: ignoring '{line}'")
+                    continue
+                entries.append((prefix, facility))
+        return entries
+
+    def _read_cache(
+        self, cache_file: Path, stat: os.stat_result
+    ) -> Optional[list[tuple[bytes, str]]]:
+        try:
+            data = cache_file.read_bytes()
+        except OSError:
+            return None
+        try:
+            magic, mtime_ns, size, count = _HEADER.unpack_from(data)
+            if magic != INDEX_MAGIC or (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+                return None
+            entries: list[tuple[bytes, str]] = []
+            offset = _HEADER.size
+            for _ in range(count):
+                prefix_length = data[offset]
+                prefix = data[offset + 1:offset + 1 + prefix_length]
+                offset += 1 + prefix_length
+                facility_length = data[offset]
+                facility = data[offset + 1:offset + 1 + facility_length].decode("ascii")
+                offset += 1 + facility_length
+                entries.append((prefix, facility))
+        except (struct.error, IndexError, UnicodeDecodeError):
+            self._logger.warning(f"Ignoring invalid facility index {cache_file}")
+            return None
+        return entries
+
+    def _write_cache(
+        self, cache_file: Path, stat: os.stat_result, entries: list[tuple[bytes, str]]
+    ) -> None:
+        data = bytearray(
+            _HEADER.pack(INDEX_MAGIC, stat.st_mtime_ns, stat.st_size, len(entries))
+        )
+        for prefix, facility in entries:
+            data += bytes([len(prefix)]) + prefix
+            data += bytes([len(facility)]) + facility.encode("ascii")
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_bytes(data)
+            tmp_file.replace(cache_file)
+        except OSError as e:
+            self._logger.warning(f"Failed to write facility index {cache_file}: {e}")
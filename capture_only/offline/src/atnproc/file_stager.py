@@ -0,0 +1,139 @@
+"""Incremental staging of growing files into the work area.
+
+This module provides :class:`FileStager` which copies a source file to a
+destination and, on subsequent calls, only transfers the bytes appended to
+the source since the previous call. Capture files only ever grow, so the
+staged copy remains a stable snapshot of a prefix of the source file.
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+# ioctl request number for FICLONE (reflink the whole file, Linux >= 4.5)
+_FICLONE = 0x40049409
+# Number of bytes compared to check that the staged copy is a prefix of the source
+_PREFIX_CHECK_LENGTH = 4096
+# Chunk size used when in-kernel copying is not available
+_COPY_CHUNK_SIZE = 1024 * 1024
+# Errors of copy_file_range/sendfile for files they cannot copy between
+_UNSUPPORTED_ERRNOS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP)
+
+
+class FileFingerprint(NamedTuple):
+    """Identifies a version of a file on the filesystem."""
+
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, file: Path) -> "FileFingerprint":
+        stat = file.stat()
+        return cls(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class FileStager:
+    """Stages source files into destination files.
+
+    In incremental mode, a destination whose source fingerprint (inode,
+    size, mtime) is unchanged is skipped, and a destination that is a prefix
+    of the grown source only receives the appended bytes. Full copies use a
+    reflink when the filesystem supports it. Otherwise data is transferred
+    in-kernel with ``copy_file_range``/``sendfile``.
+    """
+
+    def __init__(self, incremental: bool = True) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._incremental = incremental
+        self._fingerprints: dict[Path, FileFingerprint] = {}
+
+    def stage(self, src_file: Path, dst_file: Path) -> int:
+        """Stages ``src_file`` as ``dst_file``; returns the number of bytes copied."""
+        if not self._incremental:
+            shutil.copy2(src_file, dst_file)
+            return dst_file.stat().st_size
+
+        fingerprint = FileFingerprint.of(src_file)
+        staged_size = dst_file.stat().st_size if dst_file.exists() else -1
+        if self._fingerprints.get(dst_file) == fingerprint and staged_size == fingerprint.size:
+            self._logger.debug(f"Unchanged, not staging {src_file}")
+            return 0
+
+        if 0 < staged_size <= fingerprint.size and self._is_prefix(
+            src_file, dst_file, staged_size
+        ):
+            copied = self._append(src_file, dst_file, staged_size, fingerprint.size)
+            self._logger.debug(f"Appended {copied} bytes from {src_file} to {dst_file}")
+        else:
+            copied = self._copy(src_file, dst_file, fingerprint.size)
+            self._logger.debug(f"Copied {src_file} to {dst_file}")
+        os.utime(dst_file, ns=(fingerprint.mtime_ns, fingerprint.mtime_ns))
+        self._fingerprints[dst_file] = fingerprint
+        return copied
+
+    def forget(self, dst_file: Path) -> None:
+        """Drops the fingerprint of a destination file that has been removed."""
+        self._fingerprints.pop(dst_file, None)
+
+    @staticmethod
+    def _is_prefix(src_file: Path, dst_file: Path, staged_size: int) -> bool:
+        """Checks that the tail of the staged copy matches the source."""
+        check_offset = max(0, staged_size - _PREFIX_CHECK_LENGTH)
+        with open(src_file, "rb") as src, open(dst_file, "rb") as dst:
+            src.seek(check_offset)
+            dst.seek(check_offset)
+            length = staged_size - check_offset
+            return src.read(length) == dst.read(length)
+
+    def _copy(self, src_file: Path, dst_file: Path, size: int) -> int:
+        with open(src_file, "rb") as src, open(dst_file, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                # Staged like a copy, only without transferring the data
+                return size
+            except OSError:
+                # Not supported by the filesystem: copy the data instead.
+                pass
+        return self._append(src_file, dst_file, 0, size)
+
+    @staticmethod
+    def _append(src_file: Path, dst_file: Path, start: int, end: int) -> int:
+        """Appends ``src_file[start:end]`` to ``dst_file`` (truncated to ``start``)."""
+        with open(src_file, "rb") as src, open(dst_file, "r+b") as dst:
+            dst.truncate(start)
+            offset = start
+            in_kernel = True
+            while offset < end:
+                if in_kernel:
+                    try:
+                        copied = _copy_range(src.fileno(), dst.fileno(), offset, end - offset)
+                    except OSError as e:
+                        if e.errno not in _UNSUPPORTED_ERRNOS:
+                            raise
+                        # Not supported for these files: copy the rest through user space
+                        in_kernel = False
+                        src.seek(offset)
+                        dst.seek(offset)
+                        continue
+                else:
+                    data = src.read(min(_COPY_CHUNK_SIZE, end - offset))
+                    dst.write(data)
+                    copied = len(data)
+                if copied == 0:
+                    # The source shrank while copying.
+                    break
+                offset += copied
+        return offset - start
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    """Copies up to ``count`` bytes at ``offset`` in-kernel; returns the bytes copied."""
+    if hasattr(os, "copy_file_range"):
+        return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
@@ -30,7 +30,8 @@ class InterruptibleSleeper:
 
     The `InterruptibleSleeper` registers signal handlers for SIGINT and
     SIGTERM and wakes the blocked select() when a termination signal is
-    received so the application can handle shutdown promptly.
+    received so the application can handle shutdown promptly. Other threads
+    can end the current sleep early by calling `wake()`.
     """
     def __init__(self, termination_handler: TerminationHandler) -> None:
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -43,16 +44,21 @@ class InterruptibleSleeper:
         """
         Sleeps for the given duration
         Returns True if the select timed-out, i.e., the sleep completed
-        Returns False if interrupted by a termination signal.
+        Returns False if interrupted by a termination signal or `wake()`.
         """
         timeout = duration.total_seconds()
         read_fds, _, _ = select.select([self._read_fd], [], [], timeout)
         timed_out = True
         if read_fds:
             timed_out = False
-            os.read(self._read_fd, 1)
+            # Drain all pending wake-ups so they result in a single iteration.
+            os.read(self._read_fd, 64)
         return timed_out
 
+    def wake(self) -> None:
+        """Ends the current (or next) sleep early; safe to call from any thread."""
+        os.write(self._write_fd, b'\x02')
+
     def close(self) -> None:
         os.close(self._read_fd)
         os.close(self._write_fd)
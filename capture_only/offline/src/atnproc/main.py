@@ -24,19 +24,31 @@ Implementation outline:
      Process
      Move the most recent file in the work directory to the "active"
      directory
+
+With ``--once`` a single processing tick runs and the exit status tells
+whether it completed (0) or must be retried (1), e.g. for a systemd timer.
+The modules of the commands are imported when the command runs, so the
+start-up only pays for the command used (see ``tests/startup_check.py``).
 """
 
+# pylint: disable=import-outside-toplevel
 import argparse
 import logging
 import logging.config
 import sys
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from atnproc.capture_file_name import CaptureFileName
+from atnproc.config import Configuration, load_yaml
 
-import yaml
+if TYPE_CHECKING:
+    from atnproc.directory_watcher import DirectoryWatcher
 
-from atnproc.application import Application
-from atnproc.application_loop import ApplicationLoop
-from atnproc.config import Configuration
+LOGGING_CONFIG_FILE = Path("config/logging.yaml")
+# The repository's config directory, if not run from the repository root
+_PACKAGED_LOGGING_CONFIG_FILE = Path(__file__).resolve().parents[2] / LOGGING_CONFIG_FILE
 
 
 class MainApp:
@@ -68,8 +80,8 @@ class MainApp:
         else:
             print(f"EXCEPTION: {message}")
 
-    def get_config_file_path(self) -> Path:
-        """Parse command line arguments and return the config file path"""
+    def parse_arguments(self) -> argparse.Namespace:
+        """Parse command line arguments and validate the config file path"""
         parser = argparse.ArgumentParser()
         parser.add_argument(
             "-c",
@@ -78,29 +90,151 @@ class MainApp:
             required=True,
             help="Configuration file",
         )
+        parser.add_argument(
+            "--logging-config",
+            type=Path,
+            help=f"Logging configuration file (default: {LOGGING_CONFIG_FILE})",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run a single processing tick and exit; exit code 1 if it must be retried",
+        )
+        subparsers = parser.add_subparsers(dest="command")
+        backfill = subparsers.add_parser(
+            "backfill", help="Reprocess all capture files in a date range"
+        )
+        backfill.add_argument(
+            "--from",
+            dest="first_date",
+            type=self.parse_date,
+            required=True,
+            help="First capture date (YYYYMMDD)",
+        )
+        backfill.add_argument(
+            "--to",
+            dest="last_date",
+            type=self.parse_date,
+            required=True,
+            help="Last capture date (YYYYMMDD), inclusive",
+        )
+        backfill.add_argument(
+            "-o",
+            "--output-directory",
+            type=Path,
+            required=True,
+            help="Directory receiving the reprocessed router log files",
+        )
+        backfill.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=0,
+            help="Number of worker processes (default: number of CPUs)",
+        )
+        subparsers.add_parser(
+            "capture",
+            help="Capture live traffic into daily router log files",
+        )
+        query = subparsers.add_parser(
+            "query", help="Print the router log records of a time range"
+        )
+        query.add_argument(
+            "--from",
+            dest="start",
+            type=self.parse_timestamp,
+            required=True,
+            help="Start time (YYYY-MM-DD HH:MM[:SS[.mmm]]), inclusive",
+        )
+        query.add_argument(
+            "--to",
+            dest="end",
+            type=self.parse_timestamp,
+            required=True,
+            help="End time (YYYY-MM-DD HH:MM[:SS[.mmm]]), exclusive",
+        )
+        query.add_argument(
+            "-r",
+            "--remote-ip",
+            help="Only records exchanged with this remote IP address",
+        )
+        query.add_argument(
+            "-s",
+            "--sniffed-ip",
+            help="Read the router logs of this sniffed IP address (default: the first one)",
+        )
+        query.add_argument(
+            "paths",
+            nargs="*",
+            type=Path,
+            help="Router logs or directories (default: the output and capture directories)",
+        )
         args = parser.parse_args()
+        if args.once and args.command:
+            parser.error(f"--once cannot be used with the {args.command} command")
         config_file = Path(args.config_file)
         if not config_file.is_file():
             self.log_fatal(f"Configuration file does not exist: {config_file}")
-        return config_file
+        args.config_file = config_file
+        return args
+
+    @staticmethod
+    def parse_date(value: str) -> date:
+        """Parse a YYYYMMDD command line date"""
+        try:
+            return datetime.strptime(value, CaptureFileName.date_format()).date()
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"invalid date: {value}") from e
+
+    @staticmethod
+    def parse_timestamp(value: str) -> str:
+        """Parse a command line time into a router log timestamp"""
+        for time_format in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
+            try:
+                timestamp = datetime.strptime(value, time_format)
+            except ValueError:
+                continue
+            return timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        raise argparse.ArgumentTypeError(f"invalid time: {value}")
 
-    def configure_logging(self) -> None:
-        """Configure logging from a YAML file"""
+    def configure_logging(self, logging_config_file: Optional[Path]) -> None:
+        """Configure logging from a YAML file, or log to the console if there is none"""
+        if logging_config_file is None:
+            logging_config_file = next(
+                (f for f in (LOGGING_CONFIG_FILE, _PACKAGED_LOGGING_CONFIG_FILE) if f.is_file()),
+                None,
+            )
+        if logging_config_file is None:
+            logging.basicConfig(
+                level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+            )
+            return
         log_dir = Path("./log")
         log_dir.mkdir(exist_ok=True)
-        with open("config/logging.yaml", "r", encoding="utf-8") as f:
-            logging.config.dictConfig(yaml.safe_load(f))
+        logging.config.dictConfig(load_yaml(logging_config_file))
+
+    def create_watcher(self, config: Configuration) -> Optional["DirectoryWatcher"]:
+        """Create the capture directory watcher, if enabled in the configuration"""
+        if not config.watcher.enabled:
+            return None
+        from atnproc.directory_watcher import DirectoryWatcher
+
+        try:
+            return DirectoryWatcher(
+                config.capture_directories,
+                debounce=timedelta(seconds=config.watcher.debounce_seconds),
+            )
+        except OSError as e:
+            self.log_info(f"Directory watching unavailable, using polling only: {e}")
+            return None
 
     def run(self) -> None:
         """Main application entry point"""
-        self.configure_logging()
+        args = self.parse_arguments()
+        self.configure_logging(args.logging_config)
         self.logger = logging.getLogger(__name__)
-        exit_status = 0
         try:
-            config = Configuration(self.get_config_file_path())
-            application = Application(config)
-            main_loop = ApplicationLoop(application)
-            main_loop.start()
+            exit_status = self.run_command(Configuration(args.config_file), args)
         except KeyboardInterrupt:
             self.log_info("Interrupted by user (KeyboardInterrupt)")
             # Standard POSIX exit code for terminated by Ctrl+C
@@ -116,6 +250,79 @@ class MainApp:
         self.log_info(f"Normal exit with exit code: {exit_status}")
         sys.exit(exit_status)
 
+    def run_command(self, config: Configuration, args: argparse.Namespace) -> int:
+        """Run the command given on the command line and return the exit status"""
+        if args.command == "backfill":
+            return self.run_backfill(config, args)
+        if args.command == "capture":
+            return self.run_capture(config)
+        if args.command == "query":
+            return self.run_query(config, args)
+        if args.once:
+            return self.run_once(config)
+        return self.run_loop(config)
+
+    @staticmethod
+    def run_backfill(config: Configuration, args: argparse.Namespace) -> int:
+        """Reprocess the capture files of the dates given on the command line"""
+        from atnproc.backfill import Backfill
+
+        backfill = Backfill(
+            config,
+            args.first_date,
+            args.last_date,
+            args.output_directory,
+            max_workers=args.workers,
+        )
+        return 0 if backfill.run() else 1
+
+    @staticmethod
+    def run_capture(config: Configuration) -> int:
+        """Capture live traffic until stopped"""
+        from atnproc.application_loop import ApplicationLoop
+        from atnproc.capture_converter import CaptureConverter
+
+        converter = CaptureConverter(
+            config.capture.interface,
+            config.filter_ip,
+            config.capture.output_directory,
+            sync_interval=timedelta(seconds=config.capture.sync_interval_seconds),
+            rotation_overlap=timedelta(seconds=config.capture.rotation_overlap_seconds),
+        )
+        ApplicationLoop(converter).start()
+        return 0
+
+    @staticmethod
+    def run_query(config: Configuration, args: argparse.Namespace) -> int:
+        """Print the router log records of the time range given on the command line"""
+        from atnproc.router_log_query import RouterLogQuery
+
+        paths = args.paths or [config.work_directories.output, config.capture.output_directory]
+        sniffed_ip = args.sniffed_ip
+        if sniffed_ip == config.filter_ips[0]:
+            sniffed_ip = None
+        RouterLogQuery(
+            paths,
+            dedup_window=timedelta(seconds=config.merge.dedup_window_seconds),
+            sniffed_ip=sniffed_ip,
+        ).run(args.start, args.end, args.remote_ip, sys.stdout)
+        return 0
+
+    @staticmethod
+    def run_once(config: Configuration) -> int:
+        """Run a single processing tick; exit status 1 if it must be retried"""
+        from atnproc.application import run_once
+
+        return 0 if run_once(config) else 1
+
+    def run_loop(self, config: Configuration) -> int:
+        """Process the capture files until stopped"""
+        from atnproc.application import Application
+        from atnproc.application_loop import ApplicationLoop
+
+        ApplicationLoop(Application(config), self.create_watcher(config)).start()
+        return 0
+
 
 if __name__ == "__main__":
     MainApp().run()
@@ -0,0 +1,159 @@
+"""Processing metrics and their export as a node_exporter textfile.
+
+Contains `Metrics`, a small registry of Prometheus counters and gauges
+with timing spans for the processing stages, `ProcessStats` holding the
+resource usage of a child process as reported by ``os.wait4`` and
+`PipeStats` holding the data moved between two pipeline stages. The
+registry is written atomically in the Prometheus text format so the
+node_exporter textfile collector never reads a partial file.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+METRIC_PREFIX = "atnproc"
+COUNTER = "counter"
+GAUGE = "gauge"
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class ProcessStats:
+    """Resource usage of a finished (child) process."""
+    name: str
+    user_seconds: float
+    system_seconds: float
+    max_rss_bytes: int
+    exit_code: int
+
+
+@dataclass(frozen=True)
+class PipeStats:
+    """Data moved from one pipeline stage to the next."""
+    source: str
+    target: str
+    bytes: int
+    # Time spent waiting for the target to accept data (backpressure)
+    blocked_seconds: float
+
+
+def wait_process(proc: "subprocess.Popen[bytes]", name: str) -> ProcessStats:
+    """Waits for ``proc`` with ``os.wait4`` and returns its resource usage.
+
+    Sets ``proc.returncode`` so later ``wait()`` calls return immediately.
+    """
+    if proc.returncode is not None:
+        # Already reaped, the resource usage is no longer available
+        return ProcessStats(name, 0.0, 0.0, 0, proc.returncode)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return ProcessStats(
+        name=name,
+        user_seconds=rusage.ru_utime,
+        system_seconds=rusage.ru_stime,
+        # ru_maxrss is in kilobytes on Linux
+        max_rss_bytes=rusage.ru_maxrss * 1024,
+        exit_code=proc.returncode,
+    )
+
+
+class Metrics:
+    """Registry of counters and gauges exported in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._types: dict[str, str] = {}
+        self._help: dict[str, str] = {}
+        self._values: dict[str, dict[Labels, float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels: str) -> None:
+        """Increments the counter ``name`` by ``value``."""
+        values = self._metric(name, COUNTER, help_text)
+        key = self._labels(labels)
+        values[key] = values.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, help_text: str = "", **labels: str) -> None:
+        """Sets the gauge ``name`` to ``value``."""
+        self._metric(name, GAUGE, help_text)[self._labels(labels)] = value
+
+    def get(self, name: str, **labels: str) -> float:
+        return self._values.get(name, {}).get(self._labels(labels), 0.0)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Measures the duration of the enclosed stage."""
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start_time
+            self.set("stage_last_duration_seconds", elapsed,
+                     "Duration of the last run of a processing stage", stage=stage)
+            self.inc("stage_duration_seconds_total", elapsed,
+                     "Total duration of a processing stage", stage=stage)
+            self.inc("stage_runs_total", 1, "Number of runs of a processing stage", stage=stage)
+
+    def record_process(self, stats: ProcessStats) -> None:
+        """Records the resource usage of a finished process."""
+        self.inc("process_cpu_seconds_total", stats.user_seconds,
+                 "CPU time of the processing subprocesses", process=stats.name, mode="user")
+        self.inc("process_cpu_seconds_total", stats.system_seconds,
+                 "CPU time of the processing subprocesses", process=stats.name, mode="system")
+        self.set("process_max_rss_bytes", stats.max_rss_bytes,
+                 "Maximum RSS of the last run of a subprocess", process=stats.name)
+        self.inc("process_runs_total", 1, "Number of subprocess runs", process=stats.name)
+        if stats.exit_code != 0:
+            self.inc("process_failures_total", 1, "Number of failed subprocess runs",
+                     process=stats.name)
+
+    def record_pipe(self, stats: PipeStats) -> None:
+        """Records the data moved between two pipeline stages."""
+        link = f"{stats.source}->{stats.target}"
+        self.inc("pipe_bytes_total", stats.bytes,
+                 "Bytes moved between pipeline stages", link=link)
+        self.inc("pipe_blocked_seconds_total", stats.blocked_seconds,
+                 "Time a pipeline stage's output waited for the next stage", link=link)
+
+    def write_textfile(self, textfile: Path) -> None:
+        """Writes all metrics to ``textfile``, replacing it atomically."""
+        lines: list[str] = []
+        for name in sorted(self._values):
+            full_name = f"{METRIC_PREFIX}_{name}"
+            if self._help[name]:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} {self._types[name]}")
+            for labels, value in sorted(self._values[name].items()):
+                label_str = ",".join(f'{k}="{self._escape(v)}"' for k, v in labels)
+                lines.append(f"{full_name}{{{label_str}}} {value!r}" if label_str
+                             else f"{full_name} {value!r}")
+        # The temporary file must be in the same directory for the rename and
+        # must not end in .prom so it is not collected.
+        tmp_file = textfile.with_name(f".{textfile.name}.tmp")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_file, textfile)
+        except OSError as e:
+            self._logger.error(f"Failed to write metrics to {textfile}: {e}")
+
+    def _metric(self, name: str, metric_type: str, help_text: str) -> dict[Labels, float]:
+        if name not in self._values:
+            self._types[name] = metric_type
+            self._help[name] = help_text
+            self._values[name] = {}
+        return self._values[name]
+
+    @staticmethod
+    def _labels(labels: dict[str, str]) -> Labels:
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -1,63 +1,479 @@
-"""Packet processing logic using tcpdump and awk.
+"""Packet processing logic using tcpdump and awk or the native reader.
 
 This module implements the core logic described in PRD Section 6.2,
 handling the extraction and transformation of packets from pcap files.
+Two engines produce identical output, for untagged and single VLAN tagged
+frames (see :func:`~atnproc.clnp_record_emitter.tcpdump_filter`):
+
+- ``tcpdump``: pipes ``tcpdump`` text output through ``rtcd_routerlog.awk``.
+- ``native``: reads the pcap records in-process and formats them with
+  :class:`~atnproc.clnp_record_emitter.ClnpRecordEmitter`.
+
+Compressed and pcapng capture files (see :mod:`atnproc.capture_stream`)
+are decompressed and parsed as a stream. They are complete when they
+appear, so they are always processed from the start and only once.
+
+Several sniffed addresses can be filtered. The router log of the first
+address is the given output file, that of every further address is
+written next to it by :func:`address_output_file`. The native engine reads
+the capture file once for all addresses; the tcpdump engine runs one
+pipeline per address.
+
+The native engine can write segmented CLNP PDUs reassembled, see
+:class:`~atnproc.clnp_reassembler.ClnpReassembler`. Reassembly does not
+span calls: the segments of a PDU still incomplete at the end of the
+processed range are written as is.
 """
 
 import logging
+import os
+import resource
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import chain
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
 
+from atnproc.capture_stream import is_stream_format, iter_capture_stream, open_capture_stream
+from atnproc.clnp_reassembler import ClnpReassembler, ReassemblySettings, ReassemblyStats
+from atnproc.clnp_record_emitter import (
+    ClnpRecordDispatcher,
+    ClnpRecordEmitter,
+    tcpdump_filter,
+)
+from atnproc.metrics import PipeStats, ProcessStats
+from atnproc.pcap_file import PcapFile
+from atnproc.pcap_index import PcapIndex
+from atnproc.pcap_reader import PcapReader, PcapRecord
+from atnproc.pcap_stream_reader import PcapStreamReader
 from atnproc.process_pipeline import ProcessCommand, ProcessPipeline
 
+ENGINE_TCPDUMP = "tcpdump"
+ENGINE_NATIVE = "native"
+PACKET_ENGINES = (ENGINE_TCPDUMP, ENGINE_NATIVE)
+# Suffix of a rewritten router log until it is complete
+TEMPORARY_SUFFIX = ".tmp"
+
+
+def address_output_file(output_file: Path, filter_ip: str) -> Path:
+    """Returns the router log of a further sniffed address, ``<name>_<ip>.log``."""
+    return output_file.with_name(f"{output_file.stem}_{filter_ip}{output_file.suffix}")
+
+
+@dataclass(frozen=True)
+class ProcessorSettings:
+    """Settings of a :class:`PacketProcessor`; plain data, so it can be sent to a worker."""
+    filter_ips: tuple[str, ...]
+    """The sniffed IP addresses, the first one writing the output file."""
+    awk_script: Path
+    """Path to ``rtcd_routerlog.awk`` (tcpdump engine only)."""
+    engine: str = ENGINE_TCPDUMP
+    """One of :data:`PACKET_ENGINES`."""
+    use_index: bool = True
+    """Maintain a :class:`PcapIndex` sidecar next to each processed capture
+    file. Requires write access to the capture file's directory."""
+    pipeline_timeout_seconds: Optional[float] = None
+    """Kill the tcpdump/awk pipeline if it runs longer than this."""
+    reassembly: Optional[ReassemblySettings] = None
+    """Write segmented CLNP PDUs reassembled (native engine only)."""
+
+
+@dataclass
+class ProcessingStats:
+    """Counts of one call to :meth:`PacketProcessor.process_file`."""
+    packets: int = 0
+    """Packets read; only counted by the native engine."""
+    records: int = 0
+    """Router log records written; only counted by the native engine."""
+    output_bytes: int = 0
+    """Bytes written to the router logs."""
+    process_stats: list[ProcessStats] = field(default_factory=list)
+    """Resource usage: one entry per subprocess for the tcpdump engine, the
+    usage of the calling process itself for the native engine."""
+    pipe_stats: list[PipeStats] = field(default_factory=list)
+    """Data moved between the tcpdump/awk pipeline stages."""
+    reassembly: Optional[ReassemblyStats] = None
+    """Segment reassembly counts, if reassembly is enabled."""
+
 
 class PacketProcessor:
-    """Executes tcpdump and awk to process capture files."""
+    """Converts capture files into router log files using the configured engine."""
 
-    def __init__(self, filter_ip: str, awk_script: Path) -> None:
+    def __init__(self, settings: ProcessorSettings) -> None:
         self._logger = logging.getLogger(self.__class__.__name__)
-        self._filter_ip = filter_ip
-        self._awk_script = awk_script
-        self._pipeline = ProcessPipeline()
+        if settings.engine not in PACKET_ENGINES:
+            raise ValueError(f"Unknown packet engine: {settings.engine}")
+        if not settings.filter_ips:
+            raise ValueError("No filter IP address")
+        self._settings = settings
+        self._pipeline = ProcessPipeline(timeout_seconds=settings.pipeline_timeout_seconds)
+        if settings.reassembly and settings.engine != ENGINE_NATIVE:
+            self._logger.warning(
+                f"Segment reassembly is not supported by the {settings.engine} engine"
+            )
+        self._stats = ProcessingStats()
+        self._succeeded: bool = True
+
+    @property
+    def engine(self) -> str:
+        return self._settings.engine
 
-    def process_file(self, capture_file: Path, output_file: Path) -> None:
+    def process_file(
+        self,
+        capture_file: Path,
+        output_file: Path,
+        start_offset: int = 0,
+        end_offset: Optional[int] = None,
+    ) -> int:
         """Process the given capture file and write output to output_file.
 
-        Executes tcpdump on the capture file and pipes the output to the
-        configured awk script. The result is written (overwritten) to the
-        output file.
+        Only the complete pcap records from ``start_offset`` onwards (up to
+        ``end_offset`` if given) are processed; a partially written trailing
+        record is left for the next call. If ``start_offset`` is 0 the output
+        files are replaced once all records were written to temporary files,
+        otherwise the new records are appended to them.
+        A compressed or pcapng file is processed as a whole unless
+        ``start_offset`` is its size, i.e. it was processed before.
+
+        Returns the offset just past the last processed record, which is the
+        ``start_offset`` to use for the next call. On failure the original
+        ``start_offset`` is returned, the output files are left unchanged and
+        :attr:`succeeded` is False.
         """
-        # PRD 6.2.2: tcpdump arguments
-        tcpdump_cmd = [
-            "tcpdump",
-            "-r",
-            str(capture_file),
-            "-n",      # Do not convert host addresses to names
-            "-e",      # Output link level header
-            "-x",      # Output data in hex
-            "-tttt",   # Detailed timestamp
-            "-l",      # Line buffered (good practice for pipes)
-            f"ip host {self._filter_ip} and proto 80",
-        ]
+        self._stats = ProcessingStats()
+        self._succeeded = False
+        try:
+            pcap_file, start_offset, complete_end = self._resume_range(capture_file, start_offset)
+        except (OSError, ValueError) as e:
+            self._logger.error(f"Failed to read {capture_file}: {e}")
+            return start_offset
+        if end_offset is None or end_offset > complete_end:
+            end_offset = complete_end
+
+        append = start_offset > 0
+        if append and end_offset <= start_offset:
+            self._logger.debug(f"No new records in {capture_file}")
+            self._succeeded = True
+            return start_offset
 
-        # PRD 6.2.4: awk command
-        awk_cmd = [
-            "awk",
-            "-v",
-            f"RTCD_SNIFFED_ADDRESS={self._filter_ip}",
-            "-f",
-            str(self._awk_script),
+        self._logger.info(
+            f"Processing {capture_file} [{start_offset}:{end_offset}] -> {output_file}"
+            f" ({self._settings.engine})"
+        )
+        output_files = self.output_files(output_file)
+        output_sizes = [
+            file.stat().st_size if append and file.exists() else 0 for file in output_files
         ]
+        # Rewritten output files are replaced only once all records were written
+        targets = output_files if append else [
+            file.with_name(file.name + TEMPORARY_SUFFIX) for file in output_files
+        ]
+        start_time = time.monotonic()
+        if not self._run_engine(capture_file, pcap_file, (start_offset, end_offset), targets):
+            self._discard_output(output_files, output_sizes, targets)
+            return start_offset
+        if not append:
+            for target, file in zip(targets, output_files):
+                target.replace(file)
+        self._stats.output_bytes = sum(
+            file.stat().st_size - size for file, size in zip(output_files, output_sizes)
+        )
+        self._log_throughput(end_offset - start_offset, time.monotonic() - start_time)
+        self._succeeded = True
+        return end_offset
 
-        self._logger.info(f"Processing {capture_file} -> {output_file}")
+    def _resume_range(
+        self, capture_file: Path, start_offset: int
+    ) -> tuple[Optional[PcapFile], int, int]:
+        """Returns the pcap file, the offset to start from and the end of its complete records.
 
+        The pcap file is None for a compressed or pcapng file, which is
+        processed from the start unless ``start_offset`` is its size.
+        """
+        if is_stream_format(capture_file):
+            complete_end = capture_file.stat().st_size
+            return None, start_offset if start_offset == complete_end else 0, complete_end
+        pcap_file = PcapFile(capture_file)
+        if not self._settings.use_index:
+            return pcap_file, start_offset, pcap_file.complete_records_end(start_offset)
+        index = PcapIndex(pcap_file)
+        complete_end = index.update()
+        if start_offset > 0 and not index.is_record_boundary(start_offset):
+            self._logger.warning(
+                f"Offset {start_offset} is not a record boundary in "
+                f"{capture_file}, processing from the start"
+            )
+            start_offset = 0
+        return pcap_file, start_offset, complete_end
+
+    def _run_engine(
+        self,
+        capture_file: Path,
+        pcap_file: Optional[PcapFile],
+        offsets: tuple[int, int],
+        targets: list[Path],
+    ) -> bool:
+        """Converts the records in ``offsets`` into ``targets`` with the configured engine.
+
+        The records are appended to the targets unless the range starts at 0.
+        """
+        start_offset, end_offset = offsets
+        append = start_offset > 0
         try:
-            self._pipeline.run(
+            if self._settings.engine != ENGINE_NATIVE:
+                return self._run_tcpdump(
+                    capture_file,
+                    self._tcpdump_input(capture_file, pcap_file, start_offset, end_offset),
+                    targets,
+                    append,
+                )
+            if pcap_file is None:
+                with open_capture_stream(capture_file) as stream:
+                    stream_reader = PcapStreamReader(stream)
+                    return self._run_native(
+                        (record for batch in stream_reader.batches() for record in batch),
+                        lambda: stream_reader.link_type,
+                        targets,
+                        append,
+                    )
+            reader = PcapReader(pcap_file)
+            return self._run_native(
+                reader.records(start_offset, end_offset),
+                lambda: reader.link_type,
+                targets,
+                append,
+            )
+        except EOFError as e:
+            # A compressed file that is still being written
+            self._logger.warning(f"{capture_file} is incomplete, will retry: {e}")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._logger.exception("Failed to process %s: %s", capture_file, e)
+        return False
+
+    @staticmethod
+    def _discard_output(
+        output_files: list[Path], output_sizes: list[int], targets: list[Path]
+    ) -> None:
+        """Restores the output files after a failed run."""
+        if targets == output_files:
+            # Drop partially appended output so the records are not
+            # duplicated when they are processed again.
+            for file, size in zip(output_files, output_sizes):
+                if file.exists():
+                    os.truncate(file, size)
+        else:
+            for file in targets:
+                file.unlink(missing_ok=True)
+
+    def _log_throughput(self, num_bytes: int, elapsed: float) -> None:
+        elapsed = max(elapsed, 1e-6)
+        megabytes = num_bytes / 1e6
+        self._logger.info(
+            f"Processed {megabytes:.3f} MB in {elapsed:.3f}s "
+            f"({megabytes / elapsed:.1f} MB/s, {self._stats.packets / elapsed:.0f} packets/s)"
+        )
+
+    def output_files(self, output_file: Path) -> list[Path]:
+        """Returns the router log of every sniffed address, ``output_file`` first."""
+        return [output_file] + [
+            address_output_file(output_file, filter_ip)
+            for filter_ip in self._settings.filter_ips[1:]
+        ]
+
+    @property
+    def stats(self) -> ProcessingStats:
+        """Counts of the last call to :meth:`process_file`."""
+        return self._stats
+
+    @property
+    def succeeded(self) -> bool:
+        """True if the last call to :meth:`process_file` succeeded."""
+        return self._succeeded
+
+    @staticmethod
+    def _tcpdump_input(
+        capture_file: Path, pcap_file: Optional[PcapFile], start_offset: int, end_offset: int
+    ) -> Optional[Callable[[], Iterable[bytes]]]:
+        """Returns a factory of the pcap stream to pass to tcpdump on its stdin.
+
+        None if tcpdump reads the capture file itself, which is the case if
+        all of a pcap file is processed.
+        """
+        if pcap_file is None:
+            return lambda: iter_capture_stream(capture_file)
+        if start_offset == 0 and end_offset == capture_file.stat().st_size:
+            return None
+        return lambda: pcap_file.iter_bytes(start_offset, end_offset)
+
+    def _run_tcpdump(
+        self,
+        capture_file: Path,
+        input_chunks: Optional[Callable[[], Iterable[bytes]]],
+        output_files: list[Path],
+        append: bool,
+    ) -> bool:
+        success = True
+        for filter_ip, output_file in zip(self._settings.filter_ips, output_files):
+            # PRD 6.2.2: tcpdump arguments (a pcap stream is supplied on stdin)
+            tcpdump_cmd = [
+                "tcpdump",
+                "-r",
+                str(capture_file) if input_chunks is None else "-",
+                "-n",      # Do not convert host addresses to names
+                "-e",      # Output link level header
+                "-x",      # Output data in hex
+                "-tttt",   # Detailed timestamp
+                "-l",      # Line buffered (good practice for pipes)
+                tcpdump_filter(filter_ip),
+            ]
+
+            # PRD 6.2.4: awk command
+            awk_cmd = [
+                "awk",
+                "-v",
+                f"RTCD_SNIFFED_ADDRESS={filter_ip}",
+                "-f",
+                str(self._settings.awk_script),
+            ]
+
+            success = self._pipeline.run(
                 commands=[
                     ProcessCommand(cmd=tcpdump_cmd, name="tcpdump"),
                     ProcessCommand(cmd=awk_cmd, name="awk"),
                 ],
                 output_file=output_file,
+                input_chunks=None if input_chunks is None else input_chunks(),
+                append=append,
             )
+            self._stats.process_stats.extend(self._pipeline.process_stats)
+            self._stats.pipe_stats.extend(self._pipeline.pipe_stats)
+            if not success:
+                break
+        return success
 
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            self._logger.exception("Failed to process %s: %s", capture_file, e)
+    def _run_native(
+        self,
+        records: Iterator[PcapRecord],
+        link_type: Callable[[], int],
+        output_files: list[Path],
+        append: bool,
+    ) -> bool:
+        """Formats ``records`` into the output files.
+
+        ``link_type`` is called after the first record was read, when a
+        pcapng stream has described its interface.
+        """
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        mode = "a" if append else "w"
+        first_record = next(records, None)
+        if first_record is None:
+            for file in output_files:
+                with open(file, mode, encoding="utf-8"):
+                    pass
+        elif self._settings.reassembly:
+            self._run_reassembly(
+                chain((first_record,), records),
+                ClnpRecordDispatcher(self._settings.filter_ips, link_type()),
+                output_files,
+                mode,
+            )
+        elif len(output_files) == 1:
+            self._run_emitter(
+                chain((first_record,), records),
+                ClnpRecordEmitter(self._settings.filter_ips[0], link_type()),
+                output_files[0],
+                mode,
+            )
+        else:
+            self._run_dispatcher(
+                chain((first_record,), records),
+                ClnpRecordDispatcher(self._settings.filter_ips, link_type()),
+                output_files,
+                mode,
+            )
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._stats.process_stats = [
+            ProcessStats(
+                name=ENGINE_NATIVE,
+                user_seconds=usage.ru_utime - usage_before.ru_utime,
+                system_seconds=usage.ru_stime - usage_before.ru_stime,
+                max_rss_bytes=usage.ru_maxrss * 1024,
+                exit_code=0,
+            )
+        ]
+        return True
+
+    def _run_emitter(
+        self,
+        records: Iterator[PcapRecord],
+        emitter: ClnpRecordEmitter,
+        output_file: Path,
+        mode: str,
+    ) -> None:
+        """Formats ``records`` of a single sniffed address into ``output_file``."""
+        with open(output_file, mode, encoding="utf-8") as out_f:
+            for record in records:
+                self._stats.packets += 1
+                line = emitter.format(record)
+                if line is not None:
+                    out_f.write(line)
+                    self._stats.records += 1
+
+    def _run_dispatcher(
+        self,
+        records: Iterator[PcapRecord],
+        dispatcher: ClnpRecordDispatcher,
+        output_files: list[Path],
+        mode: str,
+    ) -> None:
+        """Formats ``records`` into the output file of each sniffed address."""
+        with ExitStack() as stack:
+            writers = [
+                stack.enter_context(open(file, mode, encoding="utf-8")).write
+                for file in output_files
+            ]
+            for record in records:
+                self._stats.packets += 1
+                for index, line in dispatcher.format(record):
+                    writers[index](line)
+                    self._stats.records += 1
+
+    def _run_reassembly(
+        self,
+        records: Iterator[PcapRecord],
+        dispatcher: ClnpRecordDispatcher,
+        output_files: list[Path],
+        mode: str,
+    ) -> None:
+        """Formats ``records`` into the output files with segmented PDUs reassembled."""
+        settings = self._settings.reassembly
+        assert settings is not None
+        reassemblers = [ClnpReassembler(emitter, settings) for emitter in dispatcher.emitters]
+        with ExitStack() as stack:
+            writers = [
+                stack.enter_context(open(file, mode, encoding="utf-8")).writelines
+                for file in output_files
+            ]
+            for record in records:
+                self._stats.packets += 1
+                for index, packet in dispatcher.match(record):
+                    reassembler = reassemblers[index]
+                    reassembler.add(record, packet)
+                    lines = reassembler.lines()
+                    writers[index](lines)
+                    self._stats.records += len(lines)
+            for write, reassembler in zip(writers, reassemblers):
+                lines = reassembler.flush()
+                write(lines)
+                self._stats.records += len(lines)
+        self._stats.reassembly = sum((r.stats for r in reassemblers), ReassemblyStats())
+        self._log_reassembly(self._stats.reassembly)
+
+    def _log_reassembly(self, stats: ReassemblyStats) -> None:
+        if stats.segments:
+            self._logger.info(
+                f"Reassembled {stats.reassembled} PDUs from {stats.segments} segments "
+                f"({stats.timed_out} timed out, {stats.evicted} evicted, "
+                f"{stats.incomplete} incomplete, {stats.invalid} invalid)"
+            )
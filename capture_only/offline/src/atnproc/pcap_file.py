@@ -0,0 +1,123 @@
+"""Structural helpers for classic libpcap capture files.
+
+This module provides the :class:`PcapFile` helper which understands the
+libpcap file layout (a global header followed by record header / packet data
+pairs) well enough to locate the complete records in a capture file that may
+still be growing because of an ongoing ``rsync`` transfer.
+"""
+
+import struct
+from pathlib import Path
+from typing import Iterator
+
+PCAP_GLOBAL_HEADER_LENGTH = 24
+PCAP_RECORD_HEADER_LENGTH = 16
+
+# Upper bound for a single record; anything larger indicates a corrupt or
+# misaligned record header.
+PCAP_MAX_RECORD_LENGTH = 262144
+
+# Magic number (as stored in the file) -> (struct byte order, nanosecond resolution)
+MAGIC_NUMBERS = {
+    b"\xd4\xc3\xb2\xa1": ("<", False),
+    b"\xa1\xb2\xc3\xd4": (">", False),
+    b"\x4d\x3c\xb2\xa1": ("<", True),
+    b"\xa1\xb2\x3c\x4d": (">", True),
+}
+
+
+class PcapFile:
+    """Represents a (possibly still growing) pcap file on the filesystem.
+
+    The global header is read on construction. A file that is too short to
+    contain a global header is treated as a file without any records.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self._file: Path = file
+        with open(file, "rb") as f:
+            self._header: bytes = f.read(PCAP_GLOBAL_HEADER_LENGTH)
+        self._byte_order: str = "<"
+        self._nanosecond: bool = False
+        if len(self._header) < PCAP_GLOBAL_HEADER_LENGTH:
+            self._header = b""
+            return
+        magic = self._header[:4]
+        if magic not in MAGIC_NUMBERS:
+            raise ValueError(f"Not a pcap file (magic={magic.hex()}): {file}")
+        self._byte_order, self._nanosecond = MAGIC_NUMBERS[magic]
+
+    @property
+    def path(self) -> Path:
+        return self._file
+
+    @property
+    def header(self) -> bytes:
+        """Returns the raw global header, or ``b""`` if not yet available."""
+        return self._header
+
+    @property
+    def byte_order(self) -> str:
+        """Returns the ``struct`` byte order prefix of the file."""
+        return self._byte_order
+
+    @property
+    def nanosecond(self) -> bool:
+        """Returns True if record timestamps have nanosecond resolution."""
+        return self._nanosecond
+
+    @property
+    def link_type(self) -> int:
+        if not self._header:
+            return 0
+        link_type: int = struct.unpack(f"{self._byte_order}I", self._header[20:24])[0]
+        return link_type
+
+    def complete_records_end(self, start_offset: int = 0) -> int:
+        """Returns the offset just past the last complete record.
+
+        Walks the record headers starting at ``start_offset`` (which must be
+        a record boundary) and stops at the first record that is not fully
+        present in the file, e.g. a trailing record still being written by
+        ``rsync``.
+        """
+        if not self._header:
+            return 0
+        offset = max(start_offset, PCAP_GLOBAL_HEADER_LENGTH)
+        record_header = struct.Struct(f"{self._byte_order}IIII")
+        with open(self._file, "rb") as f:
+            file_size = f.seek(0, 2)
+            while offset + PCAP_RECORD_HEADER_LENGTH <= file_size:
+                f.seek(offset)
+                _, _, incl_len, _ = record_header.unpack(
+                    f.read(PCAP_RECORD_HEADER_LENGTH)
+                )
+                if incl_len > PCAP_MAX_RECORD_LENGTH:
+                    raise ValueError(
+                        f"Invalid record length {incl_len} at offset {offset}: {self._file}"
+                    )
+                record_end = offset + PCAP_RECORD_HEADER_LENGTH + incl_len
+                if record_end > file_size:
+                    break
+                offset = record_end
+        return offset
+
+    def iter_bytes(
+        self, start_offset: int, end_offset: int, chunk_size: int = 1024 * 1024
+    ) -> Iterator[bytes]:
+        """Yields a standalone pcap stream covering ``[start_offset, end_offset)``.
+
+        The global header is emitted first so that the result can be read by
+        any pcap consumer (e.g. ``tcpdump -r -``).
+        """
+        yield self._header
+        start_offset = max(start_offset, PCAP_GLOBAL_HEADER_LENGTH)
+        with open(self._file, "rb") as f:
+            f.seek(start_offset)
+            remaining = end_offset - start_offset
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
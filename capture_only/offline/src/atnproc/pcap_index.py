@@ -0,0 +1,179 @@
+"""Sidecar index of pcap record offsets and timestamps.
+
+This module provides :class:`PcapIndex` which maintains a binary sidecar
+file (``<capture file>.idx``) next to a capture file. The index lists the
+offset and timestamp of every complete record. It is built once and then
+extended as the capture file grows, so callers can seek directly to the
+first unprocessed record or to the first record of a time window without
+rescanning the capture file from the start.
+
+Index file layout (little endian):
+    8 bytes   magic ``APCIDX01``
+    24 bytes  copy of the pcap global header (used for validation)
+    N * 16    entries: uint64 record offset, uint64 timestamp in microseconds
+"""
+
+import bisect
+import logging
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Optional
+
+from atnproc.pcap_file import (
+    PCAP_GLOBAL_HEADER_LENGTH,
+    PCAP_MAX_RECORD_LENGTH,
+    PCAP_RECORD_HEADER_LENGTH,
+    PcapFile,
+)
+
+INDEX_SUFFIX = ".idx"
+
+_INDEX_MAGIC = b"APCIDX01"
+_INDEX_HEADER_LENGTH = len(_INDEX_MAGIC) + PCAP_GLOBAL_HEADER_LENGTH
+_ENTRY = struct.Struct("<QQ")
+
+
+class PcapIndex:
+    """Record offset/timestamp index for a (possibly growing) pcap file."""
+
+    def __init__(self, pcap_file: PcapFile, index_file: Optional[Path] = None) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._pcap_file = pcap_file
+        self._index_file: Path = index_file or pcap_file.path.with_name(
+            pcap_file.path.name + INDEX_SUFFIX
+        )
+        self._offsets: "array[int]" = array("Q")
+        self._timestamps: "array[int]" = array("Q")
+        self._end_offset: int = len(pcap_file.header)
+        self._load()
+
+    @property
+    def index_file(self) -> Path:
+        return self._index_file
+
+    @property
+    def end_offset(self) -> int:
+        """Offset just past the last indexed (complete) record."""
+        return self._end_offset
+
+    @property
+    def num_records(self) -> int:
+        return len(self._offsets)
+
+    def is_record_boundary(self, offset: int) -> bool:
+        """Returns True if ``offset`` is the start of a record or the end of the index."""
+        if offset == self._end_offset:
+            return True
+        position = bisect.bisect_left(self._offsets, offset)
+        return position < len(self._offsets) and self._offsets[position] == offset
+
+    def offset_at(self, timestamp_usec: int) -> int:
+        """Returns the offset of the first record at or after ``timestamp_usec``.
+
+        Returns :attr:`end_offset` if all indexed records are older.
+        """
+        position = bisect.bisect_left(self._timestamps, timestamp_usec)
+        if position < len(self._offsets):
+            return self._offsets[position]
+        return self._end_offset
+
+    def update(self) -> int:
+        """Extends the index with the records appended since the last update.
+
+        Returns the new :attr:`end_offset`.
+        """
+        if not self._pcap_file.header:
+            return 0
+        offsets: "array[int]" = array("Q")
+        timestamps: "array[int]" = array("Q")
+        record_header = struct.Struct(f"{self._pcap_file.byte_order}IIII")
+        ts_divisor = 1000 if self._pcap_file.nanosecond else 1
+        offset = self._end_offset
+        with open(self._pcap_file.path, "rb") as f:
+            file_size = f.seek(0, 2)
+            if file_size < offset:
+                self._logger.warning(f"{self._pcap_file.path} shrank, rebuilding index")
+                self._reset()
+                offset = self._end_offset
+            if file_size <= offset:
+                return self._end_offset
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                while offset + PCAP_RECORD_HEADER_LENGTH <= file_size:
+                    ts_sec, ts_frac, incl_len, _ = record_header.unpack_from(mapping, offset)
+                    if incl_len > PCAP_MAX_RECORD_LENGTH:
+                        raise ValueError(
+                            f"Invalid record length {incl_len} at offset {offset}: "
+                            f"{self._pcap_file.path}"
+                        )
+                    record_end = offset + PCAP_RECORD_HEADER_LENGTH + incl_len
+                    if record_end > file_size:
+                        break
+                    offsets.append(offset)
+                    timestamps.append(ts_sec * 1_000_000 + ts_frac // ts_divisor)
+                    offset = record_end
+        if offsets:
+            self._append(offsets, timestamps)
+            self._end_offset = offset
+        return self._end_offset
+
+    def _load(self) -> None:
+        if not self._pcap_file.header or not self._index_file.is_file():
+            return
+        data = self._index_file.read_bytes()
+        if (
+            data[:len(_INDEX_MAGIC)] != _INDEX_MAGIC
+            or data[len(_INDEX_MAGIC):_INDEX_HEADER_LENGTH] != self._pcap_file.header
+        ):
+            self._logger.warning(f"Discarding stale index {self._index_file}")
+            self._index_file.unlink()
+            return
+        entries = data[_INDEX_HEADER_LENGTH:]
+        entries = entries[:len(entries) - len(entries) % _ENTRY.size]
+        values: "array[int]" = array("Q")
+        values.frombytes(entries)
+        if sys.byteorder != "little":
+            values.byteswap()
+        self._offsets = values[0::2]
+        self._timestamps = values[1::2]
+        if self._offsets and not self._validate_last_entry():
+            self._logger.warning(
+                f"Index does not match capture file, rebuilding {self._index_file}"
+            )
+            self._reset()
+
+    def _validate_last_entry(self) -> bool:
+        """Checks the last entry against the capture file and sets the end offset."""
+        offset = self._offsets[-1]
+        record_header = struct.Struct(f"{self._pcap_file.byte_order}IIII")
+        with open(self._pcap_file.path, "rb") as f:
+            f.seek(offset)
+            header = f.read(PCAP_RECORD_HEADER_LENGTH)
+            if len(header) < PCAP_RECORD_HEADER_LENGTH:
+                return False
+            ts_sec, ts_frac, incl_len, _ = record_header.unpack(header)
+            file_size = f.seek(0, 2)
+        if self._pcap_file.nanosecond:
+            ts_frac //= 1000
+        record_end = offset + PCAP_RECORD_HEADER_LENGTH + incl_len
+        if ts_sec * 1_000_000 + ts_frac != self._timestamps[-1] or record_end > file_size:
+            return False
+        self._end_offset = record_end
+        return True
+
+    def _reset(self) -> None:
+        self._offsets = array("Q")
+        self._timestamps = array("Q")
+        self._end_offset = len(self._pcap_file.header)
+        self._index_file.unlink(missing_ok=True)
+
+    def _append(self, offsets: "array[int]", timestamps: "array[int]") -> None:
+        new_file = not self._index_file.exists()
+        with open(self._index_file, "ab") as f:
+            if new_file:
+                f.write(_INDEX_MAGIC + self._pcap_file.header)
+            f.write(b"".join(_ENTRY.pack(o, t) for o, t in zip(offsets, timestamps)))
+        self._offsets.extend(offsets)
+        self._timestamps.extend(timestamps)
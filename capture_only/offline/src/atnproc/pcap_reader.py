@@ -0,0 +1,77 @@
+"""In-process reader for pcap records.
+
+This module provides :class:`PcapReader` which iterates over the records of
+a :class:`~atnproc.pcap_file.PcapFile` without involving external tools, and
+the :class:`PcapRecord` tuple describing a single captured packet.
+
+The capture file is memory-mapped and packet data is exposed as
+``memoryview`` slices of the mapping, so no per-packet copies are made.
+"""
+
+import mmap
+import struct
+from typing import Iterator, NamedTuple
+
+from atnproc.pcap_file import PCAP_RECORD_HEADER_LENGTH, PcapFile
+
+
+class PcapRecord(NamedTuple):
+    """A single captured packet."""
+
+    offset: int
+    """Offset of the record header in the capture file."""
+    ts_sec: int
+    ts_usec: int
+    """Sub-second part of the timestamp, always in microseconds."""
+    orig_len: int
+    data: memoryview
+    """Packet data; only valid while the reader is iterating."""
+
+
+class PcapReader:
+    """Iterates over the complete records of a pcap file."""
+
+    def __init__(self, pcap_file: PcapFile) -> None:
+        self._pcap_file = pcap_file
+        self._record_header = struct.Struct(f"{pcap_file.byte_order}IIII")
+
+    @property
+    def link_type(self) -> int:
+        return self._pcap_file.link_type
+
+    def records(self, start_offset: int, end_offset: int) -> Iterator[PcapRecord]:
+        """Yields the records located in ``[start_offset, end_offset)``.
+
+        ``start_offset`` must be a record boundary and ``end_offset`` is
+        expected to come from :meth:`PcapFile.complete_records_end`.
+        """
+        offset = max(start_offset, len(self._pcap_file.header))
+        if offset + PCAP_RECORD_HEADER_LENGTH > end_offset:
+            return
+        unpack = self._record_header.unpack_from
+        nanosecond = self._pcap_file.nanosecond
+        with open(self._pcap_file.path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        try:
+            end_offset = min(end_offset, len(mapping))
+            while offset + PCAP_RECORD_HEADER_LENGTH <= end_offset:
+                ts_sec, ts_frac, incl_len, orig_len = unpack(view, offset)
+                data_offset = offset + PCAP_RECORD_HEADER_LENGTH
+                if data_offset + incl_len > end_offset:
+                    break
+                if nanosecond:
+                    ts_frac //= 1000
+                yield PcapRecord(
+                    offset, ts_sec, ts_frac, orig_len,
+                    view[data_offset:data_offset + incl_len],
+                )
+                offset = data_offset + incl_len
+        finally:
+            view.release()
+            try:
+                mapping.close()
+            except BufferError:
+                # A consumer still holds a packet view; the mapping is
+                # released once that view is garbage collected.
+                pass
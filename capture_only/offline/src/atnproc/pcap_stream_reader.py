@@ -0,0 +1,219 @@
+"""Incremental reader for a pcap or pcapng stream.
+
+This module provides :class:`PcapStreamReader` which parses the records
+arriving on a pipe, e.g. from ``tcpdump -U -w -``, or read from a
+decompressing file object. Every read returns the data available so far,
+so records are handed out as soon as they are complete: one batch per
+read, which keeps the latency low at low packet rates and amortizes the
+per-batch work at high rates.
+
+Both the classic pcap format and pcapng (as written by ``dumpcap``) are
+recognized by their magic number. Of a pcapng stream the Enhanced Packet
+Blocks and obsolete Packet Blocks are returned; their timestamps are
+converted to microseconds using the ``if_tsresol`` of their interface.
+All packets must come from interfaces with the link type of the first
+interface, packets of other interfaces are skipped.
+"""
+
+import struct
+from typing import IO, Callable, Iterator, Optional
+
+from atnproc.pcap_file import (
+    MAGIC_NUMBERS,
+    PCAP_GLOBAL_HEADER_LENGTH,
+    PCAP_MAX_RECORD_LENGTH,
+    PCAP_RECORD_HEADER_LENGTH,
+)
+from atnproc.pcap_reader import PcapRecord
+
+_READ_SIZE = 256 * 1024
+
+PCAPNG_SECTION_HEADER = b"\x0a\x0d\x0d\x0a"
+_PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+_PCAPNG_INTERFACE_DESCRIPTION = 1
+_PCAPNG_PACKET = 2
+_PCAPNG_ENHANCED_PACKET = 6
+_PCAPNG_OPTION_TSRESOL = 9
+# Block type and total length, and the trailing total length
+_PCAPNG_BLOCK_OVERHEAD = 12
+_PCAPNG_MAX_BLOCK_LENGTH = PCAP_MAX_RECORD_LENGTH + 1024
+
+
+class PcapStreamReader:
+    """Yields the records of a pcap or pcapng stream in batches as they arrive."""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self._stream = stream
+        self._link_type = 0
+        self._offset = 0
+        # pcap
+        self._record_header: Optional[struct.Struct] = None
+        self._nanosecond = False
+        # pcapng: byte order of the current section and per interface
+        # the link type and the number of timestamp units per second
+        self._byte_order = "<"
+        self._interfaces: list[tuple[int, int]] = []
+
+    @property
+    def link_type(self) -> int:
+        """Link type of the stream; 0 until the (first interface) header was read."""
+        return self._link_type
+
+    @property
+    def offset(self) -> int:
+        """Stream offset just past the last record returned."""
+        return self._offset
+
+    def batches(self) -> Iterator[list[PcapRecord]]:
+        """Yields the complete records received by each read until EOF.
+
+        Raises ValueError if the stream is not a pcap or pcapng stream or a
+        record header is corrupt.
+        """
+        read: Callable[[int], bytes] = getattr(self._stream, "read1", self._stream.read)
+        buffer = bytearray()
+        parse: Optional[Callable[[bytearray, list[PcapRecord]], int]] = None
+        while True:
+            chunk = read(_READ_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+            if parse is None:
+                if len(buffer) < PCAP_GLOBAL_HEADER_LENGTH:
+                    continue
+                parse = self._start(buffer)
+
+            records: list[PcapRecord] = []
+            position = parse(buffer, records)
+            del buffer[:position]
+            self._offset += position
+            if records:
+                yield records
+
+    def _start(self, buffer: bytearray) -> Callable[[bytearray, list[PcapRecord]], int]:
+        """Determines the format from the start of the stream; returns its parser."""
+        magic = bytes(buffer[:4])
+        if magic == PCAPNG_SECTION_HEADER:
+            # Parsed with the other blocks
+            return self._parse_pcapng
+        if magic not in MAGIC_NUMBERS:
+            raise ValueError(f"Not a pcap stream (magic={magic.hex()})")
+        byte_order, self._nanosecond = MAGIC_NUMBERS[magic]
+        self._record_header = struct.Struct(f"{byte_order}IIII")
+        self._link_type = struct.unpack_from(f"{byte_order}I", buffer, 20)[0]
+        del buffer[:PCAP_GLOBAL_HEADER_LENGTH]
+        self._offset = PCAP_GLOBAL_HEADER_LENGTH
+        return self._parse_pcap
+
+    def _parse_pcap(self, buffer: bytearray, records: list[PcapRecord]) -> int:
+        """Appends the complete pcap records in ``buffer``; returns their length."""
+        assert self._record_header is not None
+        unpack = self._record_header.unpack_from
+        position = 0
+        while position + PCAP_RECORD_HEADER_LENGTH <= len(buffer):
+            ts_sec, ts_frac, incl_len, orig_len = unpack(buffer, position)
+            if incl_len > PCAP_MAX_RECORD_LENGTH:
+                raise ValueError(
+                    f"Invalid record length {incl_len} at offset {self._offset + position}"
+                )
+            data_start = position + PCAP_RECORD_HEADER_LENGTH
+            if data_start + incl_len > len(buffer):
+                break
+            if self._nanosecond:
+                ts_frac //= 1000
+            # Copied, as the buffer is reused for the next read
+            data = memoryview(bytes(buffer[data_start:data_start + incl_len]))
+            records.append(
+                PcapRecord(self._offset + position, ts_sec, ts_frac, orig_len, data)
+            )
+            position = data_start + incl_len
+        return position
+
+    def _parse_pcapng(self, buffer: bytearray, records: list[PcapRecord]) -> int:
+        """Appends the packets of the complete pcapng blocks in ``buffer``."""
+        position = 0
+        while position + _PCAPNG_BLOCK_OVERHEAD <= len(buffer):
+            block_type = bytes(buffer[position:position + 4])
+            if block_type == PCAPNG_SECTION_HEADER:
+                byte_order_magic = buffer[position + 8:position + 12]
+                if len(byte_order_magic) < 4:
+                    break
+                if struct.unpack_from("<I", byte_order_magic)[0] == _PCAPNG_BYTE_ORDER_MAGIC:
+                    self._byte_order = "<"
+                elif struct.unpack_from(">I", byte_order_magic)[0] == _PCAPNG_BYTE_ORDER_MAGIC:
+                    self._byte_order = ">"
+                else:
+                    raise ValueError(
+                        f"Invalid pcapng section header at offset {self._offset + position}"
+                    )
+                # Interface ids are local to a section
+                self._interfaces = []
+            block_code, block_length = struct.unpack_from(
+                f"{self._byte_order}II", buffer, position
+            )
+            if (
+                block_length < _PCAPNG_BLOCK_OVERHEAD
+                or block_length % 4
+                or block_length > _PCAPNG_MAX_BLOCK_LENGTH
+            ):
+                raise ValueError(
+                    f"Invalid block length {block_length} at offset {self._offset + position}"
+                )
+            if position + block_length > len(buffer):
+                break
+            body = memoryview(buffer)[position + 8:position + block_length - 4]
+            try:
+                if block_code == _PCAPNG_INTERFACE_DESCRIPTION:
+                    self._add_interface(body)
+                elif block_code in (_PCAPNG_ENHANCED_PACKET, _PCAPNG_PACKET):
+                    record = self._packet(block_code, body, self._offset + position)
+                    if record is not None:
+                        records.append(record)
+            finally:
+                body.release()
+            position += block_length
+        return position
+
+    def _add_interface(self, body: memoryview) -> None:
+        """Records the link type and timestamp resolution of an interface."""
+        link_type = struct.unpack_from(f"{self._byte_order}H", body, 0)[0]
+        units_per_second = 1_000_000
+        position = 8
+        while position + 4 <= len(body):
+            code, length = struct.unpack_from(f"{self._byte_order}HH", body, position)
+            if code == 0:
+                break
+            if code == _PCAPNG_OPTION_TSRESOL and length >= 1:
+                resolution = body[position + 4]
+                if resolution & 0x80:
+                    units_per_second = 1 << (resolution & 0x7F)
+                else:
+                    units_per_second = 10 ** resolution
+            position += 4 + (length + 3) // 4 * 4
+        self._interfaces.append((link_type, units_per_second))
+        if not self._link_type:
+            self._link_type = link_type
+
+    def _packet(self, block_code: int, body: memoryview, offset: int) -> Optional[PcapRecord]:
+        """Returns the record of an (Enhanced) Packet Block."""
+        if block_code == _PCAPNG_ENHANCED_PACKET:
+            interface_id, ts_high, ts_low, incl_len, orig_len = struct.unpack_from(
+                f"{self._byte_order}IIIII", body, 0
+            )
+        else:
+            interface_id, _, ts_high, ts_low, incl_len, orig_len = struct.unpack_from(
+                f"{self._byte_order}HHIIII", body, 0
+            )
+        if interface_id >= len(self._interfaces):
+            raise ValueError(f"Packet of unknown interface {interface_id} at offset {offset}")
+        link_type, units_per_second = self._interfaces[interface_id]
+        if link_type != self._link_type:
+            return None
+        ts_sec, ts_frac = divmod((ts_high << 32) | ts_low, units_per_second)
+        return PcapRecord(
+            offset,
+            ts_sec,
+            ts_frac * 1_000_000 // units_per_second,
+            orig_len,
+            memoryview(bytes(body[20:20 + incl_len])),
+        )
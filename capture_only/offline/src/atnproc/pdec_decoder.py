@@ -0,0 +1,79 @@
+"""Decoding of router logs with the Airtel ``pdec_clnp`` utility.
+
+Contains `PdecDecoder` which runs ``pdec_clnp`` on a router log as
+described in the Design document (Protocol Decoding). ``pdec_clnp`` writes
+its ``pdus*.csv`` files to its working directory.
+"""
+
+import logging
+import subprocess
+import time
+from pathlib import Path
+from typing import Optional
+
+from atnproc.metrics import ProcessStats, wait_process
+
+PDUS_CSV_PATTERN = "pdus*.csv"
+
+
+class PdecDecoder:
+    """Runs ``pdec_clnp`` in a work directory and returns its CSV files."""
+
+    def __init__(self, executable: Path, atsu_file: Path, work_directory: Path) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._executable = executable
+        self._atsu_file = atsu_file
+        self._work_directory = work_directory
+        self._process_stats: Optional[ProcessStats] = None
+
+    @property
+    def process_stats(self) -> Optional[ProcessStats]:
+        """Resource usage of ``pdec_clnp`` in the last :meth:`decode`, if it ran."""
+        return self._process_stats
+
+    def decode(self, log_file: Path) -> list[Path]:
+        """Decodes ``log_file`` and returns the generated ``pdus*.csv`` files.
+
+        Returns an empty list if decoding failed.
+        """
+        self._work_directory.mkdir(parents=True, exist_ok=True)
+        # Remove the files of the previous run so stale files are not reported
+        for csv_file in self._work_directory.glob(PDUS_CSV_PATTERN):
+            csv_file.unlink()
+        cmd = [
+            str(self._executable),
+            "-s", str(self._atsu_file.resolve()),
+            "-i", str(log_file.resolve()),
+            "--csv",
+            "--notxt",
+            "--quiet",
+            "--nointermediate",
+        ]
+        start_time = time.monotonic()
+        self._process_stats = None
+        try:
+            with subprocess.Popen(
+                cmd,
+                cwd=self._work_directory,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            ) as proc:
+                stderr = proc.stderr.read() if proc.stderr else b""
+                stats = wait_process(proc, self._executable.name)
+        except OSError as e:
+            self._logger.error(f"Failed to run {self._executable}: {e}")
+            return []
+        self._process_stats = stats
+        if stats.exit_code != 0:
+            self._logger.error(
+                f"{self._executable.name} failed to decode {log_file} "
+                f"(exit code {stats.exit_code}): "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
+            return []
+        csv_files = sorted(self._work_directory.glob(PDUS_CSV_PATTERN))
+        self._logger.info(
+            f"Decoded {log_file} into {len(csv_files)} CSV file(s) "
+            f"in {time.monotonic() - start_time:.3f}s"
+        )
+        return csv_files
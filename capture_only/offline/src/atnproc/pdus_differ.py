@@ -0,0 +1,190 @@
+"""Incremental detection of new rows in successive PDEC ``pdus.csv`` files.
+
+Contains `PdusDiffer` which compares each new ``pdus.csv`` with the
+previous iteration's file (see Design "Airtel Router Logfile Decoding")
+and streams only the new rows to a timestamped Filebeat input file.
+
+The previous file itself is not kept. A compact sidecar index
+``<csv>.idx`` records its size, digests of its first and last bytes and
+an 8-byte hash per row (at most ``max_rows``, newest kept). Two cases are
+handled:
+
+- The new file extends the previous one (same capture files, more
+  traffic): the rows after the previous size are new; the rest of the
+  file is not read.
+- The new file was rewritten (e.g. a new capture file shifted the decoded
+  window): each row is new unless its hash is in the index.
+"""
+
+import hashlib
+import logging
+import os
+import struct
+from array import array
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"APDIDX01"
+# magic, csv size, head digest, tail digest
+_INDEX_HEADER = struct.Struct("<8sQ16s16s")
+# Number of bytes at the start and end of the previous file that must match
+_DIGEST_REGION = 4096
+
+
+def _row_hash(row: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(row, digest_size=8).digest(), "little")
+
+
+class PdusDiffer:
+    """Writes the rows of a ``pdus.csv`` file not seen in its previous version."""
+
+    def __init__(self, max_rows: int = 1_000_000) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._max_rows = max_rows
+
+    def diff(self, csv_file: Path, output_file: Path) -> int:
+        """Appends the new rows of ``csv_file`` to ``output_file``.
+
+        The output file is only created if there are new rows. Returns the
+        number of new rows.
+        """
+        index_file = csv_file.with_name(csv_file.name + INDEX_SUFFIX)
+        previous = self._load_header(index_file)
+        with open(csv_file, "rb") as f:
+            extended = previous is not None and self._extends(
+                f, csv_file.stat().st_size, *previous
+            )
+            if previous is not None and extended:
+                start = previous[0]
+                seen: set[int] = set()
+            else:
+                start = 0
+                seen = self._load_hashes(index_file)
+            hashes = array("Q")
+            new_rows, rows_size = self._write_new_rows(
+                self._rows(f, start), seen, output_file, hashes
+            )
+            end = start + rows_size
+            # A trailing partial row is left for the next iteration
+            head_digest = self._digest(f, 0, min(end, _DIGEST_REGION))
+            tail_digest = self._tail_digest(f, end)
+        if extended:
+            self._append_index(index_file, end, head_digest, tail_digest, hashes)
+        else:
+            self._write_index(index_file, end, head_digest, tail_digest, hashes)
+        self._logger.info(
+            f"{csv_file.name} {'extended' if extended else 'rewritten'}: {new_rows} new row(s)"
+        )
+        return new_rows
+
+    @staticmethod
+    def _write_new_rows(
+        rows: Iterator[bytes], seen: set[int], output_file: Path, hashes: "array[int]"
+    ) -> tuple[int, int]:
+        """Appends the rows not in ``seen`` to ``output_file``.
+
+        The hash of every row is appended to ``hashes``. Returns the number
+        of new rows and the size of all rows.
+        """
+        rows_size = 0
+        new_rows = 0
+        with ExitStack() as stack:
+            out_f: Optional[BinaryIO] = None
+            for row in rows:
+                rows_size += len(row)
+                row_hash = _row_hash(row)
+                hashes.append(row_hash)
+                if row_hash in seen:
+                    continue
+                if out_f is None:
+                    out_f = stack.enter_context(open(output_file, "ab"))
+                out_f.write(row)
+                new_rows += 1
+        return new_rows, rows_size
+
+    @staticmethod
+    def _extends(
+        f: BinaryIO, size: int, previous_size: int, previous_head: bytes, previous_tail: bytes
+    ) -> bool:
+        """Returns True if the file starts with the previous file's bytes."""
+        if size < previous_size:
+            return False
+        if PdusDiffer._digest(f, 0, min(previous_size, _DIGEST_REGION)) != previous_head:
+            return False
+        return PdusDiffer._tail_digest(f, previous_size) == previous_tail
+
+    @staticmethod
+    def _digest(f: BinaryIO, start: int, end: int) -> bytes:
+        f.seek(start)
+        return hashlib.blake2b(f.read(end - start), digest_size=16).digest()
+
+    @staticmethod
+    def _tail_digest(f: BinaryIO, end: int) -> bytes:
+        return PdusDiffer._digest(f, max(0, end - _DIGEST_REGION), end)
+
+    @staticmethod
+    def _rows(f: BinaryIO, start: int) -> Iterator[bytes]:
+        """Yields the complete rows of ``f`` from ``start``."""
+        f.seek(start)
+        for row in f:
+            if row.endswith(b"\n"):
+                yield row
+
+    def _load_header(self, index_file: Path) -> Optional[tuple[int, bytes, bytes]]:
+        try:
+            with open(index_file, "rb") as f:
+                header = f.read(_INDEX_HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(header) != _INDEX_HEADER.size:
+            self._logger.warning(f"Ignoring truncated index {index_file}")
+            return None
+        magic, size, head_digest, tail_digest = _INDEX_HEADER.unpack(header)
+        if magic != _INDEX_MAGIC:
+            self._logger.warning(f"Ignoring index with unexpected format {index_file}")
+            return None
+        return size, head_digest, tail_digest
+
+    def _load_hashes(self, index_file: Path) -> set[int]:
+        if self._load_header(index_file) is None:
+            return set()
+        hashes = array("Q")
+        with open(index_file, "rb") as f:
+            f.seek(_INDEX_HEADER.size)
+            data = f.read()
+        hashes.frombytes(data[:len(data) - len(data) % hashes.itemsize])
+        return set(hashes)
+
+    def _append_index(
+        self, index_file: Path, size: int, head_digest: bytes, tail_digest: bytes,
+        hashes: "array[int]",
+    ) -> None:
+        num_rows = (index_file.stat().st_size - _INDEX_HEADER.size) // hashes.itemsize
+        if num_rows + len(hashes) > self._max_rows:
+            # Compact: keep the newest rows only
+            all_hashes = array("Q")
+            with open(index_file, "rb") as f:
+                f.seek(_INDEX_HEADER.size)
+                all_hashes.frombytes(f.read(num_rows * hashes.itemsize))
+            all_hashes.extend(hashes)
+            self._write_index(index_file, size, head_digest, tail_digest, all_hashes)
+            return
+        with open(index_file, "r+b") as f:
+            f.seek(_INDEX_HEADER.size + num_rows * hashes.itemsize)
+            hashes.tofile(f)
+            f.seek(0)
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, size, head_digest, tail_digest))
+
+    def _write_index(
+        self, index_file: Path, size: int, head_digest: bytes, tail_digest: bytes,
+        hashes: "array[int]",
+    ) -> None:
+        if len(hashes) > self._max_rows:
+            hashes = hashes[len(hashes) - self._max_rows:]
+        tmp_file = index_file.with_name(index_file.name + ".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, size, head_digest, tail_digest))
+            hashes.tofile(f)
+        os.replace(tmp_file, index_file)
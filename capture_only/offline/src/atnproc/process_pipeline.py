@@ -1,12 +1,29 @@
-"""Module for executing piped processes."""
+"""Module for executing piped processes.
 
-from __future__ import annotations
+The data between the stages of a pipeline is relayed by threads of the
+calling process, which counts the bytes moved and the time each stage
+waited for the next one to accept data. The stderr of every process is
+drained concurrently so a chatty process can never block on a full pipe.
+Every process runs in its own session; if the pipeline exceeds its
+timeout the process groups are killed.
+"""
 
 import logging
+import os
+import signal
 import subprocess
+import threading
+import time
 from contextlib import ExitStack
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import IO, Callable, Iterable, Optional
+
+from atnproc.metrics import PipeStats, ProcessStats, wait_process
+
+_RELAY_CHUNK_SIZE = 64 * 1024
+# Amount of stderr output kept per process for error messages
+_MAX_STDERR_SIZE = 64 * 1024
 
 
 @dataclass
@@ -16,76 +33,237 @@ class ProcessCommand:
     name: str
 
 
+@dataclass
+class _Pipe:
+    """The data moved into a process, counted by the thread writing it."""
+    source: str
+    target: str
+    stats: Optional[PipeStats] = None
+
+
+@dataclass
+class _Stage:
+    """A running process of the pipeline and the threads serving its pipes."""
+    command: ProcessCommand
+    process: "subprocess.Popen[bytes]"
+    stderr: bytearray = field(default_factory=bytearray)
+    pipe: Optional[_Pipe] = None
+    threads: list[threading.Thread] = field(default_factory=list)
+
+    def start_thread(self, target: Callable[..., None], *args: object) -> None:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+
 class ProcessPipeline:
     """Executes a chain of processes, piping the output of one into the next."""
 
-    def __init__(self) -> None:
+    def __init__(self, timeout_seconds: Optional[float] = None) -> None:
         self._logger = logging.getLogger(self.__class__.__name__)
+        self._timeout_seconds = timeout_seconds
+        self._process_stats: list[ProcessStats] = []
+        self._pipe_stats: list[PipeStats] = []
+        self._timed_out = False
+
+    @property
+    def process_stats(self) -> list[ProcessStats]:
+        """Resource usage of the processes of the last :meth:`run`, sink first."""
+        return self._process_stats
+
+    @property
+    def pipe_stats(self) -> list[PipeStats]:
+        """Data moved into and between the processes of the last :meth:`run`."""
+        return self._pipe_stats
+
+    @property
+    def timed_out(self) -> bool:
+        """True if the last :meth:`run` was killed after exceeding the timeout."""
+        return self._timed_out
 
     def run(
         self,
         commands: list[ProcessCommand],
         output_file: Path,
-    ) -> None:
+        input_chunks: Optional[Iterable[bytes]] = None,
+        append: bool = False,
+    ) -> bool:
         """Runs cmd1 | cmd2 | ... | cmdN > output_file.
 
         Args:
             commands: A list of process definitions to execute in the pipeline.
             output_file: Path to the file where the last process's stdout will be written.
+            input_chunks: Optional data written to the stdin of the first process.
+            append: Append to output_file instead of overwriting it.
+
+        Returns:
+            True if all processes in the pipeline exited successfully within
+            the timeout.
         """
+        self._process_stats = []
+        self._pipe_stats = []
+        self._timed_out = False
         if not commands:
-            return
-
-        procs: list[tuple[subprocess.Popen[bytes], str]] = []
-        prev_stdout = None
+            return True
 
+        stages: list[_Stage] = []
         with ExitStack() as stack:
-            out_f = stack.enter_context(open(output_file, "w", encoding="utf-8"))
-            for i, command in enumerate(commands):
-                is_last = i == len(commands) - 1
-                stdout = out_f if is_last else subprocess.PIPE
-                stdin = prev_stdout
-
-                proc = stack.enter_context(
-                    subprocess.Popen(
-                        command.cmd,
-                        stdin=stdin,
-                        stdout=stdout,
-                        stderr=subprocess.PIPE,
-                    )
-                )
-                procs.append((proc, command.name))
-
-                # Close the read end of the previous pipe in the parent
-                # so that only the child has it open.
-                if prev_stdout:
-                    prev_stdout.close()
-
-                prev_stdout = proc.stdout
-
-            self._wait_for_pipeline(procs)
-
-    def _wait_for_pipeline(
-        self, procs: list[tuple[subprocess.Popen[bytes], str]]
-    ) -> None:
-        """Waits for processes in the pipeline to finish and logs errors."""
-        # Wait for the last process to finish first (the sink)
-        last_proc, last_name = procs[-1]
-        _, last_err = last_proc.communicate()
-
-        if last_proc.returncode != 0:
-            self._logger.error(
-                "%s error: %s", last_name, last_err.decode().strip()
-            )
-
-        # Handle upstream processes in reverse order
-        for proc, name in reversed(procs[:-1]):
-            # We can't use communicate() because we closed stdout in parent.
-            # Read stderr directly.
-            err_output = proc.stderr.read() if proc.stderr else b""
+            try:
+                with open(output_file, "ab" if append else "wb") as out_f:
+                    for i, command in enumerate(commands):
+                        is_last = i == len(commands) - 1
+                        stage = self._start_stage(command, stack.enter_context(subprocess.Popen(
+                            command.cmd,
+                            stdin=subprocess.PIPE if i > 0 or input_chunks is not None else None,
+                            stdout=out_f if is_last else subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            start_new_session=True,
+                        )))
+                        if i > 0:
+                            self._start_relay(stages[-1], stage)
+                        elif input_chunks is not None:
+                            stage.pipe = _Pipe("input", command.name)
+                            stage.start_thread(
+                                self._feed_input, input_chunks, stage.process.stdin, stage.pipe
+                            )
+                        stages.append(stage)
+                exit_codes = self._wait_for_pipeline(stages)
+            finally:
+                # Only stops running processes if starting the pipeline failed;
+                # leaving the stack then closes their pipes.
+                self._stop(stages)
+        self._pipe_stats = [stage.pipe.stats for stage in stages if stage.pipe and stage.pipe.stats]
+        return self._check_exit_codes(stages, exit_codes)
+
+    def _start_stage(
+        self, command: ProcessCommand, process: "subprocess.Popen[bytes]"
+    ) -> _Stage:
+        """Returns the stage of ``process`` with the thread draining its stderr started."""
+        stage = _Stage(command, process)
+        stage.start_thread(self._drain, stage.process.stderr, stage.stderr)
+        return stage
+
+    def _start_relay(self, upstream: _Stage, stage: _Stage) -> None:
+        """Starts the thread relaying the output of ``upstream`` to ``stage``."""
+        stage.pipe = _Pipe(upstream.command.name, stage.command.name)
+        stage.start_thread(self._relay, upstream.process.stdout, stage.process.stdin, stage.pipe)
+
+    def _stop(self, stages: list[_Stage]) -> None:
+        """Kills and reaps the unfinished processes and waits for the pipe threads."""
+        unfinished = [stage.process for stage in stages if stage.process.returncode is None]
+        self._kill(unfinished)
+        for proc in unfinished:
             proc.wait()
+        for stage in stages:
+            for thread in stage.threads:
+                thread.join()
 
-            if proc.returncode != 0:
+    def _check_exit_codes(self, stages: list[_Stage], exit_codes: list[int]) -> bool:
+        """Logs the stderr of the failed processes; returns True if none failed."""
+        success = not self._timed_out
+        # Report the sink first, then the upstream processes
+        for stage, exit_code in reversed(list(zip(stages, exit_codes))):
+            if exit_code != 0 and not self._timed_out:
+                success = False
                 self._logger.error(
-                    "%s error: %s", name, err_output.decode().strip()
+                    "%s error: %s", stage.command.name,
+                    stage.stderr.decode(errors="replace").strip(),
                 )
+        return success
+
+    def _wait_for_pipeline(self, stages: list[_Stage]) -> list[int]:
+        """Waits for the processes to exit and returns their exit codes.
+
+        Kills all processes if the pipeline exceeds the timeout.
+        """
+        stats: list[Optional[ProcessStats]] = [None] * len(stages)
+
+        def wait(index: int) -> None:
+            stats[index] = wait_process(stages[index].process, stages[index].command.name)
+
+        waiters = [self._start_thread(wait, i) for i in range(len(stages))]
+        deadline = (
+            time.monotonic() + self._timeout_seconds if self._timeout_seconds else None
+        )
+        for waiter in waiters:
+            waiter.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if waiter.is_alive():
+                self._timed_out = True
+                self._logger.error(
+                    f"Pipeline {' | '.join(s.command.name for s in stages)} exceeded the "
+                    f"timeout of {self._timeout_seconds}s, killing it"
+                )
+                self._kill([s.process for s in stages if s.process.returncode is None])
+                break
+        for waiter in waiters:
+            waiter.join()
+        self._process_stats = [s for s in reversed(stats) if s]
+        return [s.exit_code if s else -1 for s in stats]
+
+    def _kill(self, procs: list[subprocess.Popen[bytes]]) -> None:
+        """Kills the process groups of ``procs``."""
+        for proc in procs:
+            try:
+                # Each process leads its own session, see run()
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def _feed_input(self, input_chunks: Iterable[bytes], stdin: IO[bytes], pipe: _Pipe) -> None:
+        """Writes the input data to the first process and closes its stdin."""
+        num_bytes = 0
+        blocked_seconds = 0.0
+        try:
+            for chunk in input_chunks:
+                blocked_seconds += self._write_all(stdin.fileno(), chunk)
+                num_bytes += len(chunk)
+        except BrokenPipeError:
+            self._logger.warning("Pipeline input closed before all data was written")
+        finally:
+            stdin.close()
+            pipe.stats = PipeStats(pipe.source, pipe.target, num_bytes, blocked_seconds)
+
+    def _relay(self, stdout: IO[bytes], stdin: IO[bytes], pipe: _Pipe) -> None:
+        """Copies the output of one process to the input of the next one."""
+        num_bytes = 0
+        blocked_seconds = 0.0
+        try:
+            while True:
+                chunk = os.read(stdout.fileno(), _RELAY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                blocked_seconds += self._write_all(stdin.fileno(), chunk)
+                num_bytes += len(chunk)
+        except BrokenPipeError:
+            self._logger.debug(f"{pipe.target} closed its input before {pipe.source} finished")
+        finally:
+            # Closing the read end makes a still writing source exit with SIGPIPE
+            stdout.close()
+            stdin.close()
+            pipe.stats = PipeStats(pipe.source, pipe.target, num_bytes, blocked_seconds)
+
+    @staticmethod
+    def _write_all(fd: int, data: bytes) -> float:
+        """Writes ``data`` to ``fd`` and returns the time spent writing."""
+        start_time = time.monotonic()
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        return time.monotonic() - start_time
+
+    @staticmethod
+    def _drain(stderr: IO[bytes], buffer: bytearray) -> None:
+        """Reads ``stderr`` until EOF, keeping the first part in ``buffer``."""
+        while True:
+            chunk = os.read(stderr.fileno(), _RELAY_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(buffer) < _MAX_STDERR_SIZE:
+                buffer += chunk[:_MAX_STDERR_SIZE - len(buffer)]
+
+    @staticmethod
+    def _start_thread(target: Callable[..., None], *args: object) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,124 @@
+"""Persisted processing state of a capture source.
+
+This module provides :class:`ProcessingState` which records everything
+needed to resume processing after a restart or failover:
+
+- the current capture file (PRD 6.1.5) and the files whose processing
+  was planned but not completed,
+- per capture file the fingerprint (inode, size, mtime) of the source
+  file, the byte offset just past the last fully processed pcap record
+  and the size of the router log files written up to that offset.
+
+The state is stored as a JSON document that is replaced atomically, so
+it always reflects a completed update. A router log that is larger than
+the recorded size was appended to by an interrupted run; the excess is
+removed before processing resumes from the recorded offset.
+"""
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from atnproc.file_stager import FileFingerprint
+
+STATE_VERSION = 1
+
+
+@dataclass
+class FileState:
+    """Processing state of one capture file."""
+    offset: int = 0
+    output_size: int = 0
+    inode: int = 0
+    size: int = 0
+    mtime_ns: int = 0
+    # Router log sizes of the further sniffed addresses, by address
+    address_output_sizes: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def fingerprint(self) -> FileFingerprint:
+        return FileFingerprint(self.inode, self.size, self.mtime_ns)
+
+
+class ProcessingState:
+    """Keeps the processing state of one capture source."""
+
+    def __init__(self, state_file: Path) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._state_file: Path = state_file
+        self._current_file: Optional[str] = None
+        self._pending: list[str] = []
+        self._files: dict[str, FileState] = {}
+        if state_file.is_file():
+            self._load()
+
+    @property
+    def current_file(self) -> Optional[str]:
+        """Name of the current capture file."""
+        return self._current_file
+
+    @current_file.setter
+    def current_file(self, file_name: Optional[str]) -> None:
+        self._current_file = file_name
+
+    @property
+    def pending(self) -> list[str]:
+        """Names of the files whose processing has not completed."""
+        return self._pending
+
+    @pending.setter
+    def pending(self, file_names: list[str]) -> None:
+        self._pending = list(file_names)
+
+    def file(self, file_name: str) -> FileState:
+        """Returns the state of ``file_name``, creating an empty one if unknown."""
+        return self._files.setdefault(file_name, FileState())
+
+    def reset(self, file_name: str) -> None:
+        """Forgets the progress of ``file_name``."""
+        self._files.pop(file_name, None)
+
+    def retain(self, file_names: Iterable[str]) -> None:
+        """Forgets the state of all files not listed in ``file_names``."""
+        keep = set(file_names)
+        self._files = {k: v for k, v in self._files.items() if k in keep}
+        self._pending = [name for name in self._pending if name in keep]
+
+    def save(self) -> None:
+        """Writes the state, replacing the state file atomically."""
+        state = {
+            "version": STATE_VERSION,
+            "current_file": self._current_file,
+            "pending": self._pending,
+            "files": {name: asdict(state) for name, state in sorted(self._files.items())},
+        }
+        tmp_file = self._state_file.with_name(self._state_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_file.replace(self._state_file)
+
+    def _load(self) -> None:
+        try:
+            with open(self._state_file, encoding="utf-8") as f:
+                state: Any = json.load(f)
+            self._current_file = state.get("current_file")
+            self._pending = [str(name) for name in state.get("pending", [])]
+            self._files = {
+                str(name): self._file_state(values) for name, values in state["files"].items()
+            }
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            self._logger.warning(f"Ignoring invalid state file {self._state_file}: {e}")
+            self._current_file = None
+            self._pending = []
+            self._files = {}
+
+    @staticmethod
+    def _file_state(values: dict[str, Any]) -> FileState:
+        """Returns the file state of ``values``, ignoring unknown fields."""
+        known = {f.name for f in fields(FileState)}
+        return FileState(**{k: v for k, v in values.items() if k in known})
@@ -0,0 +1,78 @@
+"""Units of packet processing work that can run in a worker process.
+
+A :class:`ProcessingTask` describes the processing of one capture file into
+its router log file. Tasks and their :class:`ProcessingResult` only hold
+plain data so they can be sent to and from a process pool. The
+module-level :func:`execute_tasks` runs a list of tasks in order and is
+the function submitted to the pool, with the :class:`ProcessorSettings`
+built from the configuration by :func:`processor_settings`.
+"""
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from atnproc.clnp_reassembler import ReassemblySettings
+from atnproc.config import Configuration
+from atnproc.packet_processor import PacketProcessor, ProcessingStats, ProcessorSettings
+
+
+@dataclass(frozen=True)
+class ProcessingTask:
+    """Process ``capture_file`` from ``start_offset`` into ``output_file``."""
+    file_name: str
+    capture_file: Path
+    output_file: Path
+    start_offset: int
+
+
+@dataclass(frozen=True)
+class ProcessingResult:
+    """Outcome of a :class:`ProcessingTask`."""
+    file_name: str
+    start_offset: int
+    end_offset: int
+    elapsed_seconds: float
+    succeeded: bool
+    stats: ProcessingStats = field(default_factory=ProcessingStats)
+
+
+def processor_settings(config: Configuration, use_index: bool = True) -> ProcessorSettings:
+    """Returns the settings of the packet processors of ``config``."""
+    return ProcessorSettings(
+        filter_ips=tuple(config.filter_ips),
+        awk_script=config.awk_script,
+        engine=config.processing.engine,
+        use_index=use_index,
+        pipeline_timeout_seconds=config.processing.pipeline_timeout_seconds,
+        reassembly=ReassemblySettings(
+            timeout_seconds=config.reassembly.timeout_seconds,
+            max_bytes=config.reassembly.max_bytes,
+        )
+        if config.reassembly.enabled
+        else None,
+    )
+
+
+def execute_tasks(
+    settings: ProcessorSettings, tasks: list[ProcessingTask]
+) -> list[ProcessingResult]:
+    """Executes ``tasks`` in order and returns their results."""
+    processor = PacketProcessor(settings)
+    results: list[ProcessingResult] = []
+    for task in tasks:
+        start_time = time.monotonic()
+        end_offset = processor.process_file(
+            task.capture_file, task.output_file, task.start_offset
+        )
+        results.append(
+            ProcessingResult(
+                file_name=task.file_name,
+                start_offset=task.start_offset,
+                end_offset=end_offset,
+                elapsed_seconds=time.monotonic() - start_time,
+                succeeded=processor.succeeded,
+                stats=processor.stats,
+            )
+        )
+    return results
@@ -4,10 +4,11 @@ import logging
 
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from atnproc.capture_file_name import CaptureFileName
+from atnproc.capture_file_name import CAPTURE_FILE_SUFFIXES, CaptureFileName
 from atnproc.capture_file import CaptureFile
+from atnproc.directory_index import DirectoryIndex
 from atnproc.file_loader import FileLoader
 
 
@@ -16,29 +17,50 @@ class RecentCaptureFileLoader:
 
     This class searches specified directories for files from today and, if
     fewer than two files are found, from yesterday. It uses a glob pattern
-    that includes the date in 'YYYYMMDD' format (e.g., '*_20230101*.pcap').
+    per capture file suffix that includes the date in 'YYYYMMDD' format
+    (e.g., '*_20230101*.pcap').
 
+    If a :class:`DirectoryIndex` is given, the files are taken from the
+    index instead, which only rescans directories that have changed.
     """
 
-    def __init__(self, directories: list[Path]) -> None:
+    def __init__(
+        self, directories: list[Path], index: Optional[DirectoryIndex] = None
+    ) -> None:
         self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
         self._file_loader = FileLoader(directories)
-        self._load_files()
+        self._directories = directories
+        self._index = index
+        self._indexed_files: list[CaptureFile] = []
+        if index is None:
+            self._load_files()
+        else:
+            self._load_indexed_files(index)
 
     @property
     def files(self) -> List[CaptureFile]:
+        if self._index is not None:
+            return self._indexed_files
         return [CaptureFile(file) for file in self._file_loader.files]
 
+    def _load_indexed_files(self, index: DirectoryIndex) -> None:
+        today = datetime.today().date()
+        yesterday = today - timedelta(days=1)
+        files = [file for d in self._directories for file in index.files(d)]
+        self._indexed_files = [file for file in files if file.date == today]
+        if len(self._indexed_files) < 2:
+            self._indexed_files += [file for file in files if file.date == yesterday]
+
     def _load_files(self) -> None:
         # Load today's files
         today = datetime.today()
         today_str = today.strftime(CaptureFileName.date_format())
-        today_pattern = f"*_{today_str}*.pcap"
-        self._file_loader.load_files(today_pattern)
+        for suffix in CAPTURE_FILE_SUFFIXES:
+            self._file_loader.load_files(f"*_{today_str}*{suffix}")
 
         if self._file_loader.num_files < 2:
             # Load yesterday's files
             yesterday = today - timedelta(days=1)
             yesterday_str = yesterday.strftime(CaptureFileName.date_format())
-            yesterday_pattern = f"*_{yesterday_str}*.pcap"
-            self._file_loader.load_files(yesterday_pattern)
+            for suffix in CAPTURE_FILE_SUFFIXES:
+                self._file_loader.load_files(f"*_{yesterday_str}*{suffix}")
@@ -28,6 +28,10 @@ class RecentCaptureFiles:
     def files(self) -> List[Path]:
         return [file.path for file in self._recent_files]
 
+    @property
+    def recent_files(self) -> List[CaptureFile]:
+        return self._recent_files
+
     @property
     def latest(self) -> Optional[CaptureFile]:
         if len(self._recent_files) == 0:
@@ -0,0 +1,210 @@
+"""Removal of expired files from the work area and capture directories.
+
+Contains `RetentionEngine` which replaces the ``find -mtime`` based
+cleanup scripts for the directories of this application. Each
+`RetentionPolicy` names a directory (tree), the name patterns of the files
+it manages and the age after which they expire (by modification time).
+
+- The trees are walked with a single ``os.scandir`` pass, at most once
+  per ``scan_interval`` of the `RetentionSettings`; the expired files are queued, oldest first.
+- Files still open in any process are kept, like ``lsof`` would report
+  them. The open files are taken from one sweep of ``/proc/*/fd`` per
+  run instead of one check per file. Without root privileges only the
+  processes of the same user are visible.
+- Unlinks are rate limited to ``max_unlinks_per_second`` and a run stops
+  after ``max_run_time``; the remaining files are removed by the next
+  runs, so the removal of a large backlog is spread over many ticks and
+  does not compete with the live pipeline for I/O.
+"""
+
+import fnmatch
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from atnproc.metrics import Metrics
+
+PROC_DIRECTORY = Path("/proc")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Files in ``directory`` expire ``max_age`` after their last change."""
+    directory: Path
+    max_age: timedelta
+    patterns: tuple[str, ...] = ("*",)
+    """Name patterns of the files that expire."""
+    exclude: tuple[str, ...] = ()
+    """Name patterns of files that never expire."""
+    recursive: bool = True
+    """Whether the files in the subdirectories expire as well."""
+
+
+@dataclass(frozen=True)
+class RetentionSettings:
+    """Pace of the scans and removals of a :class:`RetentionEngine`."""
+    scan_interval: timedelta = timedelta(hours=1)
+    """Minimum time between two scans of the directories."""
+    max_unlinks_per_second: float = 50.0
+    """Rate limit of the removals; 0 for no limit."""
+    max_run_time: timedelta = timedelta(seconds=2)
+    """Time after which a run stops removing files."""
+
+    @property
+    def unlink_interval(self) -> float:
+        """Minimum time in seconds between two removals."""
+        return 1.0 / self.max_unlinks_per_second if self.max_unlinks_per_second > 0 else 0.0
+
+
+def open_files(proc_directory: Path = PROC_DIRECTORY) -> set[str]:
+    """Returns the paths of the files open in any (visible) process."""
+    paths: set[str] = set()
+    try:
+        processes = os.scandir(proc_directory)
+    except OSError:
+        return paths
+    with processes:
+        for process in processes:
+            if not process.name.isdigit():
+                continue
+            try:
+                with os.scandir(os.path.join(process.path, "fd")) as descriptors:
+                    for descriptor in descriptors:
+                        try:
+                            paths.add(os.readlink(descriptor.path))
+                        except OSError:
+                            continue
+            except OSError:
+                # Exited, or a process of another user
+                continue
+    return paths
+
+
+class RetentionEngine:
+    """Removes the expired files of a set of directory trees in rate-limited runs."""
+
+    def __init__(
+        self,
+        policies: list[RetentionPolicy],
+        metrics: Metrics,
+        settings: RetentionSettings = RetentionSettings(),
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._policies = policies
+        self._metrics = metrics
+        self._settings = settings
+        self._last_scan: Optional[float] = None
+        # Expired files, oldest first: path, size and modification time
+        self._expired: deque[tuple[str, int, float]] = deque()
+
+    @property
+    def pending(self) -> int:
+        """Number of expired files not yet removed."""
+        return len(self._expired)
+
+    def run(self) -> int:
+        """Scans the directories if due and removes expired files; returns the number removed."""
+        now = time.monotonic()
+        if not self._expired and (
+            self._last_scan is None
+            or now - self._last_scan >= self._settings.scan_interval.total_seconds()
+        ):
+            self._last_scan = now
+            self._scan()
+        removed = self._remove() if self._expired else 0
+        self._metrics.set("retention_pending_files", len(self._expired),
+                          "Expired files waiting to be removed")
+        return removed
+
+    def _scan(self) -> None:
+        start_time = time.monotonic()
+        now = time.time()
+        expired: list[tuple[str, int, float]] = []
+        for policy in self._policies:
+            if not policy.directory.is_dir():
+                continue
+            deadline = now - policy.max_age.total_seconds()
+            # Resolved, so paths compare equal to the /proc/*/fd link targets
+            directories = [os.path.realpath(policy.directory)]
+            while directories:
+                try:
+                    entries = os.scandir(directories.pop())
+                except OSError as e:
+                    self._logger.warning(f"Cannot scan {e.filename}: {e.strerror}")
+                    continue
+                with entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if policy.recursive:
+                                    directories.append(entry.path)
+                                continue
+                            if not entry.is_file(follow_symlinks=False):
+                                continue
+                            if not any(
+                                fnmatch.fnmatch(entry.name, pattern)
+                                for pattern in policy.patterns
+                            ) or any(
+                                fnmatch.fnmatch(entry.name, pattern) for pattern in policy.exclude
+                            ):
+                                continue
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if stat.st_mtime < deadline:
+                            expired.append((entry.path, stat.st_size, stat.st_mtime))
+        expired.sort(key=lambda item: item[2])
+        self._expired = deque(expired)
+        self._logger.info(
+            f"Found {len(expired)} expired file(s) in {len(self._policies)} "
+            f"director{'y' if len(self._policies) == 1 else 'ies'} "
+            f"in {time.monotonic() - start_time:.3f}s"
+        )
+
+    def _remove(self) -> int:
+        start_time = time.monotonic()
+        in_use = open_files()
+        removed = 0
+        removed_bytes = 0
+        skipped = 0
+        next_unlink = start_time
+        max_run_seconds = self._settings.max_run_time.total_seconds()
+        while self._expired and time.monotonic() - start_time < max_run_seconds:
+            path, size, mtime = self._expired.popleft()
+            if path in in_use:
+                skipped += 1
+                continue
+            try:
+                if os.lstat(path).st_mtime != mtime:
+                    # Changed since the scan; checked again by the next scan
+                    continue
+            except FileNotFoundError:
+                continue
+            delay = next_unlink - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.unlink(path)
+            except OSError as e:
+                self._logger.warning(f"Failed to remove {path}: {e}")
+                continue
+            next_unlink = time.monotonic() + self._settings.unlink_interval
+            removed += 1
+            removed_bytes += size
+        metrics = self._metrics
+        metrics.inc("retention_files_removed_total", removed, "Expired files removed")
+        metrics.inc("retention_bytes_removed_total", removed_bytes,
+                    "Bytes of the expired files removed")
+        metrics.inc("retention_files_open_total", skipped,
+                    "Expired files kept because they were open")
+        if removed or skipped:
+            self._logger.info(
+                f"Removed {removed} expired file(s) ({removed_bytes / 1e6:.1f} MB), "
+                f"kept {skipped} open file(s), {len(self._expired)} pending"
+            )
+        return removed
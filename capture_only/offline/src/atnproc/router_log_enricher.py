@@ -0,0 +1,94 @@
+"""Facility enrichment of router log records.
+
+Contains `RouterLogEnricher` which appends the ATSU facilities of the CLNP
+source and destination NSAP to router log records, so that consumers can
+filter them without waiting for ``pdec_clnp``:
+
+    <router log record> <source facility> <destination facility>
+
+The NSAPs are taken from the CLNP header at the start of the PDU hex of
+the record; a facility that cannot be determined is written as ``-``.
+The router logs themselves are left untouched as they are the input of
+``pdec_clnp``.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from atnproc.facility_index import FacilityIndex
+
+UNKNOWN_FACILITY = "-"
+_CLNP_NLPID = 0x81
+# Fields of a router log record with a remote IP address and CLNP PDU
+_CLNP_RECORD_FIELDS = 8
+# Fixed part of the CLNP header before the destination address length
+_CLNP_FIXED_HEADER_LENGTH = 9
+
+
+class RouterLogEnricher:
+    """Writes router log records with their source and destination facility."""
+
+    def __init__(self, index: FacilityIndex) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._index = index
+        self._facilities: dict[bytes, str] = {}
+
+    def facilities(self, record: str) -> tuple[str, str]:
+        """Returns the source and destination facility of a router log record."""
+        fields = record.split()
+        if len(fields) != _CLNP_RECORD_FIELDS:
+            return UNKNOWN_FACILITY, UNKNOWN_FACILITY
+        addresses = self._clnp_addresses(fields[-1])
+        if addresses is None:
+            return UNKNOWN_FACILITY, UNKNOWN_FACILITY
+        source, destination = addresses
+        return self._facility(source), self._facility(destination)
+
+    def enrich(self, log_file: Path, start_offset: int, output_file: Path) -> int:
+        """Enriches the records of ``log_file`` from ``start_offset`` on.
+
+        The records are appended to ``output_file``, which is replaced if
+        ``start_offset`` is 0. Returns the number of records written.
+        """
+        num_records = 0
+        with open(log_file, "rb") as f_in, \
+                open(output_file, "ab" if start_offset > 0 else "wb") as f_out:
+            f_in.seek(start_offset)
+            for raw_line in f_in:
+                if not raw_line.endswith(b"\n"):
+                    break
+                record = raw_line.decode("ascii", errors="replace").rstrip()
+                source, destination = self.facilities(record)
+                f_out.write(f"{record} {source} {destination}\n".encode("ascii", "replace"))
+                num_records += 1
+        return num_records
+
+    def _facility(self, nsap: bytes) -> str:
+        facility = self._facilities.get(nsap)
+        if facility is None:
+            facility = self._index.lookup(nsap) or UNKNOWN_FACILITY
+            self._facilities[nsap] = facility
+        return facility
+
+    @staticmethod
+    def _clnp_addresses(pdu_hex: str) -> Optional[tuple[bytes, bytes]]:
+        """Returns the source and destination NSAP of a CLNP PDU, if valid."""
+        try:
+            header_length = int(pdu_hex[2:4], 16)
+            header = bytes.fromhex(pdu_hex[:2 * header_length])
+        except ValueError:
+            return None
+        if len(header) < _CLNP_FIXED_HEADER_LENGTH + 1 or header[0] != _CLNP_NLPID:
+            return None
+        offset = _CLNP_FIXED_HEADER_LENGTH
+        destination_length = header[offset]
+        destination = header[offset + 1:offset + 1 + destination_length]
+        offset += 1 + destination_length
+        if offset >= len(header):
+            return None
+        source_length = header[offset]
+        source = header[offset + 1:offset + 1 + source_length]
+        if len(source) != source_length or len(destination) != destination_length:
+            return None
+        return source, destination
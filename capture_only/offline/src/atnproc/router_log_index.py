@@ -0,0 +1,297 @@
+"""Sparse sidecar index of router log timestamps and remote addresses.
+
+This module provides :class:`RouterLogIndex` which maintains a binary
+sidecar file (``<router log>.idx``) next to a router log. For every minute
+of records it holds the byte range of the records and the remote IP
+addresses occurring in them. It is extended as the router log grows, so
+:meth:`RouterLogIndex.records` can read only the minutes of a time range
+in which a remote address occurs instead of scanning the whole file.
+
+Timestamps are the wall-clock times of the records, compared as the
+fixed-width ``YYYY-MM-DD HH:MM:SS.mmm`` strings; the time zone is that of
+the process that wrote the router log.
+
+Index file layout (little endian)::
+
+    8 bytes   magic ``ARLIDX01``
+    entries:  uint32 minute (since the epoch), uint64 start offset,
+              uint64 end offset, uint16 number of addresses N,
+              N * 4 bytes IPv4 remote addresses
+
+A minute with more than 65534 addresses has N = 65535 and no addresses:
+it matches every remote address. A minute whose records were appended by
+several updates has several entries.
+"""
+
+import bisect
+import calendar
+import logging
+import socket
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+INDEX_SUFFIX = ".idx"
+
+_INDEX_MAGIC = b"ARLIDX01"
+_ENTRY = struct.Struct("<IQQH")
+_ALL_ADDRESSES = 0xFFFF
+# Position of "YYYY-MM-DD HH:MM" after "ROUTER CLNS_DT_PDU " and of the seconds
+_TIMESTAMP_OFFSET = 19
+_MINUTE_LENGTH = 16
+_TIMESTAMP_LENGTH = 23
+_REMOTE_FIELD = 6
+_READ_SIZE = 1024 * 1024
+
+
+def minute_of(timestamp: str) -> int:
+    """Returns the minutes since the epoch of a ``YYYY-MM-DD HH:MM[...]`` timestamp."""
+    return calendar.timegm(time.strptime(timestamp[:_MINUTE_LENGTH], "%Y-%m-%d %H:%M")) // 60
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """The records of one minute in a byte range of the router log."""
+    minute: int
+    start_offset: int
+    end_offset: int
+    addresses: Optional[frozenset[bytes]]
+    """Remote IPv4 addresses of the records; None matches all addresses."""
+
+
+class RouterLogIndex:
+    """Minute and remote address index of a (possibly growing) router log."""
+
+    def __init__(self, log_file: Path, index_file: Optional[Path] = None) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._log_file = log_file
+        self._index_file: Path = index_file or log_file.with_name(log_file.name + INDEX_SUFFIX)
+        self._entries: list[IndexEntry] = []
+        self._minutes: list[int] = []
+        self._ordered = True
+        self._load()
+
+    @property
+    def index_file(self) -> Path:
+        return self._index_file
+
+    @property
+    def entries(self) -> list[IndexEntry]:
+        return self._entries
+
+    @property
+    def end_offset(self) -> int:
+        """Offset just past the last indexed (complete) record."""
+        return self._entries[-1].end_offset if self._entries else 0
+
+    def reset(self) -> None:
+        """Forgets the index, e.g. because the router log was rewritten."""
+        self._entries = []
+        self._minutes = []
+        self._ordered = True
+        self._index_file.unlink(missing_ok=True)
+
+    def update(self) -> int:
+        """Extends the index with the records appended since the last update.
+
+        Returns the new :attr:`end_offset`.
+        """
+        offset = self.end_offset
+        try:
+            file_size = self._log_file.stat().st_size
+        except FileNotFoundError:
+            self.reset()
+            return 0
+        if file_size < offset:
+            self._logger.warning(f"{self._log_file} shrank, rebuilding index")
+            self.reset()
+            offset = 0
+        if file_size <= offset:
+            return offset
+        entries: list[IndexEntry] = []
+        remote_ips: set[bytes] = set()
+        minute_prefix = b""
+        minute = 0
+        start_offset = offset
+        with open(self._log_file, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                prefix = line[_TIMESTAMP_OFFSET:_TIMESTAMP_OFFSET + _MINUTE_LENGTH]
+                if prefix != minute_prefix:
+                    line_minute = self._parse_minute(prefix)
+                    if line_minute is not None:
+                        if offset > start_offset:
+                            entries.append(self._entry(minute, start_offset, offset, remote_ips))
+                        minute_prefix = prefix
+                        minute = line_minute
+                        start_offset = offset
+                        remote_ips = set()
+                fields = line.split(b" ", _REMOTE_FIELD + 2)
+                if len(fields) > _REMOTE_FIELD + 1:
+                    remote_ips.add(fields[_REMOTE_FIELD])
+                offset += len(line)
+        if offset > start_offset:
+            entries.append(self._entry(minute, start_offset, offset, remote_ips))
+        self._append(entries)
+        return offset
+
+    def ranges(
+        self, start: str, end: str, remote_ip: Optional[str] = None
+    ) -> list[tuple[int, int]]:
+        """Returns the byte ranges that may hold records in ``[start, end)``.
+
+        Adjacent ranges are joined. ``remote_ip`` restricts the ranges to
+        those with records of that remote address.
+        """
+        address = socket.inet_aton(remote_ip) if remote_ip else None
+        first_minute = minute_of(start)
+        last_minute = minute_of(end)
+        if self._ordered:
+            entries = self._entries[
+                bisect.bisect_left(self._minutes, first_minute):
+                bisect.bisect_right(self._minutes, last_minute)
+            ]
+        else:
+            # The clock went back, e.g. at the end of daylight saving time
+            entries = [e for e in self._entries if first_minute <= e.minute <= last_minute]
+        ranges: list[tuple[int, int]] = []
+        for entry in entries:
+            if address is not None and entry.addresses is not None and (
+                address not in entry.addresses
+            ):
+                continue
+            if ranges and ranges[-1][1] == entry.start_offset:
+                ranges[-1] = (ranges[-1][0], entry.end_offset)
+            else:
+                ranges.append((entry.start_offset, entry.end_offset))
+        return ranges
+
+    def records(self, start: str, end: str, remote_ip: Optional[str] = None) -> Iterator[str]:
+        """Yields the records in ``[start, end)``, optionally of one remote address.
+
+        ``start`` and ``end`` are ``YYYY-MM-DD HH:MM[:SS[.mmm]]`` timestamps.
+        """
+        remote = remote_ip.encode() if remote_ip else None
+        start_key = start.encode()
+        end_key = end.encode()
+        with open(self._log_file, "rb") as f:
+            for start_offset, end_offset in self.ranges(start, end, remote_ip):
+                for line in RouterLogIndex._read_lines(f, start_offset, end_offset):
+                    timestamp = line[_TIMESTAMP_OFFSET:_TIMESTAMP_OFFSET + _TIMESTAMP_LENGTH]
+                    if not start_key <= timestamp < end_key:
+                        continue
+                    if remote is not None and not RouterLogIndex._has_remote(line, remote):
+                        continue
+                    yield line.decode("ascii", errors="replace") + "\n"
+
+    @staticmethod
+    def _read_lines(f: IO[bytes], start_offset: int, end_offset: int) -> Iterator[bytes]:
+        """Yields the complete lines in ``[start_offset, end_offset)`` of ``f``."""
+        f.seek(start_offset)
+        remaining = end_offset - start_offset
+        pending = b""
+        while remaining > 0:
+            chunk = f.read(min(_READ_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+
+    @staticmethod
+    def _has_remote(line: bytes, remote: bytes) -> bool:
+        fields = line.split(b" ", _REMOTE_FIELD + 2)
+        return len(fields) > _REMOTE_FIELD + 1 and fields[_REMOTE_FIELD] == remote
+
+    @staticmethod
+    def _parse_minute(prefix: bytes) -> Optional[int]:
+        try:
+            return minute_of(prefix.decode("ascii"))
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+    @staticmethod
+    def _entry(
+        minute: int, start_offset: int, end_offset: int, remote_ips: set[bytes]
+    ) -> IndexEntry:
+        addresses: set[bytes] = set()
+        for remote_ip in remote_ips:
+            try:
+                addresses.add(socket.inet_aton(remote_ip.decode("ascii")))
+            except (OSError, UnicodeDecodeError):
+                # A record without remote address: the IP packet in hex
+                continue
+        return IndexEntry(
+            minute, start_offset, end_offset,
+            frozenset(addresses) if len(addresses) < _ALL_ADDRESSES else None,
+        )
+
+    def _load(self) -> None:
+        if not self._index_file.is_file():
+            return
+        data = self._index_file.read_bytes()
+        if data[:len(_INDEX_MAGIC)] != _INDEX_MAGIC:
+            self._logger.warning(f"Discarding index with unexpected format {self._index_file}")
+            self.reset()
+            return
+        position = len(_INDEX_MAGIC)
+        entries: list[IndexEntry] = []
+        while position + _ENTRY.size <= len(data):
+            minute, start_offset, end_offset, count = _ENTRY.unpack_from(data, position)
+            position += _ENTRY.size
+            addresses: Optional[frozenset[bytes]] = None
+            if count != _ALL_ADDRESSES:
+                if position + 4 * count > len(data):
+                    break
+                addresses = frozenset(
+                    data[i:i + 4] for i in range(position, position + 4 * count, 4)
+                )
+                position += 4 * count
+            entries.append(IndexEntry(minute, start_offset, end_offset, addresses))
+        self._entries = []
+        self._minutes = []
+        self._add_entries(entries)
+        if entries and not self._validate_last_entry():
+            self._logger.warning(f"Index does not match router log, rebuilding {self._index_file}")
+            self.reset()
+
+    def _validate_last_entry(self) -> bool:
+        """Checks that the last indexed minute ends with a complete record."""
+        entry = self._entries[-1]
+        try:
+            with open(self._log_file, "rb") as f:
+                f.seek(entry.start_offset)
+                line = f.readline()
+                f.seek(entry.end_offset - 1)
+                last = f.read(1)
+        except OSError:
+            return False
+        prefix = line[_TIMESTAMP_OFFSET:_TIMESTAMP_OFFSET + _MINUTE_LENGTH]
+        return last == b"\n" and self._parse_minute(prefix) == entry.minute
+
+    def _append(self, entries: list[IndexEntry]) -> None:
+        if not entries:
+            return
+        new_file = not self._index_file.exists()
+        data = bytearray(_INDEX_MAGIC if new_file else b"")
+        for entry in entries:
+            addresses = sorted(entry.addresses) if entry.addresses is not None else []
+            count = len(addresses) if entry.addresses is not None else _ALL_ADDRESSES
+            data += _ENTRY.pack(entry.minute, entry.start_offset, entry.end_offset, count)
+            data += b"".join(addresses)
+        # Usable in memory even if the index cannot be written
+        self._add_entries(entries)
+        with open(self._index_file, "ab") as f:
+            f.write(data)
+
+    def _add_entries(self, entries: list[IndexEntry]) -> None:
+        for entry in entries:
+            if self._minutes and entry.minute < self._minutes[-1]:
+                self._ordered = False
+            self._entries.append(entry)
+            self._minutes.append(entry.minute)
@@ -0,0 +1,139 @@
+"""Time-ordered merge of the router log streams of several ATN routers.
+
+Contains `RouterLogMerger` which combines router log records produced by
+`PacketProcessor` for each router into a single router log ordered by
+timestamp, as input for the PDEC decoder. The per-router streams are
+each already in time order, so a heap-based k-way merge produces the
+combined order in one pass while holding only one record per stream.
+
+Around Pacemaker failovers both routers may capture the same traffic. A
+record is dropped as a duplicate if a record with the same timestamp,
+direction, remote IP and PDU was already emitted within the last
+``dedup_window``; only the keys within that window are kept in memory.
+
+Router log records have the format::
+
+    ROUTER CLNS_DT_PDU <YYYY-MM-DD> <HH:MM:SS.mmm> <SENT|RCVD> <length> [<remote ip>] <hex>
+"""
+
+import calendar
+import heapq
+import logging
+import time
+from collections import deque
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Position and length of "YYYY-MM-DD HH:MM:SS.mmm" after "ROUTER CLNS_DT_PDU "
+_TIMESTAMP_OFFSET = 19
+_TIMESTAMP_LENGTH = 23
+
+DedupKey = tuple[str, str, str, int]
+
+
+class RouterLogMerger:
+    """Merges time-ordered router log streams and drops duplicate records."""
+
+    def __init__(self, dedup_window: timedelta = timedelta(seconds=2)) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._dedup_window_ms = int(dedup_window.total_seconds() * 1000)
+        self._records = 0
+        self._duplicates = 0
+        self._cached_second = ""
+        self._cached_second_ms = 0
+
+    @property
+    def records(self) -> int:
+        """Number of records written by the last merge."""
+        return self._records
+
+    @property
+    def duplicates(self) -> int:
+        """Number of duplicate records dropped by the last merge."""
+        return self._duplicates
+
+    def merge(self, streams: Iterable[Iterable[str]]) -> Iterator[str]:
+        """Yields the records of all ``streams`` in timestamp order.
+
+        Records with equal timestamps keep the order of the streams.
+        Malformed records are passed through unchanged.
+        """
+        self._records = 0
+        self._duplicates = 0
+        window: deque[tuple[int, DedupKey]] = deque()
+        seen: set[DedupKey] = set()
+        for line in heapq.merge(*streams, key=self._sort_key):
+            key = self._dedup_key(line)
+            if key is not None:
+                now_ms = key[0]
+                while window and window[0][0] < now_ms - self._dedup_window_ms:
+                    seen.discard(window.popleft()[1])
+                if key[1] in seen:
+                    self._duplicates += 1
+                    continue
+                seen.add(key[1])
+                window.append(key)
+            self._records += 1
+            yield line
+
+    def merge_files(self, input_files: list[Path], output_file: Path) -> int:
+        """Merges the router log files ``input_files`` into ``output_file``.
+
+        The output file is replaced atomically. Returns the number of
+        records written.
+        """
+        start_time = time.monotonic()
+        tmp_file = output_file.with_name(output_file.name + ".tmp")
+        with ExitStack() as stack:
+            files = [
+                stack.enter_context(open(input_file, encoding="ascii", errors="replace"))
+                for input_file in input_files
+            ]
+            with open(tmp_file, "w", encoding="ascii", errors="replace") as out:
+                out.writelines(self.merge(self._complete_lines(f) for f in files))
+        tmp_file.replace(output_file)
+        self._logger.info(
+            f"Merged {len(input_files)} file(s) into {output_file}: {self._records} records, "
+            f"{self._duplicates} duplicates dropped in {time.monotonic() - start_time:.3f}s"
+        )
+        return self._records
+
+    @staticmethod
+    def _complete_lines(lines: Iterable[str]) -> Iterator[str]:
+        """Skips a trailing partial line of a file that is still being written."""
+        for line in lines:
+            if line.endswith("\n"):
+                yield line
+
+    @staticmethod
+    def _sort_key(line: str) -> str:
+        # The fixed-width timestamp sorts correctly as a string.
+        return line[_TIMESTAMP_OFFSET:_TIMESTAMP_OFFSET + _TIMESTAMP_LENGTH]
+
+    def _dedup_key(self, line: str) -> Optional[tuple[int, DedupKey]]:
+        """Returns the record time in milliseconds and its deduplication key."""
+        fields = line.split()
+        if len(fields) < 7:
+            return None
+        timestamp = f"{fields[2]} {fields[3]}"
+        if len(timestamp) != _TIMESTAMP_LENGTH:
+            return None
+        try:
+            milliseconds = self._milliseconds(timestamp)
+        except ValueError:
+            return None
+        # Records without an IP address carry the full IP packet only
+        remote_ip = fields[6] if len(fields) > 7 else ""
+        return milliseconds, (timestamp, fields[4], remote_ip, hash(fields[-1]))
+
+    def _milliseconds(self, timestamp: str) -> int:
+        """Converts a record timestamp to milliseconds, caching the seconds part."""
+        second = timestamp[:19]
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_second_ms = 1000 * calendar.timegm(
+                time.strptime(second, "%Y-%m-%d %H:%M:%S")
+            )
+        return self._cached_second_ms + int(timestamp[20:23])
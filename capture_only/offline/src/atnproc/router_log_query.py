@@ -0,0 +1,87 @@
+"""Time range queries over router log archives.
+
+Contains `RouterLogQuery` which finds the records of a time range,
+optionally exchanged with a single remote IP address, in any number of
+router logs, e.g. the output directory shared by both ATN routers and the
+daily logs of the capture daemon. Each router log is read through its
+`RouterLogIndex`, which is brought up to date first, so only the minutes
+holding matching records are read. The records of all files are merged
+into timestamp order by `RouterLogMerger`, which also drops the records
+captured by both routers.
+
+The router logs of the further sniffed addresses, ``<name>_<ip>.log``,
+hold other traffic than the log they are written next to. The router logs
+found in a directory are those of the first sniffed address, or those of
+``sniffed_ip`` if given; router logs passed as files are always read.
+"""
+
+import logging
+import re
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+
+from atnproc.router_log_index import RouterLogIndex
+from atnproc.router_log_merger import RouterLogMerger
+
+LOG_FILE_PATTERN = "*.log"
+# Stem of the router log of a further sniffed address, see address_output_file()
+_ADDRESS_LOG_STEM = re.compile(r"_\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+class RouterLogQuery:
+    """Streams the records of a time range from indexed router logs."""
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        dedup_window: timedelta = timedelta(seconds=2),
+        sniffed_ip: Optional[str] = None,
+    ):
+        """Create a query over ``paths``: router logs or directories holding them.
+
+        ``sniffed_ip`` selects the router logs of a further sniffed address
+        in the directories instead of those of the first one.
+        """
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._files: list[Path] = []
+        for path in paths:
+            if path.is_dir():
+                if sniffed_ip:
+                    self._files.extend(sorted(path.glob(f"*_{sniffed_ip}.log")))
+                else:
+                    self._files.extend(sorted(
+                        file for file in path.glob(LOG_FILE_PATTERN)
+                        if not _ADDRESS_LOG_STEM.search(file.stem)
+                    ))
+            elif path.is_file():
+                self._files.append(path)
+        self._merger = RouterLogMerger(dedup_window=dedup_window)
+
+    @property
+    def files(self) -> list[Path]:
+        return self._files
+
+    def run(self, start: str, end: str, remote_ip: Optional[str], out: TextIO) -> int:
+        """Writes the records in ``[start, end)`` to ``out``; returns their number.
+
+        ``start`` and ``end`` are ``YYYY-MM-DD HH:MM:SS.mmm`` timestamps.
+        """
+        start_time = time.monotonic()
+        streams: list[Iterator[str]] = []
+        for log_file in self._files:
+            index = RouterLogIndex(log_file)
+            try:
+                index.update()
+            except OSError as e:
+                # E.g. a read-only archive: the existing index is still valid
+                self._logger.warning(f"Failed to update the index of {log_file}: {e}")
+            if index.ranges(start, end, remote_ip):
+                streams.append(index.records(start, end, remote_ip))
+        out.writelines(self._merger.merge(streams))
+        self._logger.info(
+            f"Found {self._merger.records} record(s) in {len(streams)} of {len(self._files)} "
+            f"file(s) in {time.monotonic() - start_time:.3f}s"
+        )
+        return self._merger.records
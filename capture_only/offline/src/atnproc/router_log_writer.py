@@ -0,0 +1,56 @@
+"""Buffered, periodically synced router log output file.
+
+Contains `RouterLogWriter` which appends router log records to a file.
+The records are buffered in memory and written by :meth:`flush`; the data
+reaches the disk on :meth:`sync`, which the owner calls periodically, so
+a crash loses at most the records of one sync interval.
+"""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+_BUFFER_SIZE = 256 * 1024
+
+
+class RouterLogWriter:
+    """Appends router log records to a file."""
+
+    def __init__(self, file: Path, start_time: datetime) -> None:
+        self._file = file
+        self._start_time = start_time
+        # pylint: disable-next=consider-using-with
+        self._f = open(file, "ab", buffering=_BUFFER_SIZE)
+        self._records = 0
+
+    @property
+    def path(self) -> Path:
+        return self._file
+
+    @property
+    def start_time(self) -> datetime:
+        """UTC time the file was started, as used in its name."""
+        return self._start_time
+
+    @property
+    def records(self) -> int:
+        """Number of records written so far."""
+        return self._records
+
+    def write(self, lines: list[str]) -> None:
+        """Appends newline-terminated records to the buffer."""
+        self._f.write("".join(lines).encode("ascii"))
+        self._records += len(lines)
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file."""
+        self._f.flush()
+
+    def sync(self) -> None:
+        """Writes the buffered records and forces them to the disk."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self.sync()
+        self._f.close()
@@ -21,3 +21,6 @@ class RunnerInterface(ABC):
     def run(self) -> timedelta:
         """Perform a unit of work and return the desired sleep interval."""
         raise NotImplementedError()
+
+    def close(self) -> None:
+        """Release resources when the run loop ends. Does nothing by default."""
@@ -0,0 +1,274 @@
+"""Parallel decoding of a router log in time shards.
+
+Contains `ShardedPdecDecoder` which splits a time-ordered router log into
+shards of whole hours and decodes them with one ``pdec_clnp`` process
+each (see `PdecDecoder`), at most ``shards`` in parallel. The boundaries
+are fixed points in time, not fractions of the file size, so a log that
+grew since the last tick is cut at the same records and the rows decoded
+before are reproduced byte for byte.
+
+``pdec_clnp`` keeps the transport connection context of the traffic it
+has decoded, so every shard is decoded with the records of the
+``overlap`` before its start (warm-up) and after its end (cool-down).
+The ``pdus*.csv`` files of the shards are then stitched together in shard
+order, keeping only the rows of a shard whose timestamp lies within the
+shard: the others belong to a neighbouring shard, which decodes them with
+its own context. A row without a timestamp belongs to the region of the
+row before it; the leading rows of a shard that repeat the header of the
+first shard are dropped.
+
+With ``shards`` set to 1, or a log within a single hour, the router log
+is decoded as a whole.
+"""
+
+import logging
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from atnproc.metrics import ProcessStats
+from atnproc.pdec_decoder import PDUS_CSV_PATTERN, PdecDecoder
+
+SHARDS_DIRECTORY_NAME = "shards"
+
+# Position and length of "YYYY-MM-DD HH:MM:SS.mmm" after "ROUTER CLNS_DT_PDU "
+_TIMESTAMP_OFFSET = 19
+_TIMESTAMP_LENGTH = 23
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+# "YYYY-MM-DD HH" of a timestamp, the hour bucket of its shard
+_HOUR_LENGTH = 13
+_HOUR_FORMAT = "%Y-%m-%d %H"
+_SHARD_DURATION = timedelta(hours=1)
+# First timestamp of a pdus.csv row, as written by pdec_clnp or the stub
+_CSV_TIMESTAMP = re.compile(
+    rb"(\d{4})[-/](\d{2})[-/](\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?"
+)
+_COPY_SIZE = 1024 * 1024
+
+
+class _Shard:
+    """An hour of the router log and the offsets of its warm-up and cool-down."""
+
+    def __init__(self, start: bytes) -> None:
+        self.warm_up_offset = 0
+        self.cool_down_offset = 0
+        self.start = start
+        """Start of the hour of the shard; empty for the first shard."""
+        self.end = b""
+        """Start of the hour of the next shard; empty for the last shard."""
+        self.csv_files: list[Path] = []
+        self.process_stats: Optional[ProcessStats] = None
+
+
+class ShardedPdecDecoder:
+    """Decodes a router log with ``pdec_clnp`` in parallel time shards."""
+
+    def __init__(
+        self,
+        executable: Path,
+        atsu_file: Path,
+        work_directory: Path,
+        shards: int = 1,
+        overlap: timedelta = timedelta(minutes=5),
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._executable = executable
+        self._atsu_file = atsu_file
+        self._work_directory = work_directory
+        self._shards = max(1, shards)
+        self._overlap = overlap
+        self._process_stats: list[ProcessStats] = []
+
+    @property
+    def process_stats(self) -> list[ProcessStats]:
+        """Resource usage of the ``pdec_clnp`` processes of the last :meth:`decode`."""
+        return self._process_stats
+
+    def decode(self, log_file: Path) -> list[Path]:
+        """Decodes ``log_file`` and returns the stitched ``pdus*.csv`` files.
+
+        Returns an empty list if decoding of any shard failed.
+        """
+        self._process_stats = []
+        shards = self._plan(log_file) if self._shards > 1 else []
+        if len(shards) <= 1:
+            decoder = PdecDecoder(self._executable, self._atsu_file, self._work_directory)
+            csv_files = decoder.decode(log_file)
+            if decoder.process_stats:
+                self._process_stats = [decoder.process_stats]
+            return csv_files
+
+        start_time = time.monotonic()
+        shards_directory = self._work_directory / SHARDS_DIRECTORY_NAME
+        with ThreadPoolExecutor(max_workers=min(self._shards, len(shards))) as pool:
+            list(pool.map(
+                lambda item: self._decode_shard(log_file, shards_directory / f"{item[0]:02d}",
+                                                item[1]),
+                enumerate(shards),
+            ))
+        self._process_stats = [s.process_stats for s in shards if s.process_stats]
+        if any(not s.csv_files for s in shards):
+            self._logger.error(f"Failed to decode {log_file} in {len(shards)} shards")
+            return []
+        csv_files = self._stitch(shards)
+        self._logger.info(
+            f"Decoded {log_file} in {len(shards)} shards into {len(csv_files)} CSV file(s) "
+            f"in {time.monotonic() - start_time:.3f}s"
+        )
+        return csv_files
+
+    def _plan(self, log_file: Path) -> list[_Shard]:
+        """Splits ``log_file`` into shards at the hours holding records."""
+        size = log_file.stat().st_size
+        shards = [_Shard(b"")]
+        with open(log_file, "rb") as f:
+            start = self._next_hour(self._timestamp(self._line_after(f, 0)[1]))
+            while start:
+                start_offset = self._offset_at(f, size, start)
+                _, line = self._line_after(f, start_offset)
+                if not line:
+                    break
+                shards[-1].end = start
+                shards.append(_Shard(start))
+                # Hours without records are skipped
+                start = self._next_hour(self._timestamp(line))
+            for shard in shards:
+                if shard.start:
+                    shard.warm_up_offset = self._offset_at(
+                        f, size, self._shift(shard.start, -self._overlap)
+                    )
+                shard.cool_down_offset = (
+                    self._offset_at(f, size, self._shift(shard.end, self._overlap))
+                    if shard.end else size
+                )
+        return shards
+
+    def _decode_shard(self, log_file: Path, directory: Path, shard: _Shard) -> None:
+        """Decodes the records of ``shard`` and its overlaps in its own directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        shard_log_file = directory / log_file.name
+        with open(log_file, "rb") as src, open(shard_log_file, "wb") as dst:
+            src.seek(shard.warm_up_offset)
+            remaining = shard.cool_down_offset - shard.warm_up_offset
+            while remaining > 0:
+                chunk = src.read(min(_COPY_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        decoder = PdecDecoder(self._executable, self._atsu_file, directory)
+        shard.csv_files = decoder.decode(shard_log_file)
+        shard.process_stats = decoder.process_stats
+
+    def _stitch(self, shards: list[_Shard]) -> list[Path]:
+        """Concatenates the CSV files of the shards, dropping the overlap rows."""
+        for csv_file in self._work_directory.glob(PDUS_CSV_PATTERN):
+            csv_file.unlink()
+        names = sorted({csv_file.name for shard in shards for csv_file in shard.csv_files})
+        csv_files: list[Path] = []
+        for name in names:
+            output_file = self._work_directory / name
+            tmp_file = output_file.with_name(name + ".tmp")
+            header: set[bytes] = set()
+            dropped = 0
+            with open(tmp_file, "wb") as out_f:
+                for shard in shards:
+                    shard_file = next((f for f in shard.csv_files if f.name == name), None)
+                    if shard_file is not None:
+                        with open(shard_file, "rb") as in_f:
+                            dropped += self._copy_rows(
+                                in_f, out_f, shard.start, shard.end, header
+                            )
+            os.replace(tmp_file, output_file)
+            csv_files.append(output_file)
+            self._logger.debug(f"Stitched {name}, dropped {dropped} overlap row(s)")
+        for shard in shards:
+            shutil.rmtree(shard.csv_files[0].parent, ignore_errors=True)
+        return csv_files
+
+    @staticmethod
+    def _copy_rows(
+        in_f: BinaryIO, out_f: BinaryIO, start: bytes, end: bytes, header: set[bytes]
+    ) -> int:
+        """Copies the rows of a shard in ``[start, end)``; returns the rows dropped.
+
+        An empty ``start`` or ``end`` is unbounded. The leading rows without
+        a timestamp of the first shard (``start`` empty) are added to
+        ``header``.
+        """
+        dropped = 0
+        keep = True
+        leading = True
+        for row in in_f:
+            timestamp = ShardedPdecDecoder._csv_timestamp(row)
+            if timestamp is not None:
+                leading = False
+                keep = timestamp >= start and (not end or timestamp < end)
+            elif leading:
+                if not start:
+                    header.add(row)
+                keep = row not in header or not start
+            if keep:
+                out_f.write(row)
+            else:
+                dropped += 1
+        return dropped
+
+    @staticmethod
+    def _csv_timestamp(row: bytes) -> Optional[bytes]:
+        """Returns the first timestamp of a CSV row in the router log format."""
+        match = _CSV_TIMESTAMP.search(row)
+        if match is None:
+            return None
+        year, month, day, hour, minute, second, fraction = match.groups()
+        return b"%s-%s-%s %s:%s:%s.%s" % (
+            year, month, day, hour, minute, second, (fraction or b"").ljust(3, b"0")[:3]
+        )
+
+    @staticmethod
+    def _timestamp(line: bytes) -> bytes:
+        return line[_TIMESTAMP_OFFSET:_TIMESTAMP_OFFSET + _TIMESTAMP_LENGTH]
+
+    @staticmethod
+    def _next_hour(timestamp: bytes) -> bytes:
+        """Returns the start of the hour after ``timestamp``; empty if it is invalid."""
+        try:
+            hour = datetime.strptime(timestamp[:_HOUR_LENGTH].decode(), _HOUR_FORMAT)
+        except (UnicodeDecodeError, ValueError):
+            return b""
+        return (hour + _SHARD_DURATION).strftime(_TIMESTAMP_FORMAT)[:-3].encode()
+
+    @staticmethod
+    def _shift(timestamp: bytes, delta: timedelta) -> bytes:
+        shifted = datetime.strptime(timestamp.decode(), _TIMESTAMP_FORMAT) + delta
+        return shifted.strftime(_TIMESTAMP_FORMAT)[:-3].encode()
+
+    @staticmethod
+    def _line_after(f: BinaryIO, offset: int) -> tuple[int, bytes]:
+        """Returns the offset and content of the first line starting at or after ``offset``."""
+        if offset > 0:
+            f.seek(offset - 1)
+            offset += len(f.readline()) - 1
+        else:
+            f.seek(0)
+        return offset, f.readline()
+
+    def _offset_at(self, f: BinaryIO, size: int, timestamp: bytes) -> int:
+        """Returns the offset of the first record at or after ``timestamp``.
+
+        Binary search over the time-ordered router log.
+        """
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            offset, line = self._line_after(f, middle)
+            if not line or self._timestamp(line) >= timestamp:
+                high = middle
+            else:
+                low = offset + len(line)
+        return self._line_after(f, low)[0]
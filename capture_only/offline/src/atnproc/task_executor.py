@@ -0,0 +1,108 @@
+"""Concurrent execution of per-source processing tasks.
+
+This module provides :class:`TaskExecutor` which runs the task lists of
+several capture sources (one per ATN router) concurrently on a bounded
+``concurrent.futures`` process pool. Each source's tasks run in order in a
+single worker, different sources run in parallel.
+
+A source whose tasks exceed the timeout is reported as busy: its work keeps
+running in the background and its results are delivered by a later call to
+:meth:`TaskExecutor.run`, so a backlog on one router does not delay the
+others.
+"""
+
+import logging
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from atnproc.packet_processor import ProcessorSettings
+from atnproc.processing_task import ProcessingResult, ProcessingTask, execute_tasks
+
+
+class TaskExecutor:
+    """Runs the processing tasks of multiple sources on a process pool.
+
+    With ``max_workers`` set to 0 the tasks run sequentially in the
+    calling process.
+    """
+
+    def __init__(
+        self,
+        settings: ProcessorSettings,
+        max_workers: int,
+        task_timeout_seconds: Optional[float] = None,
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._settings = settings
+        self._max_workers = max_workers
+        self._task_timeout_seconds = task_timeout_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight: dict[str, Future[list[ProcessingResult]]] = {}
+
+    def is_busy(self, source: str) -> bool:
+        """Returns True while tasks of ``source`` from an earlier call are running."""
+        future = self._in_flight.get(source)
+        return future is not None and not future.done()
+
+    def run(
+        self, jobs: dict[str, list[ProcessingTask]]
+    ) -> dict[str, list[ProcessingResult]]:
+        """Runs the task lists of all sources and returns the results per source.
+
+        The results also include those of sources that completed after
+        timing out in an earlier call. Sources are reported in sorted order.
+        """
+        if self._max_workers <= 0:
+            return {
+                source: execute_tasks(self._settings, tasks)
+                for source, tasks in sorted(jobs.items())
+            }
+
+        for source, tasks in jobs.items():
+            if self.is_busy(source):
+                self._logger.warning(f"Skipping {source}: previous tasks still running")
+                continue
+            self._in_flight[source] = self._get_pool().submit(
+                execute_tasks, self._settings, tasks
+            )
+
+        start_time = time.monotonic()
+        pending = {f for f in self._in_flight.values() if not f.done()}
+        if pending:
+            _, not_done = wait(pending, timeout=self._task_timeout_seconds)
+            for source, future in self._in_flight.items():
+                if future in not_done:
+                    self._logger.error(
+                        f"Tasks for {source} exceeded the timeout of "
+                        f"{self._task_timeout_seconds}s, continuing in the background"
+                    )
+        self._logger.debug(f"Waited {time.monotonic() - start_time:.3f}s for workers")
+        return self._collect_results()
+
+    def shutdown(self) -> None:
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _collect_results(self) -> dict[str, list[ProcessingResult]]:
+        results: dict[str, list[ProcessingResult]] = {}
+        for source in sorted(self._in_flight):
+            future = self._in_flight[source]
+            if not future.done():
+                continue
+            del self._in_flight[source]
+            try:
+                results[source] = future.result()
+            except BrokenProcessPool as e:
+                self._logger.error(f"Worker for {source} died: {e}")
+                self._pool = None
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._logger.exception(f"Tasks for {source} failed: {e}")
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+        return self._pool
@@ -0,0 +1,151 @@
+"""Adaptive scheduling of the processing ticks.
+
+Contains `TickScheduler` which chooses the time until the next processing
+tick from the observed growth of the latest capture file of every source
+and the data left unprocessed after the tick:
+
+- ``backlog``: more than ``backlog_bytes`` remain unprocessed, e.g. after
+  a slow tick at peak traffic; the next tick starts after
+  ``min_interval``.
+- ``growth``: the capture files grow; the interval is the time the
+  expected growth takes to reach ``backlog_bytes``, so every tick handles
+  about the same amount of data.
+- ``idle``: no capture file grew; the interval doubles up to
+  ``max_interval``.
+
+The interval is measured from the start of a tick, so the sleep is the
+interval minus the duration of the tick, but never negative: a tick never
+starts before the previous one has finished.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from atnproc.metrics import Metrics
+
+REASON_BACKLOG = "backlog"
+REASON_GROWTH = "growth"
+REASON_IDLE = "idle"
+
+# Weight of the latest observation in the smoothed growth rate
+_SMOOTHING = 0.3
+
+
+@dataclass(frozen=True)
+class SourceProgress:
+    """Size and processed part of the latest capture file of a source."""
+    source: str
+    file_name: str
+    size: int
+    processed: int
+
+
+@dataclass(frozen=True)
+class TickSettings:
+    """Bounds of the processing interval and the data to handle per tick."""
+    min_interval: timedelta
+    max_interval: timedelta
+    """Limit of the interval while no capture file grows; at least ``min_interval``."""
+    backlog_bytes: int
+    """Unprocessed data above which the next tick starts after ``min_interval``."""
+
+
+class _GrowthRate:
+    """Smoothed growth rate of the capture files in bytes per second."""
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._previous_start: Optional[float] = None
+
+    def update(self, growth: int, start_time: float) -> None:
+        """Adds the growth observed since the tick starting before ``start_time``."""
+        previous_start = self._previous_start
+        self._previous_start = start_time
+        if previous_start is None or start_time <= previous_start:
+            return
+        rate = growth / (start_time - previous_start)
+        if self.value == 0.0:
+            # Traffic resumed: follow it immediately instead of ramping up
+            self.value = rate
+        else:
+            self.value = _SMOOTHING * rate + (1 - _SMOOTHING) * self.value
+        if self.value < 1.0:
+            self.value = 0.0
+
+
+class TickScheduler:
+    """Derives the processing interval from the capture growth rate and backlog."""
+
+    def __init__(self, settings: TickSettings, metrics: Metrics) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._settings = settings
+        self._metrics = metrics
+        self._interval_seconds = settings.min_interval.total_seconds()
+        self._growth_rate = _GrowthRate()
+        self._reason: Optional[str] = None
+        # Per source: name and size of the latest capture file at the last tick
+        self._last_sizes: dict[str, tuple[str, int]] = {}
+
+    @property
+    def interval(self) -> timedelta:
+        """The interval chosen by the last :meth:`schedule`."""
+        return timedelta(seconds=self._interval_seconds)
+
+    def schedule(
+        self, progress: list[SourceProgress], start_time: float, elapsed: float
+    ) -> timedelta:
+        """Returns the time to sleep until the next tick.
+
+        Args:
+            progress: The latest capture file of every source after the tick.
+            start_time: Monotonic time at which the tick started.
+            elapsed: Duration of the tick in seconds.
+        """
+        growth = 0
+        backlog = 0
+        for item in progress:
+            backlog += max(0, item.size - item.processed)
+            last = self._last_sizes.get(item.source)
+            if last is not None:
+                last_name, last_size = last
+                # A new capture file grew from zero
+                growth += item.size - last_size if last_name == item.file_name else item.size
+            self._last_sizes[item.source] = (item.file_name, item.size)
+        self._growth_rate.update(max(0, growth), start_time)
+
+        min_seconds = self._settings.min_interval.total_seconds()
+        if backlog > self._settings.backlog_bytes:
+            reason = REASON_BACKLOG
+            interval = min_seconds
+        elif self._growth_rate.value > 0:
+            reason = REASON_GROWTH
+            interval = self._settings.backlog_bytes / self._growth_rate.value
+        else:
+            reason = REASON_IDLE
+            interval = self._interval_seconds * 2
+        max_seconds = max(self._settings.max_interval.total_seconds(), min_seconds)
+        self._interval_seconds = min(max(interval, min_seconds), max_seconds)
+        self._record(reason, backlog, elapsed)
+        return timedelta(seconds=max(0.0, self._interval_seconds - elapsed))
+
+    def _record(self, reason: str, backlog: int, elapsed: float) -> None:
+        metrics = self._metrics
+        metrics.set("schedule_interval_seconds", self._interval_seconds,
+                    "Interval chosen for the next processing tick")
+        metrics.set("capture_growth_bytes_per_second", self._growth_rate.value,
+                    "Smoothed growth rate of the latest capture files")
+        metrics.set("backlog_bytes", backlog,
+                    "Bytes of the latest capture files left unprocessed by the last tick")
+        metrics.inc("schedule_decisions_total", 1,
+                    "Number of interval decisions per reason", reason=reason)
+        message = (
+            f"Next tick in {self._interval_seconds:.1f}s ({reason}: tick took "
+            f"{elapsed:.1f}s, growth {self._growth_rate.value:.0f} B/s, backlog {backlog} B)"
+        )
+        if reason != self._reason:
+            self._logger.info(message)
+        else:
+            self._logger.debug(message)
+        self._reason = reason
@@ -1,15 +1,19 @@
 """Work area helpers for staging and querying the current capture file.
 
 This module contains `WorkArea` which abstracts the local working/current
-directory used to stage capture files for processing.
+directory used to stage capture files for processing. Each capture source
+has its own work area; :func:`migrate_shared_work_area` moves the files
+that earlier releases staged in the shared directories into them.
 """
 
 import logging
-import shutil
 from pathlib import Path
 from typing import Optional
 from atnproc.capture_file import CaptureFile
+from atnproc.capture_file_name import CAPTURE_FILE_PATTERNS
 from atnproc.config import WorkDirectories
+from atnproc.file_stager import FileStager
+from atnproc.pcap_index import INDEX_SUFFIX
 
 
 class WorkArea:
@@ -17,26 +21,76 @@ class WorkArea:
 
     Provides helpers to query the currently staged current capture file and
     to stage a new capture file into the current directory.
+
+    With incremental staging only the data appended to a capture file since
+    it was last staged is copied, see :class:`FileStager`.
     """
-    def __init__(self, directories: WorkDirectories):
+    def __init__(
+        self,
+        directories: WorkDirectories,
+        incremental_staging: bool = False,
+        current_file_name: Optional[str] = None,
+    ):
         self._logger: logging.Logger = logging.getLogger(
             self.__class__.__name__)
         self._directories = directories
+        self._stager = FileStager(incremental=incremental_staging)
         self._current_file: Optional[CaptureFile] = None
-        current_files = list(self._directories.current.glob("*.pcap"))
-        if current_files:
-            self._current_file = CaptureFile(current_files[0])
+        if current_file_name:
+            # Recorded in the persisted processing state
+            current_path = self._directories.current / current_file_name
+            if current_path.is_file():
+                self._current_file = CaptureFile(current_path)
+        else:
+            current_files = sorted(
+                file
+                for pattern in CAPTURE_FILE_PATTERNS
+                for file in self._directories.current.glob(pattern)
+            )
+            if current_files:
+                self._current_file = CaptureFile(current_files[-1])
 
     def ingest_files(self, files: list[Path]) -> None:
         for src_file in files:
             dst_file = self._directories.input / src_file.name
-            shutil.copy2(src_file, dst_file)
-            self._logger.debug(f"Copied {src_file} to {dst_file}")
+            copied = self._stager.stage(src_file, dst_file)
+            self._logger.debug(f"Staged {src_file} to {dst_file} ({copied} bytes)")
 
     def get_current_capture_file(self) -> Optional[CaptureFile]:
         return self._current_file
 
     def set_current_file(self, capture_file: CaptureFile) -> None:
         dst_file = self._directories.current / str(capture_file.name)
-        shutil.copy2(capture_file.path, dst_file)
-        self._logger.debug(f"Copied {capture_file.path} to {dst_file}")
+        # Prefer the local copy in the input directory as the source.
+        src_file = self._directories.input / str(capture_file.name)
+        if not src_file.is_file():
+            src_file = capture_file.path
+        copied = self._stager.stage(src_file, dst_file)
+        self._logger.debug(f"Staged {src_file} to {dst_file} ({copied} bytes)")
+        if self._current_file and self._current_file.path != dst_file:
+            old_file = self._current_file.path
+            old_file.unlink(missing_ok=True)
+            old_file.with_name(old_file.name + INDEX_SUFFIX).unlink(missing_ok=True)
+            self._stager.forget(old_file)
+            self._logger.debug(f"Removed {old_file}")
+        self._current_file = CaptureFile(dst_file)
+
+
+def migrate_shared_work_area(
+    shared: WorkDirectories, directories: WorkDirectories, capture_directory: Path
+) -> None:
+    """Moves the staged files of a capture source out of the shared work directories.
+
+    A capture file directly in the shared input or current directory is
+    moved into the source's ``directories`` if ``capture_directory`` holds a
+    file of the same name.
+    """
+    logger = logging.getLogger(WorkArea.__name__)
+    for shared_directory, directory in (
+        (shared.input, directories.input), (shared.current, directories.current)
+    ):
+        for pattern in CAPTURE_FILE_PATTERNS:
+            for file in shared_directory.glob(pattern):
+                if file.is_file() and (capture_directory / file.name).is_file():
+                    file.replace(directory / file.name)
+                    logger.info(f"Moved {file} to {directory}")
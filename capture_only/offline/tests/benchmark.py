@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Throughput benchmark of the capture processing stages.
+
+Generates synthetic one-hour capture files for two routers with
+:class:`~tests.synthetic_capture.SyntheticCaptureGenerator` and replays
+them through the processing stages:
+
+- ``generate``: writing the synthetic capture files
+- ``process_<engine>``: :class:`PacketProcessor` on a single capture file
+- ``stage`` / ``restage``: :class:`WorkArea` staging of all capture files,
+  initially and again with unchanged files
+- ``tick_initial`` / ``tick_steady``: a full :meth:`Application.run` tick
+  on an empty work area and a repeated tick without new data
+
+For each stage the elapsed time, packets/s, MB/s and peak RSS so far are
+reported and written as JSON to compare results across releases.
+
+The benchmark is not part of the installed package. Run it from the
+``capture_only/offline`` directory, for example:
+
+    PYTHONPATH=src python -m tests.benchmark -a src/atnproc/rtcd_routerlog.awk \\
+        --packets-per-second 50 --vlan-ratio 0.1 -o benchmark.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import yaml
+
+from atnproc.application import Application
+from atnproc.config import Configuration, WorkDirectories
+from atnproc.packet_processor import (
+    ENGINE_NATIVE,
+    PACKET_ENGINES,
+    PacketProcessor,
+    ProcessorSettings,
+)
+from atnproc.work_area import WorkArea
+
+from tests.synthetic_capture import SyntheticCaptureGenerator, SyntheticTraffic
+
+DEFAULT_FILTER_IP = "156.135.249.28"
+ROUTERS = ("atnr01", "atnr02")
+FILES_PER_ROUTER = 2
+
+
+@dataclass(frozen=True)
+class StageResult:
+    """Measurements of one benchmark stage."""
+    name: str
+    seconds: float
+    packets: int
+    megabytes: float
+    packets_per_second: float
+    megabytes_per_second: float
+    peak_rss_mb: float
+
+
+def _peak_rss_mb() -> float:
+    """Returns the peak RSS of this process and its largest child in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+class Benchmark:
+    """Runs the benchmark stages in a temporary directory."""
+
+    def __init__(
+        self,
+        traffic: SyntheticTraffic,
+        awk_script: Path,
+        engines: list[str],
+        duration: timedelta,
+        max_workers: int,
+    ) -> None:
+        self._logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._traffic = traffic
+        self._awk_script = awk_script.resolve()
+        self._engines = engines
+        self._duration = duration
+        self._max_workers = max_workers
+        self._results: list[StageResult] = []
+
+    @property
+    def results(self) -> list[StageResult]:
+        return self._results
+
+    def run(self, directory: Path) -> None:
+        """Runs all stages using ``directory`` for the generated files."""
+        self._logger.info("Running generate")
+        start_time = time.monotonic()
+        capture_files, packets = self._generate(directory / "captures")
+        megabytes = sum(f.stat().st_size for f in capture_files) / 1e6
+        self._add_result("generate", time.monotonic() - start_time, packets, megabytes)
+
+        capture_file = capture_files[0]
+        for engine in self._engines:
+            processor = PacketProcessor(ProcessorSettings(
+                filter_ips=(self._traffic.filter_ip,),
+                awk_script=self._awk_script,
+                engine=engine,
+                use_index=False,
+            ))
+            output_file = directory / f"{engine}.log"
+
+            def process(
+                processor: PacketProcessor = processor, output_file: Path = output_file
+            ) -> None:
+                processor.process_file(capture_file, output_file)
+
+            self._measure(
+                f"process_{engine}",
+                process,
+                packets=packets // len(capture_files),
+                megabytes=capture_file.stat().st_size / 1e6,
+            )
+
+        work_directories = WorkDirectories(
+            input=directory / "stage" / "input",
+            current=directory / "stage" / "current",
+            processed=directory / "stage" / "processed",
+            output=directory / "stage" / "output",
+        ).for_source("bench")
+        work_area = WorkArea(work_directories, incremental_staging=True)
+        for name in ("stage", "restage"):
+            self._measure(
+                name, lambda: work_area.ingest_files(capture_files), packets, megabytes
+            )
+
+        application = Application(Configuration(self._write_config(directory)))
+        try:
+            for name in ("tick_initial", "tick_steady"):
+                self._measure(name, application.run, packets, megabytes)
+        finally:
+            application.close()
+
+    def _generate(self, directory: Path) -> tuple[list[Path], int]:
+        """Writes the capture files of all routers; returns them and the packet count."""
+        start = datetime.combine(datetime.today(), datetime.min.time())
+        capture_files: list[Path] = []
+        packets = 0
+        for router_num, router in enumerate(ROUTERS):
+            router_directory = directory / router
+            router_directory.mkdir(parents=True, exist_ok=True)
+            for count in range(FILES_PER_ROUTER):
+                timestamp = start + count * self._duration
+                generator = SyntheticCaptureGenerator(
+                    self._traffic, seed=router_num * FILES_PER_ROUTER + count
+                )
+                capture_file = router_directory / generator.file_name(
+                    router, count + 1, timestamp
+                )
+                packets += generator.write(capture_file, timestamp, self._duration)
+                capture_files.append(capture_file)
+        return capture_files, packets
+
+    def _write_config(self, directory: Path) -> Path:
+        work = directory / "work"
+        config: dict[str, Any] = {
+            "processing_interval_seconds": 60,
+            "filter_ip": self._traffic.filter_ip,
+            "awk_script": str(self._awk_script),
+            "incremental_processing": True,
+            "packet_engine": self._engines[0],
+            "incremental_staging": True,
+            "max_workers": self._max_workers,
+            "merged_log_file": str(directory / "merged" / "routerlog.log"),
+            "capture_directories": [
+                str(directory / "captures" / router) for router in ROUTERS
+            ],
+            "work_directories": {
+                name: str(work / name) for name in ("input", "current", "processed", "output")
+            },
+        }
+        config_file = directory / "config.yaml"
+        with open(config_file, "w", encoding="utf-8") as f:
+            yaml.safe_dump(config, f)
+        return config_file
+
+    def _measure(
+        self, name: str, function: Callable[[], Any], packets: int, megabytes: float
+    ) -> None:
+        self._logger.info(f"Running {name}")
+        start_time = time.monotonic()
+        function()
+        self._add_result(name, time.monotonic() - start_time, packets, megabytes)
+
+    def _add_result(self, name: str, seconds: float, packets: int, megabytes: float) -> None:
+        elapsed = max(seconds, 1e-6)
+        result = StageResult(
+            name=name,
+            seconds=round(seconds, 6),
+            packets=packets,
+            megabytes=round(megabytes, 3),
+            packets_per_second=round(packets / elapsed, 1),
+            megabytes_per_second=round(megabytes / elapsed, 3),
+            peak_rss_mb=round(_peak_rss_mb(), 1),
+        )
+        self._results.append(result)
+        self._logger.info(
+            f"{name:14s}: {result.seconds:9.3f}s {result.megabytes_per_second:9.1f} MB/s "
+            f"{result.packets_per_second:11.0f} packets/s  peak RSS {result.peak_rss_mb:.1f} MB"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the capture processing stages")
+    parser.add_argument("-a", "--awk-script", required=True, help="rtcd_routerlog.awk path")
+    parser.add_argument("-f", "--filter-ip", default=DEFAULT_FILTER_IP, help="Sniffed IP")
+    parser.add_argument("-e", "--engine", action="append", choices=PACKET_ENGINES,
+                        help="Packet engine(s) to benchmark (default: native)")
+    parser.add_argument("--packets-per-second", type=float, default=50.0)
+    parser.add_argument("--duration-seconds", type=int, default=3600,
+                        help="Traffic duration per capture file")
+    parser.add_argument("--min-payload-size", type=int, default=40)
+    parser.add_argument("--max-payload-size", type=int, default=400)
+    parser.add_argument("--vlan-ratio", type=float, default=0.0,
+                        help="Share of 802.1Q tagged frames")
+    parser.add_argument("--max-workers", type=int, default=0,
+                        help="Processing pool size for the application ticks")
+    parser.add_argument("--label", default="", help="Label stored with the results")
+    parser.add_argument("-o", "--output", type=Path, help="JSON results file")
+    parser.add_argument("--keep", type=Path, help="Keep the generated files in this directory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Only the benchmark's own progress is of interest
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger(Benchmark.__name__).setLevel(logging.INFO)
+
+    traffic = SyntheticTraffic(
+        filter_ip=args.filter_ip,
+        packets_per_second=args.packets_per_second,
+        min_payload_size=args.min_payload_size,
+        max_payload_size=args.max_payload_size,
+        vlan_ratio=args.vlan_ratio,
+    )
+    benchmark = Benchmark(
+        traffic,
+        Path(args.awk_script),
+        args.engine or [ENGINE_NATIVE],
+        timedelta(seconds=args.duration_seconds),
+        args.max_workers,
+    )
+    keep: Optional[Path] = args.keep
+    if keep:
+        keep.mkdir(parents=True, exist_ok=True)
+        benchmark.run(keep)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            benchmark.run(Path(tmp_dir))
+
+    if args.output:
+        results = {
+            "label": args.label,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": asdict(traffic) | {
+                "duration_seconds": args.duration_seconds,
+                "engines": args.engine or [ENGINE_NATIVE],
+                "max_workers": args.max_workers,
+            },
+            "stages": [asdict(result) for result in benchmark.results],
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
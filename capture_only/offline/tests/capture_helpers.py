@@ -0,0 +1,123 @@
+"""Builders of small capture files and router log records for the tests."""
+
+import socket
+import struct
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple, Optional
+
+import yaml
+
+SNIFFED_IP = "156.135.249.28"
+REMOTE_IP = "57.77.136.120"
+OTHER_IP = "10.99.0.1"
+
+_PCAP_GLOBAL_HEADER = struct.Struct("<IHHiIII")
+_PCAP_RECORD_HEADER = struct.Struct("<IIII")
+_IP_HEADER = struct.Struct("!BBHHHBBH4s4s")
+_ETHERNET_ADDRESSES = bytes.fromhex("0010dbff600940a8f02f59e6")
+_LINKTYPE_ETHERNET = 1
+
+AWK_SCRIPT = Path(__file__).resolve().parents[1] / "src" / "atnproc" / "rtcd_routerlog.awk"
+
+
+class Packet(NamedTuple):
+    """A captured frame and its timestamp."""
+    ts_sec: int
+    ts_usec: int
+    frame: bytes
+
+
+def clnp_pdu(
+    user_data: bytes = b"\x00" * 8,
+    segment: Optional[tuple[int, int, int]] = None,
+    more_segments: bool = False,
+    source_nsap: bytes = b"\x47\x00\x27\x81",
+    destination_nsap: bytes = b"\x47\x00\x27\x41",
+) -> bytes:
+    """Returns a CLNP DT PDU; ``segment`` is (identifier, offset, total length)."""
+    addresses = (
+        bytes([len(destination_nsap)]) + destination_nsap
+        + bytes([len(source_nsap)]) + source_nsap
+    )
+    segmentation = struct.pack("!HHH", *segment) if segment else b""
+    header_length = 9 + len(addresses) + len(segmentation)
+    # Segmentation permitted and more segments flags
+    flags = 0x80 if segment else 0x00
+    if more_segments:
+        flags |= 0x40
+    fixed = struct.pack(
+        "!BBBBBHH", 0x81, header_length, 1, 30, flags | 0x1C, header_length + len(user_data), 0
+    )
+    return fixed + addresses + segmentation + user_data
+
+
+def ip_frame(source: str, destination: str, payload: bytes, vlan: bool = False,
+             protocol: int = 80) -> bytes:
+    """Returns an Ethernet frame carrying ``payload`` in an IPv4 packet."""
+    ip_header = _IP_HEADER.pack(
+        0x45, 0, 20 + len(payload), 1, 0, 64, protocol, 0,
+        socket.inet_aton(source), socket.inet_aton(destination),
+    )
+    tag = b"\x81\x00\x0f\x90" if vlan else b""
+    return _ETHERNET_ADDRESSES + tag + b"\x08\x00" + ip_header + payload
+
+
+def pcap_bytes(packets: Iterable[Packet]) -> bytes:
+    """Returns a classic little endian Ethernet pcap file of ``packets``."""
+    data = bytearray(_PCAP_GLOBAL_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, _LINKTYPE_ETHERNET))
+    for packet in packets:
+        data += _PCAP_RECORD_HEADER.pack(
+            packet.ts_sec, packet.ts_usec, len(packet.frame), len(packet.frame)
+        )
+        data += packet.frame
+    return bytes(data)
+
+
+def write_pcap(file: Path, packets: Iterable[Packet]) -> Path:
+    file.write_bytes(pcap_bytes(packets))
+    return file
+
+
+def exchange(count: int, start: int = 1_700_000_000, step_usec: int = 250_000) -> list[Packet]:
+    """Returns ``count`` packets alternately sent and received by the sniffed address.
+
+    Every fifth packet is exchanged between other hosts and is filtered out.
+    """
+    packets: list[Packet] = []
+    for i in range(count):
+        if i % 5 == 4:
+            source, destination = OTHER_IP, REMOTE_IP
+        elif i % 2:
+            source, destination = REMOTE_IP, SNIFFED_IP
+        else:
+            source, destination = SNIFFED_IP, REMOTE_IP
+        timestamp = start * 1_000_000 + i * step_usec
+        payload = clnp_pdu(i.to_bytes(4, "big") * (1 + i % 7))
+        frame = ip_frame(source, destination, payload)
+        packets.append(Packet(timestamp // 1_000_000, timestamp % 1_000_000, frame))
+    return packets
+
+
+def router_log_line(timestamp: str, direction: str = "RCVD", remote_ip: str = REMOTE_IP,
+                    pdu: str = "814e01") -> str:
+    """Returns a router log record; ``timestamp`` is ``YYYY-MM-DD HH:MM:SS.mmm``."""
+    return f"ROUTER CLNS_DT_PDU {timestamp} {direction} {len(pdu) // 2} {remote_ip} {pdu}\n"
+
+
+def write_config(directory: Path, capture_directories: list[Path], **settings: Any) -> Path:
+    """Writes a configuration using the native engine and work directories in ``directory``."""
+    config = {
+        "processing_interval_seconds": 60,
+        "filter_ip": SNIFFED_IP,
+        "awk_script": str(AWK_SCRIPT),
+        "packet_engine": "native",
+        "capture_directories": [str(d) for d in capture_directories],
+        "work_directories": {
+            name: str(directory / "work" / name)
+            for name in ("input", "current", "processed", "output")
+        },
+    }
+    config.update(settings)
+    config_file = directory / "config.yaml"
+    config_file.write_text(yaml.safe_dump(config), encoding="utf-8")
+    return config_file
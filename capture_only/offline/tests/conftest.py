@@ -0,0 +1,25 @@
+"""Shared pytest configuration.
+
+Imports ``atnproc`` from the source tree and runs every test in UTC, as
+router log timestamps are formatted in the local time zone.
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+SOURCE_DIRECTORY = Path(__file__).resolve().parents[1] / "src"
+if str(SOURCE_DIRECTORY) not in sys.path:
+    sys.path.insert(0, str(SOURCE_DIRECTORY))
+
+
+@pytest.fixture(autouse=True)
+def utc_time_zone(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Golden-output comparison of the tcpdump/awk and native packet engines.
+
+Processes each given capture file with both engines of
+:class:`~atnproc.packet_processor.PacketProcessor`, verifies that the
+generated router logs are byte-identical and reports the throughput of
+each engine. Exits with status 1 if any output differs.
+
+The comparison is not part of the installed package. Run it from the
+``capture_only/offline`` directory, for example:
+
+    PYTHONPATH=src python -m tests.engine_comparison -f 156.135.249.28 \\
+        -a src/atnproc/rtcd_routerlog.awk atnr01_net3_00001_20251229154959.pcap
+"""
+
+import argparse
+import filecmp
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from atnproc.packet_processor import (
+    ENGINE_NATIVE,
+    ENGINE_TCPDUMP,
+    PacketProcessor,
+    ProcessorSettings,
+)
+
+
+def _run_engine(
+    engine: str, filter_ip: str, awk_script: Path, capture_file: Path, output_file: Path
+) -> tuple[float, int]:
+    """Runs one engine and returns the elapsed time and packet count."""
+    processor = PacketProcessor(ProcessorSettings((filter_ip,), awk_script, engine))
+    start_time = time.monotonic()
+    processor.process_file(capture_file, output_file)
+    return time.monotonic() - start_time, processor.stats.packets
+
+
+def compare_engines(filter_ip: str, awk_script: Path, capture_file: Path) -> bool:
+    """Compares both engines on ``capture_file``; returns True if identical."""
+    logger = logging.getLogger("EngineComparison")
+    megabytes = capture_file.stat().st_size / 1e6
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        outputs: dict[str, Path] = {}
+        packets = 0
+        # The native engine runs first as it also counts the packets.
+        for engine in (ENGINE_NATIVE, ENGINE_TCPDUMP):
+            output_file = Path(tmp_dir) / f"{engine}.log"
+            elapsed, engine_packets = _run_engine(
+                engine, filter_ip, awk_script, capture_file, output_file
+            )
+            packets = max(packets, engine_packets)
+            outputs[engine] = output_file
+            elapsed = max(elapsed, 1e-6)
+            logger.info(
+                f"{capture_file.name} {engine:8s}: {elapsed:8.3f}s "
+                f"{megabytes / elapsed:8.1f} MB/s {packets / elapsed:10.0f} packets/s"
+            )
+        identical = filecmp.cmp(outputs[ENGINE_TCPDUMP], outputs[ENGINE_NATIVE], shallow=False)
+    if identical:
+        logger.info(f"{capture_file.name}: outputs are identical")
+    else:
+        logger.error(f"{capture_file.name}: outputs differ")
+    return identical
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the tcpdump/awk and native packet engines"
+    )
+    parser.add_argument("-f", "--filter-ip", required=True, help="Sniffed IP address")
+    parser.add_argument("-a", "--awk-script", required=True, help="rtcd_routerlog.awk path")
+    parser.add_argument("capture_files", nargs="+", help="Capture files to compare")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    identical = True
+    for capture_file in args.capture_files:
+        identical &= compare_engines(args.filter_ip, Path(args.awk_script), Path(capture_file))
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Stand-in for the Airtel ``pdec_clnp`` decoder used by the tests.
+
+Accepts the command line used by `PdecDecoder` and writes a ``pdus.csv``
+file to the working directory with one row per router log record: its
+timestamp, direction, remote IP, PDU length and the number of earlier
+records of the same remote IP in the decoded log (a stand-in for the
+connection context the real decoder builds up). The tests pass this file
+as the decoder executable.
+"""
+
+import argparse
+import csv
+import sys
+from collections import Counter
+
+PDUS_CSV_FILE_NAME = "pdus.csv"
+COLUMNS = ("timestamp", "direction", "remote", "length", "context")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="pdec_clnp stand-in")
+    parser.add_argument("-i", dest="log_file", required=True, help="Router log file")
+    parser.add_argument("-s", dest="atsu_file", help="ATSU file (ignored)")
+    for flag in ("--csv", "--notxt", "--quiet", "--nointermediate"):
+        parser.add_argument(flag, action="store_true")
+    args = parser.parse_args()
+
+    context: Counter[str] = Counter()
+    with (
+        open(args.log_file, encoding="utf-8", errors="replace") as in_f,
+        open(PDUS_CSV_FILE_NAME, "w", encoding="utf-8", newline="") as out_f,
+    ):
+        writer = csv.writer(out_f)
+        writer.writerow(COLUMNS)
+        for line in in_f:
+            fields = line.split()
+            if len(fields) < 8 or fields[0] != "ROUTER":
+                continue
+            remote = fields[6]
+            writer.writerow(
+                (f"{fields[2]} {fields[3]}", fields[4], remote, fields[5], context[remote])
+            )
+            context[remote] += 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
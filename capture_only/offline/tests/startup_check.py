@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Start-up time budget of the command line entry point.
+
+Imports ``atnproc.main`` in a fresh interpreter with ``-X importtime`` and
+checks that
+
+- the cumulative import time of ``atnproc.main`` stays within the budget
+  (the best of several runs, to ignore a cold page cache), and
+- none of the modules that only some commands need is imported at
+  start-up: these are imported when the command runs.
+
+Prints the slowest imports and exits with 1 if a check fails, so it can
+run in CI or after a deployment.
+
+Example:
+    python -m tests.startup_check --budget-ms 100
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SOURCE_DIRECTORY = Path(__file__).resolve().parents[1] / "src"
+ENTRY_POINT = "atnproc.main"
+# Modules that must not be imported before a command runs
+DEFERRED_MODULES = (
+    "atnproc.application",
+    "atnproc.backfill",
+    "atnproc.capture_converter",
+    "atnproc.packet_processor",
+    "atnproc.router_log_query",
+    "concurrent.futures.process",
+    "numpy",
+    "yaml",
+)
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Returns the cumulative import time in microseconds of each module imported."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(SOURCE_DIRECTORY), env.get("PYTHONPATH", "")]
+    ).rstrip(os.pathsep)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def best_import_times(module: str, runs: int) -> dict[str, int]:
+    """Returns the import times of the fastest of ``runs`` imports of ``module``."""
+    return min(
+        (import_times(module) for _ in range(max(1, runs))),
+        key=lambda times: times.get(module, 0),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the start-up time budget")
+    parser.add_argument(
+        "--budget-ms", type=float, default=100.0,
+        help=f"Maximum cumulative import time of {ENTRY_POINT} (default: 100)",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs (default: 5)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to print")
+    args = parser.parse_args()
+
+    best = best_import_times(ENTRY_POINT, args.runs)
+    total_ms = best.get(ENTRY_POINT, 0) / 1000
+    print(f"{ENTRY_POINT}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print(f"FAIL: start-up exceeds the budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    eager = [name for name in DEFERRED_MODULES if name in best]
+    if eager:
+        print(f"FAIL: imported at start-up: {', '.join(eager)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
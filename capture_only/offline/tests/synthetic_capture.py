@@ -0,0 +1,120 @@
+"""Generation of synthetic ATN capture files.
+
+Contains `SyntheticCaptureGenerator` which writes pcap files resembling
+the ATN router captures: Ethernet frames (optionally 802.1Q tagged)
+carrying IPv4 protocol 80 packets whose payload is a CLNP DT PDU, sent
+to and received from the sniffed address at a configurable rate. A share
+of the packets is exchanged between other hosts so the address filter is
+exercised as well. The files are used by :mod:`tests.benchmark`.
+"""
+
+import random
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from ipaddress import IPv4Address
+from pathlib import Path
+
+_PCAP_GLOBAL_HEADER = struct.Struct("<IHHiIII")
+_PCAP_RECORD_HEADER = struct.Struct("<IIII")
+_IP_HEADER = struct.Struct("!BBHHHBBH4s4s")
+_CLNP_FIXED_HEADER = struct.Struct("!BBBBBHH")
+_PCAP_MAGIC = 0xA1B2C3D4
+_LINKTYPE_ETHERNET = 1
+_ETHERTYPE_IPV4 = b"\x08\x00"
+_ETHERTYPE_VLAN = b"\x81\x00"
+_IP_PROTO_CLNP = 80
+_CLNP_NLPID = 0x81
+_CLNP_DT_PDU = 0x1C
+_NSAP_LENGTH = 20
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class SyntheticTraffic:
+    """Parameters of the generated traffic."""
+    filter_ip: str
+    packets_per_second: float = 50.0
+    min_payload_size: int = 40
+    max_payload_size: int = 400
+    vlan_ratio: float = 0.0
+    other_traffic_ratio: float = 0.1
+    num_remote_hosts: int = 16
+
+
+class SyntheticCaptureGenerator:
+    """Writes synthetic ATN capture files."""
+
+    def __init__(self, traffic: SyntheticTraffic, seed: int = 0) -> None:
+        self._traffic = traffic
+        self._random = random.Random(seed)
+        self._filter_ip = IPv4Address(traffic.filter_ip).packed
+        base = int(IPv4Address(traffic.filter_ip)) & 0xFFFFFF00
+        self._remote_ips = [
+            IPv4Address(base + 100 + i).packed for i in range(traffic.num_remote_hosts)
+        ]
+        self._other_ips = [IPv4Address(f"10.99.0.{i + 1}").packed for i in range(4)]
+        self._nsaps = [self._random.randbytes(_NSAP_LENGTH) for _ in range(64)]
+        self._ip_id = 0
+
+    @staticmethod
+    def file_name(host: str, count: int, timestamp: datetime) -> str:
+        """Returns a file name following the capture file naming convention."""
+        return f"{host}_net3_{count:05d}_{timestamp:%Y%m%d%H%M%S}.pcap"
+
+    def write(self, capture_file: Path, start: datetime, duration: timedelta) -> int:
+        """Writes ``duration`` of traffic starting at ``start``; returns the packet count."""
+        interval = 1.0 / self._traffic.packets_per_second
+        num_packets = int(duration.total_seconds() * self._traffic.packets_per_second)
+        timestamp = start.timestamp()
+        buffer = bytearray(
+            _PCAP_GLOBAL_HEADER.pack(_PCAP_MAGIC, 2, 4, 0, 0, 65535, _LINKTYPE_ETHERNET)
+        )
+        with open(capture_file, "wb") as f:
+            for _ in range(num_packets):
+                # Exponential inter-arrival times around the configured rate
+                timestamp += self._random.expovariate(1.0 / interval)
+                frame = self._frame()
+                ts_sec = int(timestamp)
+                ts_usec = int((timestamp - ts_sec) * 1_000_000)
+                buffer += _PCAP_RECORD_HEADER.pack(ts_sec, ts_usec, len(frame), len(frame))
+                buffer += frame
+                if len(buffer) >= _WRITE_BUFFER_SIZE:
+                    f.write(buffer)
+                    buffer.clear()
+            f.write(buffer)
+        return num_packets
+
+    def _frame(self) -> bytes:
+        traffic = self._traffic
+        if self._random.random() < traffic.other_traffic_ratio:
+            src, dst = self._random.sample(self._other_ips, 2)
+        else:
+            remote = self._random.choice(self._remote_ips)
+            src, dst = (
+                (self._filter_ip, remote) if self._random.random() < 0.5
+                else (remote, self._filter_ip)
+            )
+        payload = self._clnp_pdu()
+        self._ip_id = (self._ip_id + 1) & 0xFFFF
+        ip_header = _IP_HEADER.pack(
+            0x45, 0, 20 + len(payload), self._ip_id, 0, 64, _IP_PROTO_CLNP, 0, src, dst
+        )
+        ethernet = b"\x00\x10\xdb\xff\x60\x09\x40\xa8\xf0\x2f\x59\xe6"
+        if self._random.random() < traffic.vlan_ratio:
+            ethernet += _ETHERTYPE_VLAN + b"\x0f\x90"
+        return ethernet + _ETHERTYPE_IPV4 + ip_header + payload
+
+    def _clnp_pdu(self) -> bytes:
+        """Returns a CLNP DT PDU with random NSAP addresses and user data."""
+        traffic = self._traffic
+        addresses = (
+            bytes([_NSAP_LENGTH]) + self._random.choice(self._nsaps)
+            + bytes([_NSAP_LENGTH]) + self._random.choice(self._nsaps)
+        )
+        header_length = _CLNP_FIXED_HEADER.size + len(addresses)
+        data_length = self._random.randint(traffic.min_payload_size, traffic.max_payload_size)
+        fixed = _CLNP_FIXED_HEADER.pack(
+            _CLNP_NLPID, header_length, 1, 30, _CLNP_DT_PDU, header_length + data_length, 0
+        )
+        return fixed + addresses + self._random.randbytes(data_length)
@@ -0,0 +1,39 @@
+"""Tests of the date range reprocessing by `Backfill`."""
+
+import json
+from datetime import date
+from pathlib import Path
+
+from atnproc.backfill import CHECKPOINT_FILE_NAME, Backfill
+from atnproc.config import Configuration
+
+from tests.capture_helpers import exchange, write_config, write_pcap
+
+
+def test_backfill_processes_the_date_range_once(tmp_path: Path) -> None:
+    directories = [tmp_path / "atnr01" / "captures", tmp_path / "atnr02" / "captures"]
+    for directory in directories:
+        directory.mkdir(parents=True)
+        for day in (1, 2, 3):
+            name = f"{directory.parent.name}_net3_0000{day}_2025010{day}120000.pcap"
+            write_pcap(directory / name, exchange(10 * day))
+    config = Configuration(write_config(tmp_path, directories))
+    output_directory = tmp_path / "backfill"
+
+    backfill = Backfill(config, date(2025, 1, 2), date(2025, 1, 3), output_directory, 2)
+    assert backfill.run()
+
+    logs = sorted(p.relative_to(output_directory) for p in output_directory.rglob("*.log"))
+    assert [str(p) for p in logs] == [
+        f"{source}_captures/{source}_net3_0000{day}_2025010{day}120000.log"
+        for source in ("atnr01", "atnr02")
+        for day in (2, 3)
+    ]
+    assert all(len((output_directory / p).read_text().splitlines()) > 0 for p in logs)
+    checkpoint = json.loads((output_directory / CHECKPOINT_FILE_NAME).read_text())
+    assert len(checkpoint["completed"]) == 4
+
+    # A resumed backfill skips the completed files
+    modified = {p: (output_directory / p).stat().st_mtime_ns for p in logs}
+    assert Backfill(config, date(2025, 1, 2), date(2025, 1, 3), output_directory, 2).run()
+    assert {p: (output_directory / p).stat().st_mtime_ns for p in logs} == modified
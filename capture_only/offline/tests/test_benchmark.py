@@ -0,0 +1,38 @@
+"""Smoke test of the processing benchmark on a tiny synthetic capture."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.capture_helpers import AWK_SCRIPT
+from tests.conftest import SOURCE_DIRECTORY
+
+STAGES = [
+    "generate", "process_native", "stage", "restage", "tick_initial", "tick_steady"
+]
+
+
+def test_benchmark_writes_the_results_of_all_stages(tmp_path: Path) -> None:
+    results_file = tmp_path / "benchmark.json"
+    env = dict(os.environ, PYTHONPATH=str(SOURCE_DIRECTORY))
+
+    subprocess.run(
+        [
+            sys.executable, "-m", "tests.benchmark", "-a", str(AWK_SCRIPT),
+            "--duration-seconds", "20", "--packets-per-second", "10", "--vlan-ratio", "0.2",
+            "--keep", str(tmp_path / "files"), "-o", str(results_file),
+        ],
+        cwd=SOURCE_DIRECTORY.parent,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+    results = json.loads(results_file.read_text())
+    assert [stage["name"] for stage in results["stages"]] == STAGES
+    assert all(stage["packets"] > 0 for stage in results["stages"])
+    router_logs = list((tmp_path / "files" / "work" / "output").glob("*.log"))
+    assert len(router_logs) == 4
+    assert all(log.stat().st_size > 0 for log in router_logs)
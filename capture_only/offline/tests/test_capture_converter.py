@@ -0,0 +1,60 @@
+"""Tests of the routing of live captured packets to the daily router logs."""
+
+import socket
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from atnproc.capture_converter import CaptureConverter
+
+from tests.capture_helpers import REMOTE_IP, SNIFFED_IP, Packet, clnp_pdu, ip_frame, write_pcap
+
+
+def packet(timestamp: datetime) -> Packet:
+    frame = ip_frame(SNIFFED_IP, REMOTE_IP, clnp_pdu())
+    return Packet(int(timestamp.timestamp()), 0, frame)
+
+
+def test_late_packets_are_appended_to_the_file_of_their_day(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = datetime.now(timezone.utc)
+    yesterday = now - timedelta(days=1)
+    earlier = now - timedelta(days=3)
+    capture_file = write_pcap(
+        tmp_path / "stream.pcap",
+        [packet(now), packet(yesterday), packet(earlier), packet(yesterday), packet(now)],
+    )
+    popen = subprocess.Popen
+
+    # The capture stream of tcpdump is replayed from the capture file
+    def replay(cmd: list[str], **kwargs: Any) -> "subprocess.Popen[bytes]":
+        assert cmd[0] == "tcpdump"
+        return popen(["cat", str(capture_file)], **kwargs)
+
+    monkeypatch.setattr(subprocess, "Popen", replay)
+    output_directory = tmp_path / "output"
+    output_directory.mkdir()
+    prefix = f"{socket.gethostname().split('.')[0].split('-')[0]}_net3"
+    yesterday_file = output_directory / f"{prefix}_{yesterday:%Y%m%d}_120000.log"
+    yesterday_file.write_text("previous\n")
+    converter = CaptureConverter("net3", SNIFFED_IP, output_directory)
+
+    # The converter fails once the replayed stream ended, closing its files
+    deadline = time.monotonic() + 10
+    with pytest.raises(RuntimeError, match="end of stream"):
+        while time.monotonic() < deadline:
+            converter.run()
+            time.sleep(0.05)
+
+    assert len(converter.output_file.read_text().splitlines()) == 2
+    assert len(yesterday_file.read_text().splitlines()) == 3
+    earlier_file = output_directory / f"{prefix}_{earlier:%Y%m%d}_000000.log"
+    assert len(earlier_file.read_text().splitlines()) == 1
+    assert sorted(output_directory.iterdir()) == sorted(
+        [converter.output_file, yesterday_file, earlier_file]
+    )
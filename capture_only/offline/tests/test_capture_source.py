@@ -0,0 +1,73 @@
+"""Tests of incremental processing ticks of a `CaptureSource`."""
+
+from datetime import datetime
+from pathlib import Path
+
+from atnproc.capture_source import CaptureSource
+from atnproc.config import Configuration
+from atnproc.metrics import Metrics
+from atnproc.packet_processor import ENGINE_NATIVE, PacketProcessor, ProcessorSettings
+from atnproc.processing_task import execute_tasks
+
+from tests.capture_helpers import AWK_SCRIPT, SNIFFED_IP, exchange, pcap_bytes, write_config
+
+
+def tick(source: CaptureSource, settings: ProcessorSettings) -> None:
+    source.complete(execute_tasks(settings, source.plan()))
+
+
+def full_run(capture_file: Path, output_file: Path) -> str:
+    PacketProcessor(ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE)).process_file(
+        capture_file, output_file
+    )
+    return output_file.read_text()
+
+
+def test_incremental_ticks_produce_the_log_of_a_full_run(tmp_path: Path) -> None:
+    capture_directory = tmp_path / "captures"
+    capture_directory.mkdir()
+    config = Configuration(
+        write_config(tmp_path, [capture_directory], incremental_processing=True)
+    )
+    settings = ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE)
+    source = CaptureSource("atnr01", capture_directory, config, Metrics())
+    name = f"atnr01_net3_00001_{datetime.now():%Y%m%d}000000"
+    capture_file = capture_directory / f"{name}.pcap"
+    data = pcap_bytes(exchange(80))
+
+    for size in (500, 1999, 2000, 4321):
+        capture_file.write_bytes(data[:size])
+        tick(source, settings)
+    output_file = config.work_directories.output / f"{name}.log"
+    # Records appended by a run that did not complete are dropped on resume
+    with open(output_file, "a", encoding="utf-8") as f:
+        f.write("ROUTER CLNS_DT_PDU incomplete")
+    capture_file.write_bytes(data)
+    tick(source, settings)
+
+    assert output_file.read_text() == full_run(capture_file, tmp_path / "full.log")
+
+    # A restarted source resumes from the persisted state without new output
+    restarted = CaptureSource("atnr01", capture_directory, config, Metrics())
+    tick(restarted, settings)
+    assert output_file.read_text() == (tmp_path / "full.log").read_text()
+
+
+def test_files_staged_in_the_shared_work_area_are_moved(tmp_path: Path) -> None:
+    capture_directory = tmp_path / "captures"
+    capture_directory.mkdir()
+    config = Configuration(write_config(tmp_path, [capture_directory]))
+    name = f"atnr01_net3_00001_{datetime.now():%Y%m%d}000000.pcap"
+    (capture_directory / name).write_bytes(pcap_bytes(exchange(10)))
+    shared = config.work_directories
+    for directory in (shared.input, shared.current):
+        directory.mkdir(parents=True)
+        (directory / name).write_bytes(pcap_bytes(exchange(10)))
+    (shared.current / "atnr02_net3_00001_20250101000000.pcap").write_bytes(b"")
+
+    CaptureSource("atnr01", capture_directory, config, Metrics())
+
+    for directory in (shared.input, shared.current):
+        assert (directory / "atnr01" / name).is_file()
+        assert not (directory / name).exists()
+    assert (shared.current / "atnr02_net3_00001_20250101000000.pcap").exists()
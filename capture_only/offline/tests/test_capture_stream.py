@@ -0,0 +1,67 @@
+"""Tests of processing compressed and pcapng capture files as streams."""
+
+import gzip
+import struct
+from pathlib import Path
+
+from atnproc.packet_processor import ENGINE_NATIVE, PacketProcessor, ProcessorSettings
+
+from tests.capture_helpers import AWK_SCRIPT, SNIFFED_IP, Packet, exchange, pcap_bytes
+
+
+def pcapng_bytes(packets: list[Packet]) -> bytes:
+    """Returns a pcapng section with one Ethernet interface of nanosecond resolution."""
+    def block(block_type: int, body: bytes) -> bytes:
+        body += bytes(-len(body) % 4)
+        length = len(body) + 12
+        return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+    data = block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1))
+    # if_tsresol 9 (nanoseconds), then the end of the options
+    data += block(1, struct.pack("<HHI", 1, 0, 65535) + struct.pack("<HHB3x", 9, 1, 9)
+                  + bytes(4))
+    for packet in packets:
+        timestamp = (packet.ts_sec * 1_000_000 + packet.ts_usec) * 1000
+        data += block(6, struct.pack(
+            "<IIIII", 0, timestamp >> 32, timestamp & 0xFFFFFFFF,
+            len(packet.frame), len(packet.frame),
+        ) + packet.frame)
+    return data
+
+
+def process(capture: Path, output_file: Path) -> PacketProcessor:
+    processor = PacketProcessor(ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE))
+    processor.process_file(capture, output_file)
+    return processor
+
+
+def test_stream_formats_give_the_log_of_the_pcap_file(tmp_path: Path) -> None:
+    packets = exchange(30)
+    pcap = tmp_path / "capture.pcap"
+    pcap.write_bytes(pcap_bytes(packets))
+    expected = tmp_path / "expected.log"
+    process(pcap, expected)
+
+    compressed = tmp_path / "capture.pcap.gz"
+    compressed.write_bytes(gzip.compress(pcap_bytes(packets)))
+    pcapng = tmp_path / "capture.pcapng"
+    pcapng.write_bytes(pcapng_bytes(packets))
+    for capture in (compressed, pcapng):
+        output_file = tmp_path / f"{capture.name}.log"
+        assert process(capture, output_file).succeeded
+        assert output_file.read_text() == expected.read_text()
+
+
+def test_truncated_compressed_file_is_retried(tmp_path: Path) -> None:
+    compressed = tmp_path / "capture.pcap.gz"
+    data = gzip.compress(pcap_bytes(exchange(30)))
+    compressed.write_bytes(data[:len(data) // 2])
+    output_file = tmp_path / "capture.log"
+
+    assert not process(compressed, output_file).succeeded
+    assert not output_file.exists()
+
+    # Once complete, the file is processed from the start
+    compressed.write_bytes(data)
+    assert process(compressed, output_file).succeeded
+    assert len(output_file.read_text().splitlines()) == 24
@@ -0,0 +1,66 @@
+"""Tests of the reassembly of segmented CLNP PDUs by the native engine."""
+
+from pathlib import Path
+
+from atnproc.clnp_reassembler import ReassemblySettings
+from atnproc.packet_processor import ENGINE_NATIVE, PacketProcessor, ProcessorSettings
+
+from tests.capture_helpers import (
+    AWK_SCRIPT,
+    REMOTE_IP,
+    SNIFFED_IP,
+    Packet,
+    clnp_pdu,
+    ip_frame,
+    write_pcap,
+)
+
+USER_DATA = bytes(range(60))
+# Header of 25 bytes with the segmentation part
+TOTAL_LENGTH = 25 + len(USER_DATA)
+
+
+def segment(ts_sec: int, offset: int, size: int, more_segments: bool) -> Packet:
+    pdu = clnp_pdu(USER_DATA[offset:offset + size], (7, offset, TOTAL_LENGTH), more_segments)
+    return Packet(ts_sec, 0, ip_frame(REMOTE_IP, SNIFFED_IP, pdu))
+
+
+def other(ts_sec: int) -> Packet:
+    return Packet(ts_sec, 0, ip_frame(SNIFFED_IP, REMOTE_IP, clnp_pdu(b"other")))
+
+
+def router_log(tmp_path: Path, name: str, packets: list[Packet], reassemble: bool) -> str:
+    capture_file = write_pcap(tmp_path / f"{name}.pcap", packets)
+    output_file = tmp_path / f"{name}.log"
+    processor = PacketProcessor(ProcessorSettings(
+        (SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE,
+        reassembly=ReassemblySettings(timeout_seconds=30) if reassemble else None,
+    ))
+    processor.process_file(capture_file, output_file)
+    assert processor.succeeded
+    return output_file.read_text()
+
+
+def test_segments_are_replaced_by_the_reassembled_pdu(tmp_path: Path) -> None:
+    # Out of order, with a packet of another PDU in between
+    segments = [
+        segment(100, 0, 20, True), other(101), segment(102, 40, 20, False),
+        segment(103, 20, 20, True), other(104),
+    ]
+    whole_pdu = Packet(
+        100, 0, ip_frame(REMOTE_IP, SNIFFED_IP, clnp_pdu(USER_DATA, (7, 0, TOTAL_LENGTH)))
+    )
+
+    assert router_log(tmp_path, "segments", segments, reassemble=True) == router_log(
+        tmp_path, "whole", [whole_pdu, other(101), other(104)], reassemble=False
+    )
+
+
+def test_incomplete_pdu_is_written_as_its_segments(tmp_path: Path) -> None:
+    # The last segment is missing, then the PDU times out
+    segments = [segment(100, 0, 20, True), other(101), segment(102, 20, 20, True), other(200)]
+
+    log = router_log(tmp_path, "reassembled", segments, reassemble=True)
+
+    assert log == router_log(tmp_path, "as_is", segments, reassemble=False)
+    assert len(log.splitlines()) == 4
@@ -0,0 +1,53 @@
+"""Tests of the NumPy based hourly CLNP traffic statistics."""
+
+import io
+from pathlib import Path
+
+from atnproc.clnp_statistics import ClnpStatistics
+from atnproc.packet_processor import ENGINE_NATIVE, PacketProcessor, ProcessorSettings
+
+from tests.capture_helpers import (
+    AWK_SCRIPT,
+    SNIFFED_IP,
+    clnp_pdu,
+    exchange,
+    router_log_line,
+    write_pcap,
+)
+
+
+def table(*files: Path, filter_ip: str = "") -> str:
+    statistics = ClnpStatistics(filter_ip)
+    for file in files:
+        statistics.add_file(file)
+    output = io.StringIO()
+    statistics.write_table(output)
+    return output.getvalue()
+
+
+def test_router_log_is_aggregated_per_hour(tmp_path: Path) -> None:
+    log_file = tmp_path / "router.log"
+    log_file.write_text(
+        router_log_line("2024-01-01 00:10:00.000", "SENT", pdu=clnp_pdu().hex())
+        + router_log_line("2024-01-01 00:20:00.500", pdu=clnp_pdu(segment=(1, 0, 100)).hex())
+        + "not a router log record\n"
+        + router_log_line("2024-01-01 01:00:00.000", "SENT", pdu=clnp_pdu().hex())
+    )
+
+    assert table(log_file).splitlines() == [
+        "hour,direction,remote_ip,pdu_type,packets,segment_bytes,total_bytes",
+        "2024-01-01 00:00,RCVD,57.77.136.120,DT,1,33,100",
+        "2024-01-01 00:00,SENT,57.77.136.120,DT,1,27,27",
+        "2024-01-01 01:00,SENT,57.77.136.120,DT,1,27,27",
+    ]
+
+
+def test_capture_file_gives_the_statistics_of_its_router_log(tmp_path: Path) -> None:
+    capture_file = write_pcap(tmp_path / "capture.pcap", exchange(40, step_usec=200_000_000))
+    log_file = tmp_path / "capture.log"
+    PacketProcessor(ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE)).process_file(
+        capture_file, log_file
+    )
+
+    assert table(capture_file, filter_ip=SNIFFED_IP) == table(log_file)
+    assert len(table(log_file).splitlines()) > 3
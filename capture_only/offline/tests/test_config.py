@@ -0,0 +1,34 @@
+"""Tests of the shipped configuration file."""
+
+import re
+from pathlib import Path
+
+from atnproc.config import Configuration
+
+CONFIG_FILE = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+CONFIG_MODULE = Path(__file__).resolve().parents[1] / "src" / "atnproc" / "config.py"
+
+
+def test_shipped_configuration_keeps_the_baseline_behaviour() -> None:
+    config = Configuration(CONFIG_FILE)
+
+    assert config.processing.engine == "tcpdump"
+    assert not config.processing.incremental
+    assert not config.processing.incremental_staging
+    assert not config.scheduler.adaptive
+    assert not config.watcher.enabled
+    assert not config.reassembly.enabled
+    assert config.processing.max_workers == 0
+    assert config.merge.log_file is None
+    assert config.decoder.executable is None
+    assert config.metrics.textfile is None
+    assert config.retention.days == 0
+    assert config.retention.capture_days == 0
+
+
+def test_documented_optional_keys_exist() -> None:
+    documented = re.findall(r"^#(\w+):", CONFIG_FILE.read_text(), re.MULTILINE)
+    source = CONFIG_MODULE.read_text()
+
+    assert documented
+    assert [key for key in documented if f'"{key}"' not in source] == []
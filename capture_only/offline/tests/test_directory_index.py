@@ -0,0 +1,74 @@
+"""Tests of the cached `DirectoryIndex` of capture directories."""
+
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from atnproc.capture_file_name import CaptureFileName
+from atnproc.directory_index import DirectoryIndex
+
+
+# A directory mtime far enough in the past for a scan of it to be trusted
+PAST_NS = time.time_ns() - 3600 * 1_000_000_000
+
+
+def age_directory(directory: Path) -> None:
+    os.utime(directory, ns=(PAST_NS, PAST_NS))
+
+
+def test_capture_files_are_listed_newest_first(tmp_path: Path) -> None:
+    for name in ("atnr01_net3_00002_20240102000000.pcap",
+                 "atnr01_net3_00001_20240101000000.pcap.gz",
+                 "atnr01_net3_00003_20240103000000.pcapng",
+                 "atnr01_net3_00004_notatimestamp.pcap",
+                 "atnr01_net3_00005_20240104000000.pcap.idx",
+                 "notes.txt"):
+        (tmp_path / name).touch()
+
+    files = DirectoryIndex().files(tmp_path)
+
+    assert [f.path.name for f in files] == [
+        "atnr01_net3_00003_20240103000000.pcapng",
+        "atnr01_net3_00002_20240102000000.pcap",
+        "atnr01_net3_00001_20240101000000.pcap.gz",
+    ]
+
+
+def test_unchanged_directory_is_not_scanned_again(tmp_path: Path) -> None:
+    (tmp_path / "atnr01_net3_00001_20240101000000.pcap").touch()
+    age_directory(tmp_path)
+    index = DirectoryIndex()
+    files = index.files(tmp_path)
+
+    # A file appearing without an mtime change is only seen after one
+    (tmp_path / "atnr01_net3_00002_20240102000000.pcap").touch()
+    age_directory(tmp_path)
+    assert index.files(tmp_path) is files
+
+    os.utime(tmp_path)
+    assert [f.path.name for f in index.files(tmp_path)] == [
+        "atnr01_net3_00002_20240102000000.pcap",
+        "atnr01_net3_00001_20240101000000.pcap",
+    ]
+
+
+def test_recently_modified_directory_is_scanned_again(tmp_path: Path) -> None:
+    index = DirectoryIndex()
+    assert index.files(tmp_path) == []
+
+    # Same mtime second as the first scan: the scan was not trusted
+    (tmp_path / "atnr01_net3_00001_20240101000000.pcap").touch()
+    stat = tmp_path.stat()
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert len(index.files(tmp_path)) == 1
+
+
+def test_missing_directory_has_no_files(tmp_path: Path) -> None:
+    assert DirectoryIndex().files(tmp_path / "missing") == []
+
+
+def test_timestamp_is_parsed_for_all_suffixes() -> None:
+    for suffix in (".pcap", ".pcap.gz", ".pcap.zst", ".pcapng"):
+        name = CaptureFileName(f"10.0.0.1_net3_00001_20240229235959{suffix}")
+        assert name.timestamp == datetime(2024, 2, 29, 23, 59, 59)
@@ -0,0 +1,31 @@
+"""Tests of the inotify based `DirectoryWatcher`."""
+
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from atnproc.directory_watcher import DirectoryWatcher
+
+
+def test_a_completed_capture_file_wakes_the_loop_once(tmp_path: Path) -> None:
+    woken = threading.Event()
+    wake_ups: list[None] = []
+
+    def wake() -> None:
+        wake_ups.append(None)
+        woken.set()
+
+    watcher = DirectoryWatcher([tmp_path], debounce=timedelta(seconds=0.2))
+    watcher.start(wake)
+    try:
+        (tmp_path / "notes.txt").write_text("ignored")
+        assert not woken.wait(0.5)
+        # A burst of writes, then the file is renamed into place like rsync does
+        for i in range(3):
+            (tmp_path / f".part{i}").write_bytes(b"x")
+        (tmp_path / ".part0").rename(tmp_path / "atnr01_net3_00001_20250101000000.pcap")
+        (tmp_path / "atnr01_net3_00002_20250101010000.pcap").write_bytes(b"y")
+        assert woken.wait(5)
+    finally:
+        watcher.close()
+    assert len(wake_ups) == 1
@@ -0,0 +1,76 @@
+"""Golden output of the packet engines on a small synthetic capture.
+
+The capture holds untagged and single VLAN tagged ISO-over-IP frames of
+the sniffed address, which both engines convert, and frames neither
+engine accepts: a double tagged frame, other hosts, another IP protocol.
+The tcpdump engine is only tested where tcpdump is installed.
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from atnproc.packet_processor import (
+    ENGINE_NATIVE,
+    ENGINE_TCPDUMP,
+    PacketProcessor,
+    ProcessorSettings,
+)
+
+from tests.capture_helpers import (
+    AWK_SCRIPT,
+    OTHER_IP,
+    REMOTE_IP,
+    SNIFFED_IP,
+    Packet,
+    clnp_pdu,
+    ip_frame,
+    write_pcap,
+)
+
+GOLDEN_LOG = Path(__file__).parent / "data" / "golden.log"
+
+_QINQ_TAG = b"\x88\xa8\x00\x64"
+
+
+def golden_packets() -> list[Packet]:
+    def packet(usec: int, frame: bytes) -> Packet:
+        return Packet(1_700_000_000 + usec // 1_000_000, usec % 1_000_000, frame)
+
+    pdu = clnp_pdu(b"golden")
+    double_tagged = ip_frame(REMOTE_IP, SNIFFED_IP, pdu, vlan=True)
+    double_tagged = double_tagged[:12] + _QINQ_TAG + double_tagged[12:]
+    return [
+        packet(0, ip_frame(SNIFFED_IP, REMOTE_IP, pdu)),
+        packet(1_250, ip_frame(REMOTE_IP, SNIFFED_IP, clnp_pdu(b"\x01" * 40))),
+        packet(2_000_999, ip_frame(REMOTE_IP, SNIFFED_IP, pdu, vlan=True)),
+        packet(2_500_000, ip_frame(SNIFFED_IP, REMOTE_IP, clnp_pdu(b"\x02" * 3), vlan=True)),
+        packet(3_000_000, double_tagged),
+        packet(3_100_000, ip_frame(OTHER_IP, REMOTE_IP, pdu, vlan=True)),
+        packet(3_200_000, ip_frame(SNIFFED_IP, REMOTE_IP, pdu, protocol=6)),
+        # Not a CLNP PDU: the IP packet is written as is
+        packet(4_999_999, ip_frame(REMOTE_IP, SNIFFED_IP, b"\x00\x01\x02\x03")),
+        packet(61_000_000, ip_frame(SNIFFED_IP, REMOTE_IP, pdu)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "engine",
+    [
+        ENGINE_NATIVE,
+        pytest.param(
+            ENGINE_TCPDUMP,
+            marks=pytest.mark.skipif(shutil.which("tcpdump") is None, reason="needs tcpdump"),
+        ),
+    ],
+)
+def test_engine_matches_the_golden_router_log(tmp_path: Path, engine: str) -> None:
+    capture_file = write_pcap(tmp_path / "golden.pcap", golden_packets())
+    output_file = tmp_path / "golden.log"
+    processor = PacketProcessor(ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, engine))
+
+    processor.process_file(capture_file, output_file)
+
+    assert processor.succeeded
+    assert output_file.read_text() == GOLDEN_LOG.read_text()
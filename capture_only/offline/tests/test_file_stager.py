@@ -0,0 +1,78 @@
+"""Tests of incremental staging by `FileStager`."""
+
+import errno
+import fcntl
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from atnproc import file_stager
+from atnproc.file_stager import FileStager
+
+
+def test_only_the_appended_bytes_are_copied(tmp_path: Path) -> None:
+    source = tmp_path / "source.pcap"
+    staged = tmp_path / "staged.pcap"
+    source.write_bytes(b"a" * 5000)
+    stager = FileStager()
+
+    assert stager.stage(source, staged) == 5000
+    assert stager.stage(source, staged) == 0
+    with open(source, "ab") as f:
+        f.write(b"b" * 1234)
+    assert stager.stage(source, staged) == 1234
+    assert staged.read_bytes() == source.read_bytes()
+    assert staged.stat().st_mtime_ns == source.stat().st_mtime_ns
+
+
+def test_a_replaced_source_is_copied_again(tmp_path: Path) -> None:
+    source = tmp_path / "source.pcap"
+    staged = tmp_path / "staged.pcap"
+    source.write_bytes(b"a" * 5000)
+    stager = FileStager()
+    stager.stage(source, staged)
+
+    source.write_bytes(b"c" * 6000)
+    assert stager.stage(source, staged) == 6000
+    assert staged.read_bytes() == source.read_bytes()
+
+
+def test_a_reflinked_copy_counts_its_size(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def clone(dst_fd: int, request: int, src_fd: int) -> None:
+        assert request == file_stager._FICLONE  # pylint: disable=protected-access
+        with os.fdopen(os.dup(src_fd), "rb") as src, os.fdopen(os.dup(dst_fd), "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+    monkeypatch.setattr(fcntl, "ioctl", clone)
+    source = tmp_path / "source.pcap"
+    staged = tmp_path / "staged.pcap"
+    source.write_bytes(b"a" * 5000)
+
+    assert FileStager().stage(source, staged) == 5000
+    assert staged.read_bytes() == source.read_bytes()
+
+
+def test_unsupported_in_kernel_copy_falls_back_for_the_whole_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    attempts: list[int] = []
+
+    def unsupported(*args: int) -> int:
+        attempts.append(args[2])
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    def no_clone(*_args: int) -> None:
+        raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+
+    monkeypatch.setattr(fcntl, "ioctl", no_clone)
+    monkeypatch.setattr(os, "copy_file_range", unsupported)
+    monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    source = tmp_path / "source.pcap"
+    staged = tmp_path / "staged.pcap"
+    source.write_bytes(os.urandom(3 * 1024 * 1024 + 5))
+
+    assert FileStager().stage(source, staged) == source.stat().st_size
+    assert staged.read_bytes() == source.read_bytes()
+    assert len(attempts) == 1
@@ -0,0 +1,80 @@
+"""Tests of the metrics registry and its Prometheus textfile export."""
+
+from datetime import datetime
+from pathlib import Path
+
+from atnproc.capture_source import CaptureSource
+from atnproc.config import Configuration
+from atnproc.metrics import Metrics, ProcessStats
+from atnproc.packet_processor import ENGINE_NATIVE, ProcessorSettings
+from atnproc.processing_task import execute_tasks
+
+from tests.capture_helpers import AWK_SCRIPT, SNIFFED_IP, exchange, write_config, write_pcap
+
+
+def test_textfile_holds_all_metrics_in_the_text_format(tmp_path: Path) -> None:
+    metrics = Metrics()
+    metrics.inc("packets_total", 3, "Packets read", source="atnr01")
+    metrics.inc("packets_total", 2, "Packets read", source="atnr01")
+    metrics.set("backlog_bytes", 1024.0, "Bytes not processed yet")
+    metrics.record_process(ProcessStats("awk", 0.5, 0.25, 4096, 1))
+    textfile = tmp_path / "atnproc.prom"
+
+    metrics.write_textfile(textfile)
+
+    lines = textfile.read_text().splitlines()
+    assert lines[:3] == [
+        "# HELP atnproc_backlog_bytes Bytes not processed yet",
+        "# TYPE atnproc_backlog_bytes gauge",
+        "atnproc_backlog_bytes 1024.0",
+    ]
+    assert "# TYPE atnproc_packets_total counter" in lines
+    assert 'atnproc_packets_total{source="atnr01"} 5.0' in lines
+    assert 'atnproc_process_cpu_seconds_total{mode="user",process="awk"} 0.5' in lines
+    assert 'atnproc_process_failures_total{process="awk"} 1.0' in lines
+    # The temporary file is renamed, never left for the collector
+    assert [p.name for p in tmp_path.iterdir()] == ["atnproc.prom"]
+
+
+def test_label_values_are_escaped(tmp_path: Path) -> None:
+    metrics = Metrics()
+    metrics.inc("errors_total", 1, file='a "b"\\c\n')
+    textfile = tmp_path / "atnproc.prom"
+
+    metrics.write_textfile(textfile)
+
+    assert 'atnproc_errors_total{file="a \\"b\\"\\\\c\\n"} 1.0' in textfile.read_text()
+
+
+def test_span_records_the_stage_duration() -> None:
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.span("stage"):
+            pass
+
+    assert metrics.get("stage_runs_total", stage="stage") == 2
+    assert metrics.get("stage_duration_seconds_total", stage="stage") >= 0
+    assert metrics.get("stage_last_duration_seconds", stage="stage") >= 0
+
+
+def test_tick_records_the_processing_metrics(tmp_path: Path) -> None:
+    capture_directory = tmp_path / "captures"
+    capture_directory.mkdir()
+    config = Configuration(write_config(tmp_path, [capture_directory]))
+    metrics = Metrics()
+    source = CaptureSource("atnr01", capture_directory, config, metrics)
+    capture_file = write_pcap(
+        capture_directory / f"atnr01_net3_00001_{datetime.now():%Y%m%d}000000.pcap",
+        exchange(10),
+    )
+
+    settings = ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE)
+    source.complete(execute_tasks(settings, source.plan()))
+
+    output_file = config.work_directories.output / f"{capture_file.stem}.log"
+    assert metrics.get("stage_runs_total", stage="stage") == 1
+    assert metrics.get("input_bytes_total", source="atnr01") > 0
+    assert metrics.get("packets_total", source="atnr01") == 10
+    assert metrics.get("records_total", source="atnr01") == 8
+    assert metrics.get("output_bytes_total", source="atnr01") == output_file.stat().st_size
+    assert metrics.get("task_failures_total", source="atnr01") == 0
@@ -0,0 +1,42 @@
+"""Tests of filtering several sniffed addresses in a single pass."""
+
+from pathlib import Path
+
+from atnproc.packet_processor import (
+    ENGINE_NATIVE,
+    PacketProcessor,
+    ProcessorSettings,
+    address_output_file,
+)
+
+from tests.capture_helpers import AWK_SCRIPT, OTHER_IP, SNIFFED_IP, exchange, pcap_bytes
+
+
+def single_address_log(tmp_path: Path, capture: Path, filter_ip: str) -> str:
+    output_file = tmp_path / f"single_{filter_ip}.log"
+    PacketProcessor(ProcessorSettings((filter_ip,), AWK_SCRIPT, ENGINE_NATIVE)).process_file(
+        capture, output_file
+    )
+    return output_file.read_text()
+
+
+def test_every_address_gets_the_log_of_a_single_address_run(tmp_path: Path) -> None:
+    data = pcap_bytes(exchange(50))
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data)
+    log = tmp_path / "capture.log"
+    processor = PacketProcessor(
+        ProcessorSettings((SNIFFED_IP, OTHER_IP), AWK_SCRIPT, ENGINE_NATIVE)
+    )
+
+    # Two ticks, the first one ending in the middle of a record
+    capture.write_bytes(data[:2000])
+    offset = processor.process_file(capture, log)
+    capture.write_bytes(data)
+    assert processor.process_file(capture, log, offset) == len(data)
+
+    other_log = address_output_file(log, OTHER_IP)
+    assert other_log == tmp_path / f"capture_{OTHER_IP}.log"
+    assert log.read_text() == single_address_log(tmp_path, capture, SNIFFED_IP)
+    assert other_log.read_text() == single_address_log(tmp_path, capture, OTHER_IP)
+    assert len(other_log.read_text().splitlines()) == 10
@@ -0,0 +1,133 @@
+"""Tests of incremental capture file processing by `PacketProcessor`."""
+
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pytest
+
+from atnproc.packet_processor import (
+    ENGINE_NATIVE,
+    ENGINE_TCPDUMP,
+    PacketProcessor,
+    ProcessorSettings,
+)
+from atnproc.pcap_file import PCAP_GLOBAL_HEADER_LENGTH
+from atnproc.process_pipeline import ProcessCommand, ProcessPipeline
+
+from tests.capture_helpers import AWK_SCRIPT, SNIFFED_IP, exchange, pcap_bytes
+
+
+def processor(use_index: bool = True) -> PacketProcessor:
+    return PacketProcessor(
+        ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE, use_index=use_index)
+    )
+
+
+@pytest.mark.parametrize("use_index", [True, False])
+def test_incremental_ticks_match_a_full_run(tmp_path: Path, use_index: bool) -> None:
+    data = pcap_bytes(exchange(60))
+    full_capture = tmp_path / "full.pcap"
+    full_capture.write_bytes(data)
+    full_log = tmp_path / "full.log"
+    assert processor(use_index).process_file(full_capture, full_log) == len(data)
+
+    # The capture file grows by chunks that end in the middle of records
+    capture = tmp_path / "growing.pcap"
+    log = tmp_path / "growing.log"
+    incremental = processor(use_index)
+    offset = 0
+    for size in (PCAP_GLOBAL_HEADER_LENGTH - 4, 101, 777, 1500, 2999, len(data)):
+        capture.write_bytes(data[:size])
+        offset = incremental.process_file(capture, log, offset)
+        assert incremental.succeeded
+        assert offset <= size
+    assert offset == len(data)
+    assert log.read_text() == full_log.read_text()
+    assert len(log.read_text().splitlines()) == 48
+
+
+def test_truncated_tail_is_not_consumed(tmp_path: Path) -> None:
+    data = pcap_bytes(exchange(9))
+    complete_records = pcap_bytes(exchange(8))
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data[:-3])
+    log = tmp_path / "capture.log"
+    packet_processor = processor()
+
+    offset = packet_processor.process_file(capture, log)
+    assert offset == len(complete_records)
+    assert packet_processor.stats.packets == 8
+    lines = log.read_text().splitlines()
+
+    # The rest of the record arrives: it is processed and appended exactly once
+    capture.write_bytes(data)
+    assert packet_processor.process_file(capture, log, offset) == len(data)
+    assert packet_processor.stats.packets == 1
+    assert log.read_text().splitlines()[:len(lines)] == lines
+    assert len(log.read_text().splitlines()) == len(lines) + 1
+
+
+def test_no_new_records_leaves_the_output_unchanged(tmp_path: Path) -> None:
+    data = pcap_bytes(exchange(10))
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data)
+    log = tmp_path / "capture.log"
+    packet_processor = processor()
+    offset = packet_processor.process_file(capture, log)
+    content = log.read_bytes()
+
+    assert packet_processor.process_file(capture, log, offset) == offset
+    assert packet_processor.succeeded
+    assert log.read_bytes() == content
+
+
+def test_failed_run_leaves_the_output_unchanged(tmp_path: Path) -> None:
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(pcap_bytes(exchange(10)))
+    log = tmp_path / "capture.log"
+    log.write_text("previous output\n")
+    # The pipeline fails once the output is opened: tcpdump or awk is missing
+    packet_processor = PacketProcessor(
+        ProcessorSettings((SNIFFED_IP,), tmp_path / "missing.awk", ENGINE_TCPDUMP)
+    )
+
+    assert packet_processor.process_file(capture, log) == 0
+    assert not packet_processor.succeeded
+    assert log.read_text() == "previous output\n"
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith("capture.log")] == [
+        "capture.log"
+    ]
+
+
+def test_tcpdump_reads_a_whole_capture_file_itself(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = pcap_bytes(exchange(10))
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data[:len(pcap_bytes(exchange(5)))])
+    runs: list[tuple[list[str], bool]] = []
+
+    def run(
+        _pipeline: ProcessPipeline,
+        commands: list[ProcessCommand],
+        output_file: Path,
+        input_chunks: Optional[Iterable[bytes]] = None,
+        append: bool = False,
+    ) -> bool:
+        runs.append((commands[0].cmd, input_chunks is not None))
+        with open(output_file, "a" if append else "w", encoding="utf-8"):
+            pass
+        return True
+
+    monkeypatch.setattr(ProcessPipeline, "run", run)
+    packet_processor = PacketProcessor(
+        ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_TCPDUMP)
+    )
+    offset = packet_processor.process_file(capture, tmp_path / "capture.log")
+    capture.write_bytes(data)
+    packet_processor.process_file(capture, tmp_path / "capture.log", offset)
+
+    assert [(cmd[1:3], has_input) for cmd, has_input in runs] == [
+        (["-r", str(capture)], False),
+        (["-r", "-"], True),
+    ]
@@ -0,0 +1,79 @@
+"""Tests of the memory-mapped pcap reader and the `PcapIndex` sidecar."""
+
+from pathlib import Path
+
+from atnproc.pcap_file import PCAP_GLOBAL_HEADER_LENGTH, PCAP_RECORD_HEADER_LENGTH, PcapFile
+from atnproc.pcap_index import PcapIndex
+from atnproc.pcap_reader import PcapReader
+
+from tests.capture_helpers import exchange, pcap_bytes
+
+
+def record_offsets(data: bytes) -> list[int]:
+    offsets = []
+    offset = PCAP_GLOBAL_HEADER_LENGTH
+    while offset < len(data):
+        offsets.append(offset)
+        offset += PCAP_RECORD_HEADER_LENGTH + int.from_bytes(data[offset + 8:offset + 12], "little")
+    return offsets
+
+
+def test_reader_yields_the_complete_records(tmp_path: Path) -> None:
+    packets = exchange(5)
+    data = pcap_bytes(packets)
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data[:-1])
+    pcap_file = PcapFile(capture)
+
+    end_offset = pcap_file.complete_records_end()
+    records = list(PcapReader(pcap_file).records(0, end_offset))
+
+    assert end_offset == record_offsets(data)[-1]
+    assert [r.offset for r in records] == record_offsets(data)[:-1]
+    assert [bytes(r.data) for r in records] == [p.frame for p in packets[:-1]]
+    assert [(r.ts_sec, r.ts_usec) for r in records] == [(p.ts_sec, p.ts_usec) for p in packets[:-1]]
+
+
+def test_index_grows_with_the_capture_file(tmp_path: Path) -> None:
+    packets = exchange(20, step_usec=1_000_000)
+    data = pcap_bytes(packets)
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data[:1000])
+
+    index = PcapIndex(PcapFile(capture))
+    first_end = index.update()
+    capture.write_bytes(data)
+    assert index.update() == len(data)
+
+    offsets = record_offsets(data)
+    assert first_end in offsets
+    assert index.num_records == len(packets)
+    assert index.is_record_boundary(offsets[7])
+    assert not index.is_record_boundary(offsets[7] + 1)
+    assert index.offset_at((packets[3].ts_sec * 1_000_000) + 1) == offsets[4]
+    assert index.offset_at(packets[-1].ts_sec * 1_000_000 + 1) == len(data)
+
+
+def test_index_is_reloaded_from_the_sidecar(tmp_path: Path) -> None:
+    data = pcap_bytes(exchange(10))
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(data)
+    PcapIndex(PcapFile(capture)).update()
+
+    reloaded = PcapIndex(PcapFile(capture))
+    assert reloaded.index_file.is_file()
+    assert reloaded.num_records == 10
+    assert reloaded.end_offset == len(data)
+
+
+def test_stale_index_is_rebuilt(tmp_path: Path) -> None:
+    capture = tmp_path / "capture.pcap"
+    capture.write_bytes(pcap_bytes(exchange(10)))
+    PcapIndex(PcapFile(capture)).update()
+
+    # The file is replaced by a shorter one with other records
+    data = pcap_bytes(exchange(4, start=1_800_000_000))
+    capture.write_bytes(data)
+    index = PcapIndex(PcapFile(capture))
+    assert index.update() == len(data)
+    assert index.num_records == 4
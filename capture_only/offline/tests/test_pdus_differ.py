@@ -0,0 +1,48 @@
+"""Tests of the incremental `pdus.csv` diff of `PdusDiffer`."""
+
+from pathlib import Path
+
+from atnproc.pdus_differ import PdusDiffer
+
+
+def rows(first: int, last: int) -> str:
+    return "".join(f"2025-01-01 10:00:{i:02d};pdu {i}\n" for i in range(first, last))
+
+
+def test_an_extended_file_only_passes_the_appended_rows(tmp_path: Path) -> None:
+    csv_file = tmp_path / "pdus.csv"
+    output = tmp_path / "filebeat.csv"
+    differ = PdusDiffer()
+    csv_file.write_text(rows(0, 5) + "2025-01-01 10:00:05;par")
+
+    assert differ.diff(csv_file, output) == 5
+    csv_file.write_text(rows(0, 8))
+    assert differ.diff(csv_file, output) == 3
+    assert differ.diff(csv_file, output) == 0
+    assert output.read_text() == rows(0, 8)
+
+
+def test_a_rewritten_file_only_passes_unseen_rows(tmp_path: Path) -> None:
+    csv_file = tmp_path / "pdus.csv"
+    output = tmp_path / "filebeat.csv"
+    differ = PdusDiffer()
+    csv_file.write_text(rows(0, 6))
+    differ.diff(csv_file, output)
+
+    # The decoded window moved: the oldest rows are gone, new rows follow
+    csv_file.write_text(rows(3, 10))
+    assert differ.diff(csv_file, output) == 4
+    assert output.read_text() == rows(0, 10)
+
+
+def test_the_index_keeps_the_newest_rows(tmp_path: Path) -> None:
+    csv_file = tmp_path / "pdus.csv"
+    output = tmp_path / "filebeat.csv"
+    differ = PdusDiffer(max_rows=4)
+    csv_file.write_text(rows(0, 6))
+    differ.diff(csv_file, output)
+
+    csv_file.write_text(rows(1, 7))
+    # Row 1 was dropped from the index, rows 2 to 5 are known
+    assert differ.diff(csv_file, output) == 2
+    assert output.read_text() == rows(0, 6) + rows(1, 2) + rows(6, 7)
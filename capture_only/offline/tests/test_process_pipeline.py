@@ -0,0 +1,81 @@
+"""Tests of `ProcessPipeline` relaying, stderr draining and timeouts."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from atnproc.process_pipeline import ProcessCommand, ProcessPipeline
+
+
+def python(code: str, name: str) -> ProcessCommand:
+    return ProcessCommand([sys.executable, "-c", code], name)
+
+
+UPPER = python(
+    "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read().upper())", "upper"
+)
+
+
+def test_input_is_relayed_through_all_stages(tmp_path: Path) -> None:
+    output_file = tmp_path / "output"
+    data = b"abc" * 100_000
+    pipeline = ProcessPipeline()
+
+    assert pipeline.run([ProcessCommand(["cat"], "cat"), UPPER], output_file,
+                        input_chunks=[data[:1000], data[1000:]])
+
+    assert output_file.read_bytes() == data.upper()
+    assert [(s.source, s.target, s.bytes) for s in pipeline.pipe_stats] == [
+        ("input", "cat", len(data)),
+        ("cat", "upper", len(data)),
+    ]
+    assert [s.name for s in pipeline.process_stats] == ["upper", "cat"]
+    assert all(s.exit_code == 0 for s in pipeline.process_stats)
+
+
+def test_append_keeps_the_previous_output(tmp_path: Path) -> None:
+    output_file = tmp_path / "output"
+    output_file.write_bytes(b"first\n")
+
+    assert ProcessPipeline().run([UPPER], output_file, input_chunks=[b"second\n"], append=True)
+
+    assert output_file.read_bytes() == b"first\nSECOND\n"
+
+
+def test_chatty_stderr_does_not_block_the_pipeline(tmp_path: Path) -> None:
+    # Far more stderr output than a pipe buffer holds, then a failure
+    chatty = python(
+        "import sys; sys.stderr.write('x' * 1_000_000); sys.stderr.write('failed'); "
+        "sys.exit(3)",
+        "chatty",
+    )
+    pipeline = ProcessPipeline(timeout_seconds=30)
+
+    assert not pipeline.run([chatty, UPPER], tmp_path / "output")
+
+    assert not pipeline.timed_out
+    assert [s.exit_code for s in pipeline.process_stats] == [0, 3]
+
+
+def test_pipeline_exceeding_the_timeout_is_killed(tmp_path: Path) -> None:
+    sleeper = python("import time; time.sleep(60)", "sleeper")
+    pipeline = ProcessPipeline(timeout_seconds=0.5)
+    start_time = time.monotonic()
+
+    assert not pipeline.run([sleeper, UPPER], tmp_path / "output")
+
+    assert pipeline.timed_out
+    assert time.monotonic() - start_time < 30
+
+
+def test_started_processes_are_stopped_if_a_later_one_fails_to_start(tmp_path: Path) -> None:
+    sleeper = python("import time; time.sleep(60)", "sleeper")
+    missing = ProcessCommand([str(tmp_path / "missing")], "missing")
+    start_time = time.monotonic()
+
+    with pytest.raises(FileNotFoundError):
+        ProcessPipeline().run([sleeper, missing], tmp_path / "output", input_chunks=[b"data"])
+
+    assert time.monotonic() - start_time < 30
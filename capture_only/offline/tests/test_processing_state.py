@@ -0,0 +1,59 @@
+"""Tests of the persisted `ProcessingState` of a capture source."""
+
+import json
+from pathlib import Path
+
+from atnproc.processing_state import ProcessingState
+
+
+def test_state_is_restored_after_a_restart(tmp_path: Path) -> None:
+    state_file = tmp_path / "state.json"
+    state = ProcessingState(state_file)
+    state.current_file = "b.pcap"
+    state.pending = ["a.pcap", "b.pcap"]
+    file_state = state.file("a.pcap")
+    file_state.offset = 1234
+    file_state.output_size = 567
+    file_state.address_output_sizes["10.0.0.1"] = 89
+    state.save()
+
+    restored = ProcessingState(state_file)
+    assert restored.current_file == "b.pcap"
+    assert restored.pending == ["a.pcap", "b.pcap"]
+    assert restored.file("a.pcap") == file_state
+    assert restored.file("b.pcap").offset == 0
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_retain_forgets_the_other_files(tmp_path: Path) -> None:
+    state = ProcessingState(tmp_path / "state.json")
+    state.pending = ["a.pcap", "b.pcap"]
+    state.file("a.pcap").offset = 10
+    state.file("b.pcap").offset = 20
+
+    state.retain(["b.pcap"])
+    state.reset("b.pcap")
+
+    assert state.pending == ["b.pcap"]
+    assert state.file("a.pcap").offset == 0
+    assert state.file("b.pcap").offset == 0
+
+
+def test_unknown_fields_are_ignored(tmp_path: Path) -> None:
+    state_file = tmp_path / "state.json"
+    state_file.write_text(json.dumps({"files": {"a.pcap": {"offset": 4096, "unknown": 1}}}))
+
+    state = ProcessingState(state_file)
+
+    assert state.file("a.pcap").offset == 4096
+    assert state.file("a.pcap").output_size == 0
+
+
+def test_invalid_state_file_is_ignored(tmp_path: Path) -> None:
+    state_file = tmp_path / "state.json"
+    state_file.write_text('{"current_file": "a.pcap", "files": {"a.pcap": [1]}}')
+
+    state = ProcessingState(state_file)
+
+    assert state.current_file is None
+    assert state.file("a.pcap").offset == 0
@@ -0,0 +1,88 @@
+"""Tests of the removal of expired files by the `RetentionEngine`."""
+
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from atnproc.application import run_once
+from atnproc.config import Configuration
+from atnproc.metrics import Metrics
+from atnproc.retention import RetentionEngine, RetentionPolicy, RetentionSettings
+
+from tests.capture_helpers import exchange, write_config, write_pcap
+
+EXPIRED = time.time() - 10 * 86400
+
+
+def expired_file(file: Path, content: bytes = b"") -> Path:
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_bytes(content)
+    os.utime(file, (EXPIRED, EXPIRED))
+    return file
+
+
+def remaining(directory: Path) -> list[str]:
+    return sorted(str(p.relative_to(directory)) for p in directory.rglob("*") if p.is_file())
+
+
+def test_only_expired_files_of_the_patterns_are_removed(tmp_path: Path) -> None:
+    for name in ("a.pcap", "a.pcap.idx", "notes.txt", "keep.json", "sub/b.pcap"):
+        expired_file(tmp_path / name)
+    (tmp_path / "recent.pcap").touch()
+    metrics = Metrics()
+    policies = [
+        RetentionPolicy(tmp_path, timedelta(days=7), ("*.pcap", "*.pcap.idx"), recursive=False),
+    ]
+
+    assert RetentionEngine(policies, metrics).run() == 2
+
+    assert remaining(tmp_path) == ["keep.json", "notes.txt", "recent.pcap", "sub/b.pcap"]
+    assert metrics.get("retention_files_removed_total") == 2
+
+
+def test_directories_are_scanned_once_per_scan_interval(tmp_path: Path) -> None:
+    policies = [RetentionPolicy(tmp_path, timedelta(days=7))]
+    hourly = RetentionEngine(policies, Metrics(), RetentionSettings(timedelta(hours=1)))
+    always = RetentionEngine(policies, Metrics(), RetentionSettings(timedelta(0)))
+    expired_file(tmp_path / "a.pcap")
+    assert hourly.run() == 1
+    assert always.run() == 0
+
+    expired_file(tmp_path / "b.pcap")
+
+    assert hourly.run() == 0
+    assert always.run() == 1
+
+
+def test_open_and_excluded_files_are_kept(tmp_path: Path) -> None:
+    for name in ("open.log", "state.json", "sub/old.log"):
+        expired_file(tmp_path / name)
+    policies = [RetentionPolicy(tmp_path, timedelta(days=7), exclude=("*.json",))]
+
+    with open(tmp_path / "open.log", "rb"):
+        assert RetentionEngine(policies, Metrics()).run() == 1
+
+    assert remaining(tmp_path) == ["open.log", "state.json"]
+
+
+def test_capture_directories_only_lose_capture_files_and_router_logs(tmp_path: Path) -> None:
+    capture_directory = tmp_path / "captures"
+    router_log_directory = tmp_path / "routerlog"
+    capture_directory.mkdir()
+    capture = write_pcap(capture_directory / "atnr01_net3_00001_20200101000000.pcap", exchange(5))
+    os.utime(capture, (EXPIRED, EXPIRED))
+    for name in ("atnr01_net3_00001_20200101000000.pcap.idx", "rsync.filter", "old/x.pcap"):
+        expired_file(capture_directory / name)
+    for name in ("vm_net3_20200101_000000.log", "vm_net3_20200101_000000.log.idx",
+                 ".current_pipeline"):
+        expired_file(router_log_directory / name)
+    config = Configuration(write_config(
+        tmp_path, [capture_directory], capture_retention_days=7,
+        capture_output_directory=str(router_log_directory),
+    ))
+
+    run_once(config)
+
+    assert remaining(capture_directory) == ["old/x.pcap", "rsync.filter"]
+    assert remaining(router_log_directory) == [".current_pipeline"]
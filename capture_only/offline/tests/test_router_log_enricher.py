@@ -0,0 +1,70 @@
+"""Tests of the ATSU `FacilityIndex` and the `RouterLogEnricher`."""
+
+from pathlib import Path
+
+from atnproc.facility_index import FacilityIndex
+from atnproc.router_log_enricher import UNKNOWN_FACILITY, RouterLogEnricher
+
+from tests.capture_helpers import clnp_pdu, router_log_line
+
+ATSU_CSV = """\
+# NSAP prefix, facility
+47, WORLD
+470027, EUROPE
+47002781, LFPG  # source of the test PDUs
+zz, INVALID
+"""
+
+
+def atsu_file(tmp_path: Path) -> Path:
+    atsu = tmp_path / "atsu.csv"
+    atsu.write_text(ATSU_CSV)
+    return atsu
+
+
+def test_lookup_returns_the_longest_prefix(tmp_path: Path) -> None:
+    index = FacilityIndex(atsu_file(tmp_path))
+
+    assert index.num_entries == 3
+    assert index.lookup(b"\x47\x00\x27\x81\x01") == "LFPG"
+    assert index.lookup(b"\x47\x00\x27\x41") == "EUROPE"
+    assert index.lookup(b"\x47\x01") == "WORLD"
+    assert index.lookup(b"\x48") is None
+
+
+def test_cache_is_used_until_the_csv_changes(tmp_path: Path) -> None:
+    atsu = atsu_file(tmp_path)
+    cache_file = tmp_path / "cache" / "atsu.idx"
+    FacilityIndex(atsu, cache_file)
+    assert cache_file.is_file()
+
+    # A stale cache would still know LFPG
+    atsu.write_text("47, WORLD\n")
+    assert FacilityIndex(atsu, cache_file).lookup(b"\x47\x00\x27\x81") == "WORLD"
+    assert FacilityIndex(atsu, cache_file).num_entries == 1
+
+
+def test_records_are_written_with_their_facilities(tmp_path: Path) -> None:
+    enricher = RouterLogEnricher(FacilityIndex(atsu_file(tmp_path)))
+    records = [
+        router_log_line("2024-01-01 00:00:00.000", pdu=clnp_pdu().hex()).rstrip(),
+        router_log_line("2024-01-01 00:00:01.000", pdu="0102").rstrip(),
+    ]
+    log_file = tmp_path / "router.log"
+    # The last record is still being written
+    log_file.write_text("\n".join(records) + "\n" + records[0][:20])
+    output_file = tmp_path / "enriched.log"
+
+    assert enricher.enrich(log_file, 0, output_file) == 2
+
+    assert output_file.read_text().splitlines() == [
+        f"{records[0]} LFPG EUROPE",
+        f"{records[1]} {UNKNOWN_FACILITY} {UNKNOWN_FACILITY}",
+    ]
+
+    # Appending resumes after the records already enriched
+    with open(log_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(records + records[:1]) + "\n")
+    start_offset = len("\n".join(records)) + 1
+    assert enricher.enrich(log_file, start_offset, output_file) == 1
+    assert output_file.read_text().splitlines()[-1] == f"{records[0]} LFPG EUROPE"
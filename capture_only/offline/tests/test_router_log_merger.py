@@ -0,0 +1,44 @@
+"""Tests of the k-way merge and deduplication of `RouterLogMerger`."""
+
+from pathlib import Path
+
+from atnproc.router_log_merger import RouterLogMerger
+
+from tests.capture_helpers import router_log_line
+
+
+def test_streams_are_merged_in_time_order_without_duplicates() -> None:
+    router1 = [
+        router_log_line("2025-01-01 10:00:00.100", pdu="8101"),
+        router_log_line("2025-01-01 10:00:01.000", "SENT", pdu="8102"),
+        router_log_line("2025-01-01 10:00:03.000", pdu="8103"),
+    ]
+    router2 = [
+        router_log_line("2025-01-01 10:00:00.050", pdu="8104"),
+        # Captured by both routers during a failover
+        router_log_line("2025-01-01 10:00:01.000", "SENT", pdu="8102"),
+        # Same time, other PDU: not a duplicate
+        router_log_line("2025-01-01 10:00:03.000", pdu="8105"),
+    ]
+    merger = RouterLogMerger()
+
+    merged = list(merger.merge([router1, router2]))
+
+    assert merged == [router2[0], router1[0], router1[1], router1[2], router2[2]]
+    assert merger.records == 5
+    assert merger.duplicates == 1
+
+
+def test_merged_file_skips_partial_lines(tmp_path: Path) -> None:
+    first = tmp_path / "atnr01.log"
+    second = tmp_path / "atnr02.log"
+    first.write_text(
+        router_log_line("2025-01-01 10:00:00.000", pdu="8101")
+        + "ROUTER CLNS_DT_PDU 2025-01-01 10:00:00.5"
+    )
+    second.write_text(router_log_line("2025-01-01 09:59:59.999", pdu="8102"))
+    output = tmp_path / "merged.log"
+
+    assert RouterLogMerger().merge_files([first, second], output) == 2
+    assert output.read_text() == second.read_text() + first.read_text().splitlines(True)[0]
+    assert not output.with_name("merged.log.tmp").exists()
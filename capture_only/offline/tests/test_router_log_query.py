@@ -0,0 +1,66 @@
+"""Tests of time range queries over indexed router logs."""
+
+import io
+from pathlib import Path
+from typing import Optional
+
+from atnproc.router_log_index import RouterLogIndex
+from atnproc.router_log_query import RouterLogQuery
+
+from tests.capture_helpers import OTHER_IP, REMOTE_IP, router_log_line
+
+
+def log_lines(minutes: range, remote_ip: str = REMOTE_IP, second: int = 0) -> list[str]:
+    return [
+        router_log_line(f"2025-01-01 10:{minute:02d}:{second:02d}.000", remote_ip=remote_ip)
+        for minute in minutes
+    ]
+
+
+def query(
+    paths: list[Path], remote_ip: Optional[str] = None, sniffed_ip: Optional[str] = None
+) -> list[str]:
+    out = io.StringIO()
+    RouterLogQuery(paths, sniffed_ip=sniffed_ip).run(
+        "2025-01-01 10:05", "2025-01-01 10:10", remote_ip, out
+    )
+    return out.getvalue().splitlines(keepends=True)
+
+
+def test_index_follows_a_growing_log(tmp_path: Path) -> None:
+    log_file = tmp_path / "router.log"
+    lines = log_lines(range(0, 30))
+    log_file.write_text("".join(lines[:10]))
+    RouterLogIndex(log_file).update()
+
+    log_file.write_text("".join(lines) + lines[0][:30])
+    index = RouterLogIndex(log_file)
+    index.update()
+
+    assert list(index.records("2025-01-01 10:08", "2025-01-01 10:12")) == lines[8:12]
+    assert not list(index.records("2025-01-01 10:08", "2025-01-01 10:12", OTHER_IP))
+
+
+def test_directory_query_skips_the_logs_of_further_addresses(tmp_path: Path) -> None:
+    primary = log_lines(range(0, 20))
+    further = log_lines(range(0, 20), second=30)
+    (tmp_path / "atnr01_net3_00001_20250101000000.log").write_text("".join(primary))
+    (tmp_path / f"atnr01_net3_00001_20250101000000_{OTHER_IP}.log").write_text(
+        "".join(further)
+    )
+
+    assert query([tmp_path]) == primary[5:10]
+    assert query([tmp_path], sniffed_ip=OTHER_IP) == further[5:10]
+
+
+def test_records_of_both_routers_are_merged_once(tmp_path: Path) -> None:
+    remote = log_lines(range(0, 20))
+    other = log_lines(range(0, 20), remote_ip=OTHER_IP, second=30)
+    # Both routers captured the same records
+    for name in ("atnr01.log", "atnr02.log"):
+        (tmp_path / name).write_text("".join(sorted(remote + other)))
+
+    assert query([tmp_path / "atnr01.log", tmp_path / "atnr02.log"]) == sorted(
+        remote[5:10] + other[5:10]
+    )
+    assert query([tmp_path], remote_ip=OTHER_IP) == other[5:10]
@@ -0,0 +1,54 @@
+"""Tests of the hourly shards of `ShardedPdecDecoder` with the PDEC stand-in."""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from atnproc.pdus_differ import PdusDiffer
+from atnproc.sharded_pdec_decoder import ShardedPdecDecoder
+
+from tests.capture_helpers import OTHER_IP, REMOTE_IP, router_log_line
+
+PDEC_STUB = Path(__file__).resolve().parent / "pdec_stub.py"
+
+
+def merged_log(start: datetime, end: datetime) -> str:
+    lines = []
+    time = start
+    while time < end:
+        remote_ip = REMOTE_IP if time.second < 40 else OTHER_IP
+        lines.append(router_log_line(f"{time:%Y-%m-%d %H:%M:%S.%f}"[:-3], remote_ip=remote_ip))
+        time += timedelta(seconds=20)
+    return "".join(lines)
+
+
+def test_growth_ticks_pass_every_row_once(tmp_path: Path) -> None:
+    work_directory = tmp_path / "pdec"
+    work_directory.mkdir()
+    decoder = ShardedPdecDecoder(
+        PDEC_STUB, tmp_path / "atsu.csv", work_directory, shards=3,
+        overlap=timedelta(minutes=5),
+    )
+    differ = PdusDiffer()
+    log_file = tmp_path / "merged.log"
+    filebeat_file = tmp_path / "filebeat.csv"
+    start = datetime(2025, 1, 1, 9, 50, 10)
+    csv_contents = []
+
+    # The second tick adds records to the last hour and two more hours
+    for end in (datetime(2025, 1, 1, 11, 20), datetime(2025, 1, 1, 13, 10)):
+        log_file.write_text(merged_log(start, end))
+        csv_files = decoder.decode(log_file)
+        assert [f.name for f in csv_files] == ["pdus.csv"]
+        csv_contents.append(csv_files[0].read_text())
+        differ.diff(csv_files[0], filebeat_file)
+
+    # The rows of the first tick are reproduced, so only the new rows follow
+    assert csv_contents[1].startswith(csv_contents[0])
+    assert filebeat_file.read_text() == csv_contents[1]
+    rows = csv_contents[1].splitlines()
+    assert rows[0].startswith("timestamp,")
+    timestamps = [row.split(",")[0] for row in rows[1:]]
+    assert timestamps == [
+        line.split()[2] + " " + line.split()[3] for line in log_file.read_text().splitlines()
+    ]
+    assert len(decoder.process_stats) == 5
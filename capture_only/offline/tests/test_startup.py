@@ -0,0 +1,15 @@
+"""Tests of the imports at start-up of the command line entry point."""
+
+from tests.startup_check import DEFERRED_MODULES, ENTRY_POINT, best_import_times
+
+# Well above the start-up time on a loaded CI machine, to catch a heavy
+# import creeping back into the entry point without failing on slow hosts
+BUDGET_MS = 500
+
+
+def test_entry_point_defers_the_command_modules() -> None:
+    times = best_import_times(ENTRY_POINT, runs=3)
+
+    assert ENTRY_POINT in times
+    assert not [name for name in DEFERRED_MODULES if name in times]
+    assert times[ENTRY_POINT] / 1000 < BUDGET_MS
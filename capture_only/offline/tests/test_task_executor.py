@@ -0,0 +1,48 @@
+"""Tests of the per-source process pool of `TaskExecutor`."""
+
+from pathlib import Path
+
+from atnproc.packet_processor import ENGINE_NATIVE, ProcessorSettings
+from atnproc.processing_task import ProcessingTask
+from atnproc.task_executor import TaskExecutor
+
+from tests.capture_helpers import AWK_SCRIPT, SNIFFED_IP, exchange, write_pcap
+
+
+def jobs(directory: Path) -> dict[str, list[ProcessingTask]]:
+    directory.mkdir()
+    result: dict[str, list[ProcessingTask]] = {}
+    for number, source in enumerate(("atnr01", "atnr02")):
+        tasks = []
+        for hour in range(2):
+            name = f"{source}_net3_0000{hour}_2025010{number + 1}0{hour}0000"
+            capture = write_pcap(
+                directory / f"{name}.pcap", exchange(30 + 10 * hour, start=1_735_700_000 + hour)
+            )
+            tasks.append(ProcessingTask(capture.name, capture, directory / f"{name}.log", 0))
+        result[source] = tasks
+    return result
+
+
+def test_pool_gives_the_results_of_sequential_processing(tmp_path: Path) -> None:
+    settings = ProcessorSettings((SNIFFED_IP,), AWK_SCRIPT, ENGINE_NATIVE)
+    sequential_jobs = jobs(tmp_path / "sequential")
+    parallel_jobs = jobs(tmp_path / "parallel")
+
+    sequential = TaskExecutor(settings, max_workers=0).run(sequential_jobs)
+    executor = TaskExecutor(settings, max_workers=2)
+    try:
+        parallel = executor.run(parallel_jobs)
+    finally:
+        executor.shutdown()
+
+    assert sorted(parallel) == ["atnr01", "atnr02"]
+    for source, results in parallel.items():
+        assert [r.file_name for r in results] == [t.file_name for t in parallel_jobs[source]]
+        assert all(r.succeeded for r in results)
+        assert [(r.end_offset, r.stats.records) for r in results] == [
+            (r.end_offset, r.stats.records) for r in sequential[source]
+        ]
+        for parallel_task, sequential_task in zip(parallel_jobs[source], sequential_jobs[source]):
+            assert parallel_task.output_file.read_text() == sequential_task.output_file.read_text()
+    assert not executor.is_busy("atnr01")
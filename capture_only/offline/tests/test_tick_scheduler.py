@@ -0,0 +1,64 @@
+"""Tests of the adaptive processing interval of `TickScheduler`."""
+
+from datetime import timedelta
+
+from atnproc.metrics import Metrics
+from atnproc.tick_scheduler import (
+    REASON_BACKLOG,
+    REASON_GROWTH,
+    REASON_IDLE,
+    SourceProgress,
+    TickScheduler,
+    TickSettings,
+)
+
+
+def scheduler(metrics: Metrics) -> TickScheduler:
+    settings = TickSettings(timedelta(seconds=5), timedelta(seconds=60), 1_000_000)
+    return TickScheduler(settings, metrics)
+
+
+def progress(size: int, processed: int = -1, file_name: str = "a.pcap") -> list[SourceProgress]:
+    return [SourceProgress("atnr01", file_name, size, size if processed < 0 else processed)]
+
+
+def test_idle_interval_doubles_up_to_the_maximum() -> None:
+    metrics = Metrics()
+    tick_scheduler = scheduler(metrics)
+
+    intervals = [
+        tick_scheduler.schedule(progress(1000), start_time, 0.0).total_seconds()
+        for start_time in (0.0, 10.0, 30.0, 70.0, 150.0)
+    ]
+
+    assert intervals == [10.0, 20.0, 40.0, 60.0, 60.0]
+    assert metrics.get("schedule_decisions_total", reason=REASON_IDLE) == 5
+
+
+def test_growth_sets_the_interval_of_a_constant_amount_of_data() -> None:
+    metrics = Metrics()
+    tick_scheduler = scheduler(metrics)
+    tick_scheduler.schedule(progress(0), 0.0, 0.0)
+
+    # 50 kB/s: 1 MB arrives in 20 s, of which the tick took 2 s
+    assert tick_scheduler.schedule(progress(500_000), 10.0, 2.0) == timedelta(seconds=18)
+    assert tick_scheduler.interval == timedelta(seconds=20)
+    assert metrics.get("capture_growth_bytes_per_second") == 50_000
+    assert metrics.get("schedule_decisions_total", reason=REASON_GROWTH) == 1
+
+    # A new capture file counts from zero
+    tick_scheduler.schedule(progress(1_000_000, file_name="b.pcap"), 30.0, 0.0)
+    assert metrics.get("capture_growth_bytes_per_second") == 50_000
+
+
+def test_backlog_schedules_the_next_tick_at_the_minimum_interval() -> None:
+    metrics = Metrics()
+    tick_scheduler = scheduler(metrics)
+
+    assert tick_scheduler.schedule(progress(3_000_000, 1_000_000), 0.0, 1.0) == timedelta(
+        seconds=4
+    )
+    # A tick longer than the interval is followed by the next one at once
+    assert tick_scheduler.schedule(progress(5_000_000, 1_000_000), 5.0, 7.0) == timedelta(0)
+    assert metrics.get("schedule_decisions_total", reason=REASON_BACKLOG) == 2
+    assert metrics.get("backlog_bytes") == 4_000_000